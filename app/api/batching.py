@@ -0,0 +1,76 @@
+import asyncio
+from concurrent.futures import Executor
+
+
+class EmbeddingMicroBatcher:
+    """
+    Agrupa os embeddings de requisições concorrentes em micro-lotes.
+
+    Cada requisição coloca o seu texto em uma fila e aguarda. Uma tarefa de fundo
+    pega o primeiro item, espera no máximo `max_wait_ms` por outros (ou até juntar
+    `max_batch_size`) e envia o lote inteiro para o modelo em uma única chamada,
+    executada no `executor` para não bloquear o event loop.
+    """
+
+    def __init__(self, embed_fn, executor: Executor, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        """
+        Args:
+            embed_fn (callable): Recebe uma lista de textos e devolve a lista de embeddings.
+            executor (Executor): Pool de threads onde o modelo é executado.
+            max_batch_size (int): Tamanho máximo de cada lote.
+            max_wait_ms (float): Tempo máximo que o primeiro item espera por companhia.
+        """
+        self.embed_fn = embed_fn
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = None
+        self._task = None
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def embed(self, text: str) -> list:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def _collect_batch(self) -> list:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect_batch()
+            texts = [text for text, _ in batch]
+            try:
+                vectors = await loop.run_in_executor(self.executor, self.embed_fn, texts)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
@@ -0,0 +1,203 @@
+"""
+Servidor pre-fork: carrega o pipeline uma única vez e atende com vários workers.
+
+O processo pai carrega o modelo de embeddings (e o reranker, se ativo), abre o
+índice (somente leitura) e depois cria os workers com `fork`. Os workers herdam essa
+memória por copy-on-write: os pesos dos modelos e os arrays do índice numpy
+(memory-map) existem uma única vez na RAM, em vez de uma cópia por worker como
+acontece com `uvicorn --workers N`.
+
+Uso:
+    python -m app.api.prefork --workers 4 --port 8000
+
+Observações:
+- O pai carrega o modelo com uma única thread do torch, para que nenhum pool de
+  threads (OpenMP) exista no momento do fork; cada worker configura as suas threads
+  (`--threads-per-worker`, padrão EMBEDDING_THREADS ou núcleos / workers) para que a
+  soma não passe do número de núcleos.
+- O cliente do Chroma (SQLite e threads) não sobrevive a um fork: com esse backend o
+  índice é verificado (ou construído) em um processo auxiliar e cada worker abre o
+  seu próprio cliente. O compartilhamento do índice vale para o backend numpy.
+- As métricas de `/metrics` são por worker.
+- Disponível apenas em sistemas com `fork` (Linux e macOS).
+"""
+import os
+import gc
+import time
+import signal
+import socket
+import logging
+import argparse
+
+import uvicorn
+from dotenv import load_dotenv
+
+from app.core.logging_config import configure_logging
+
+logger = logging.getLogger(__name__)
+
+# Intervalo mínimo entre reinícios de um worker que morreu, para não entrar em laço.
+RESTART_DELAY_SECONDS = 1.0
+
+
+def _set_torch_threads(threads: int):
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(threads)
+
+
+def _create_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    """Socket de escuta criado no pai e compartilhado por todos os workers."""
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_in_child(function) -> int:
+    """Executa `function` em um processo filho e devolve o código de saída."""
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            function()
+        except BaseException:
+            logger.exception("Falha no processo auxiliar.")
+            code = 1
+        finally:
+            os._exit(code)
+    _, status = os.waitpid(pid, 0)
+    return os.waitstatus_to_exitcode(status)
+
+
+def preload_pipeline():
+    """
+    Cria o pipeline e carrega, no processo pai, tudo o que os workers podem herdar.
+
+    Returns:
+        RAGPipeline: O pipeline carregado.
+    """
+    from app.rag.pipeline import RAGPipeline
+
+    # Sem pool de threads no pai: um pool OpenMP criado antes do fork não funciona nos filhos.
+    _set_torch_threads(1)
+    pipeline = RAGPipeline()
+    retriever = pipeline.retriever
+    if retriever.backend == "chroma":
+        if _run_in_child(retriever.warm_up) != 0:
+            raise RuntimeError("Não foi possível preparar o banco vetorial.")
+        retriever.embedding_model.embed_documents(["aquecimento"])
+        if retriever.reranker is not None:
+            retriever.reranker.warm_up()
+        retriever.works_index
+    else:
+        retriever.warm_up()
+    # O cliente do Gemini é criado em cada worker (no lifespan), não aqui.
+    return pipeline
+
+
+def _worker(index: int, sock: socket.socket, pipeline, threads: int, timeout_keep_alive: int):
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    _set_torch_threads(threads)
+    pipeline.retriever.after_fork()
+
+    from app.api.server import app
+
+    app.state.preloaded_pipeline = pipeline
+    logger.info("Worker %d iniciado (pid %d, %d thread(s) de embeddings).", index, os.getpid(), threads)
+    config = uvicorn.Config(app, log_config=None, timeout_keep_alive=timeout_keep_alive)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def serve(host: str, port: int, workers: int, threads_per_worker: int, timeout_keep_alive: int = 5):
+    """
+    Carrega o pipeline, cria `workers` processos que atendem no mesmo socket e os
+    supervisiona: um worker que morre é recriado; SIGTERM/SIGINT encerram todos.
+    """
+    pipeline = preload_pipeline()
+    sock = _create_socket(host, port)
+    # Objetos criados até aqui não são mais visitados pelo coletor de lixo, que de outra
+    # forma tocaria nas suas páginas e desfaria o compartilhamento copy-on-write.
+    gc.collect()
+    gc.freeze()
+
+    children = {}
+
+    def spawn(index: int):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _worker(index, sock, pipeline, threads_per_worker, timeout_keep_alive)
+            except BaseException:
+                logger.exception("Falha no worker %d.", index)
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = index
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    for index in range(workers):
+        spawn(index)
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    logger.info("Servidor pre-fork em http://%s:%d com %d worker(s).", host, port, workers)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        index = children.pop(pid, None)
+        if index is None or stopping:
+            continue
+        logger.warning("Worker %d (pid %d) terminou com código %d; reiniciando.",
+                       index, pid, os.waitstatus_to_exitcode(status))
+        time.sleep(RESTART_DELAY_SECONDS)
+        spawn(index)
+    sock.close()
+    logger.info("Servidor encerrado.")
+
+
+def main():
+    load_dotenv()
+    configure_logging()
+    cpu_count = os.cpu_count() or 1
+
+    parser = argparse.ArgumentParser(description="Servidor pre-fork da API RAG.")
+    parser.add_argument("--host", default=os.getenv("API_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("API_PORT", 8000)))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("API_WORKERS", cpu_count)),
+                        help="Número de processos workers (padrão: API_WORKERS ou número de núcleos).")
+    parser.add_argument("--threads-per-worker", type=int, default=int(os.getenv("EMBEDDING_THREADS", 0)),
+                        help="Threads do torch por worker (padrão: EMBEDDING_THREADS ou núcleos / workers).")
+    parser.add_argument("--timeout-keep-alive", type=int, default=5)
+    args = parser.parse_args()
+
+    workers = max(1, args.workers)
+    threads = args.threads_per_worker or max(1, cpu_count // workers)
+    # O pai carrega o modelo com uma thread; cada worker usa `threads`.
+    os.environ["EMBEDDING_THREADS"] = "1"
+    # Os tokenizers do Hugging Face desativam o paralelismo (com um aviso) depois de um fork.
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    serve(args.host, args.port, workers, threads, timeout_keep_alive=args.timeout_keep_alive)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+import os
+import json
+import time
+import asyncio
+from typing import Optional
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, Request, HTTPException
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from pydantic import BaseModel
+
+from app.rag.pipeline import RAGPipeline
+from app.rag.generator import GenerationError, GenerationTimeout, GenerationUnavailable
+from app.core.logging_config import configure_logging
+from app.core.metrics import REGISTRY, HTTP_REQUEST_SECONDS
+from .batching import EmbeddingMicroBatcher
+
+
+class RetrieveRequest(BaseModel):
+    question: str
+    k: int = 5
+    filter: Optional[dict] = None
+
+
+class AskRequest(BaseModel):
+    question: str
+    # Padrão: CONTEXT_K do pipeline (menor quando o reranker está ativo).
+    k: Optional[int] = None
+    filter: Optional[dict] = None
+
+
+class RetrievedDocument(BaseModel):
+    content: str
+    metadata: dict
+
+
+class RetrieveResponse(BaseModel):
+    documents: list[RetrievedDocument]
+
+
+class AskResponse(BaseModel):
+    answer: str
+    documents: list[RetrievedDocument]
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Carrega o pipeline uma única vez na inicialização e cria os pools de threads:
+    um com uma única thread para o modelo de embeddings (alimentado pelo
+    micro-batcher), um para a busca vetorial e outro para as chamadas bloqueantes
+    ao Gemini.
+    """
+    load_dotenv()
+    configure_logging()
+    # No servidor pre-fork (app.api.prefork) o pipeline já vem carregado do processo pai.
+    pipeline = getattr(app.state, "preloaded_pipeline", None) or RAGPipeline()
+    # O servidor só aceita requisições depois que tudo estiver carregado.
+    pipeline.warm_up()
+
+    embedding_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding")
+    retrieval_executor = ThreadPoolExecutor(
+        max_workers=int(os.getenv("API_RETRIEVAL_WORKERS", 4)), thread_name_prefix="retrieval"
+    )
+    generation_executor = ThreadPoolExecutor(
+        max_workers=int(os.getenv("API_GENERATION_WORKERS", 8)), thread_name_prefix="generation"
+    )
+    batcher = EmbeddingMicroBatcher(
+        pipeline.retriever.embed_queries,
+        embedding_executor,
+        max_batch_size=int(os.getenv("API_MAX_BATCH_SIZE", 32)),
+        max_wait_ms=float(os.getenv("API_MAX_WAIT_MS", 5))
+    )
+    await batcher.start()
+
+    app.state.pipeline = pipeline
+    app.state.batcher = batcher
+    app.state.retrieval_executor = retrieval_executor
+    app.state.generation_executor = generation_executor
+    try:
+        yield
+    finally:
+        await batcher.stop()
+        embedding_executor.shutdown(wait=False)
+        retrieval_executor.shutdown(wait=False)
+        generation_executor.shutdown(wait=False)
+
+
+app = FastAPI(title="RAG Clarice Lispector", lifespan=lifespan)
+
+
+@app.middleware("http")
+async def record_request_duration(request: Request, call_next):
+    # Em /ask/stream mede até o início da resposta; o streaming em si é medido
+    # pelas métricas de geração.
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    HTTP_REQUEST_SECONDS.observe(
+        time.perf_counter() - start,
+        method=request.method,
+        path=route.path if route is not None else "other",
+        status=response.status_code
+    )
+    return response
+
+
+async def _retrieve(request: Request, question: str, k: int, filter: dict = None):
+    state = request.app.state
+    query_embedding = await state.batcher.embed(question)
+    loop = asyncio.get_running_loop()
+    results = await loop.run_in_executor(
+        state.retrieval_executor,
+        lambda: state.pipeline.retriever.search_by_embeddings(
+            [query_embedding], k=k, queries=[question], filter=filter
+        )
+    )
+    return query_embedding, results[0]
+
+
+def _generation_error_status(error: GenerationError) -> int:
+    if isinstance(error, GenerationTimeout):
+        return 504
+    if isinstance(error, GenerationUnavailable):
+        return 503
+    return 502
+
+
+def _serialize(documents: list) -> list:
+    return [RetrievedDocument(content=doc.page_content, metadata=doc.metadata) for doc in documents]
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Métricas no formato de texto do Prometheus."""
+    return PlainTextResponse(REGISTRY.to_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/metrics/json")
+async def metrics_json():
+    """As mesmas métricas em JSON, com p50/p95/p99 das latências recentes."""
+    return REGISTRY.to_dict()
+
+
+@app.post("/retrieve", response_model=RetrieveResponse)
+async def retrieve(body: RetrieveRequest, request: Request):
+    _, documents = await _retrieve(request, body.question, body.k, body.filter)
+    return RetrieveResponse(documents=_serialize(documents))
+
+
+@app.post("/ask", response_model=AskResponse)
+async def ask(body: AskRequest, request: Request):
+    state = request.app.state
+    # Com filtro de metadados a pergunta é restrita a parte do corpus; segue pelo RAG.
+    structured_answer = None if body.filter else state.pipeline.answer_structured(body.question)
+    if structured_answer is not None:
+        return AskResponse(answer=structured_answer, documents=[])
+
+    k = body.k or state.pipeline.context_k
+    query_embedding, documents = await _retrieve(request, body.question, k, body.filter)
+    try:
+        answer = await state.pipeline.ask_async(body.question, context_docs=documents,
+                                                query_embedding=query_embedding,
+                                                executor=state.generation_executor, filter=body.filter)
+    except GenerationError as e:
+        raise HTTPException(status_code=_generation_error_status(e), detail=str(e)) from e
+    return AskResponse(answer=answer, documents=_serialize(documents))
+
+
+@app.post("/ask/stream")
+async def ask_stream(body: AskRequest, request: Request):
+    """
+    Responde em server-sent events: um evento `data` por pedaço de texto gerado e
+    um evento final `done` com o tempo até o primeiro pedaço.
+    """
+    start = time.perf_counter()
+    state = request.app.state
+    structured_answer = None if body.filter else state.pipeline.answer_structured(body.question)
+    if structured_answer is not None:
+        async def structured_stream():
+            yield f"data: {json.dumps({'text': structured_answer}, ensure_ascii=False)}\n\n"
+            summary = {'time_to_first_token': time.perf_counter() - start, 'cache_hit': False, 'structured': True}
+            yield f"event: done\ndata: {json.dumps(summary)}\n\n"
+        return StreamingResponse(structured_stream(), media_type="text/event-stream")
+
+    k = body.k or state.pipeline.context_k
+    query_embedding, documents = await _retrieve(request, body.question, k, body.filter)
+    loop = asyncio.get_running_loop()
+
+    async def event_stream():
+        stats = {}
+        chunks = state.pipeline.ask_stream(body.question, context_docs=documents, stats=stats,
+                                           query_embedding=query_embedding, filter=body.filter)
+        first_chunk_at = None
+        finished = object()
+        while True:
+            chunk = await loop.run_in_executor(state.generation_executor, next, chunks, finished)
+            if chunk is finished:
+                break
+            if first_chunk_at is None:
+                first_chunk_at = time.perf_counter() - start
+            yield f"data: {json.dumps({'text': chunk}, ensure_ascii=False)}\n\n"
+
+        summary = {
+            'time_to_first_token': first_chunk_at,
+            'generation_time_to_first_token': stats.get('time_to_first_token'),
+            'cache_hit': stats.get('cache_hit', False),
+        }
+        yield f"event: done\ndata: {json.dumps(summary)}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    load_dotenv()
+    configure_logging()
+    uvicorn.run(app, host=os.getenv("API_HOST", "0.0.0.0"), port=int(os.getenv("API_PORT", 8000)))
@@ -0,0 +1,32 @@
+import os
+import argparse
+from dotenv import load_dotenv
+from app.rag.retriever import RAGRetriever
+from app.core.logging_config import configure_logging
+
+def main():
+    """
+    Constrói (ou atualiza) o índice a partir de `data/` e ativa a nova versão.
+
+    Processos em execução (API, pre-fork) passam a usá-la na próxima verificação
+    de INDEX_REFRESH_SECONDS, sem reiniciar. Por padrão a atualização é incremental:
+    só os chunks novos ou alterados passam pelo modelo de embeddings.
+    """
+    load_dotenv()
+    configure_logging()
+
+    parser = argparse.ArgumentParser(description="Constrói o índice do RAG a partir de data/.")
+    parser.add_argument("--db-path", default="db")
+    parser.add_argument("--chunk-size", type=int, default=int(os.getenv("CHUNK_SIZE", 1000)))
+    parser.add_argument("--chunk-overlap", type=int, default=int(os.getenv("CHUNK_OVERLAP", 200)))
+    parser.add_argument("--full", action="store_true", help="Constrói do zero, sem partir da versão ativa.")
+    parser.add_argument("--force", action="store_true",
+                        help="Reconstrói mesmo que exista uma versão com a mesma configuração.")
+    args = parser.parse_args()
+
+    retriever = RAGRetriever(db_path=args.db_path)
+    retriever.setup_vector_store(force_recreate=args.force, chunk_size=args.chunk_size,
+                                 chunk_overlap=args.chunk_overlap, incremental=not args.full)
+
+if __name__ == '__main__':
+    main()
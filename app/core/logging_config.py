@@ -0,0 +1,44 @@
+import os
+import json
+import logging
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+
+class JsonFormatter(logging.Formatter):
+    """Uma linha JSON por registro, para coletores de log."""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def configure_logging(level: str = None, json_format: bool = None):
+    """
+    Configura o logging da aplicação. Chamado pelos pontos de entrada (CLI, API e scripts).
+
+    Args:
+        level (str, opcional): Nível mínimo (DEBUG, INFO, ...). Padrão: variável LOG_LEVEL ou INFO.
+                               Em DEBUG o prompt completo enviado ao gerador também é registrado.
+        json_format (bool, opcional): Registra em JSON. Padrão: variável LOG_FORMAT=json.
+    """
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    if json_format is None:
+        json_format = os.getenv("LOG_FORMAT", "text").lower() == "json"
+
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if json_format else logging.Formatter(LOG_FORMAT))
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+    # Bibliotecas muito verbosas ficam em WARNING mesmo com LOG_LEVEL=DEBUG.
+    for name in ("httpx", "urllib3", "chromadb", "sentence_transformers"):
+        logging.getLogger(name).setLevel(max(logging.WARNING, root.level))
@@ -0,0 +1,230 @@
+import time
+import bisect
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+# Limites (em segundos) dos buckets dos histogramas de latência.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Limites dos histogramas de tamanho (chunks, caracteres, tokens).
+SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000)
+
+
+def _format_labels(labelnames: tuple, labelvalues: tuple, extra: dict = None) -> str:
+    pairs = list(zip(labelnames, labelvalues)) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Contador monotônico, opcionalmente com labels."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        return self._values.get(key, 0)
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def prometheus_lines(self) -> list:
+        with self._lock:
+            items = sorted(self._values.items())
+        if not items and not self.labelnames:
+            items = [((), 0)]
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+    def to_dict(self) -> list:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [{'labels': dict(zip(self.labelnames, key)), 'value': value} for key, value in items]
+
+
+class _HistogramSeries:
+    def __init__(self, buckets: tuple, reservoir_size: int):
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        # Amostras mais recentes, usadas para os percentis exatos do JSON.
+        self.recent = deque(maxlen=reservoir_size)
+
+
+class Histogram:
+    """
+    Histograma com buckets cumulativos no formato do Prometheus. Cada série também
+    guarda as `reservoir_size` observações mais recentes para calcular p50/p95/p99.
+    """
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (),
+                 buckets: tuple = LATENCY_BUCKETS, reservoir_size: int = 2048):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.reservoir_size = reservoir_size
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _HistogramSeries(self.buckets, self.reservoir_size)
+            series.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+            series.count += 1
+            series.sum += value
+            series.recent.append(value)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def prometheus_lines(self) -> list:
+        lines = []
+        with self._lock:
+            items = sorted((key, list(series.bucket_counts), series.count, series.sum)
+                           for key, series in self._series.items())
+        for key, bucket_counts, count, total in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), bucket_counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, {'le': _format_value(float(bound))})
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(float(total))}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+    def to_dict(self) -> list:
+        with self._lock:
+            items = sorted((key, series.count, series.sum, list(series.recent))
+                           for key, series in self._series.items())
+        result = []
+        for key, count, total, recent in items:
+            entry = {'labels': dict(zip(self.labelnames, key)), 'count': count, 'sum': total,
+                     'mean': total / count if count else None}
+            if recent:
+                p50, p95, p99 = np.percentile(recent, [50, 95, 99])
+                entry.update({'p50': float(p50), 'p95': float(p95), 'p99': float(p99), 'max': float(max(recent))})
+            result.append(entry)
+        return result
+
+
+class MetricsRegistry:
+    """Conjunto de métricas do processo, exportável em texto do Prometheus ou em JSON."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (),
+                  buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def reset(self):
+        for metric in list(self._metrics.values()):
+            metric.reset()
+
+    def to_prometheus(self) -> str:
+        lines = []
+        for metric in sorted(self._metrics.values(), key=lambda metric: metric.name):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.prometheus_lines())
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self) -> dict:
+        return {
+            metric.name: {'type': metric.type_name, 'help': metric.documentation, 'series': metric.to_dict()}
+            for metric in sorted(self._metrics.values(), key=lambda metric: metric.name)
+        }
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "rag_stage_duration_seconds", "Duração de cada etapa do pipeline RAG.", ("stage",)
+)
+RETRIEVED_CHUNKS = REGISTRY.histogram(
+    "rag_retrieved_chunks", "Chunks recuperados por pergunta.", buckets=SIZE_BUCKETS
+)
+PROMPT_CHARS = REGISTRY.histogram(
+    "rag_prompt_chars", "Tamanho do prompt enviado ao gerador, em caracteres.", buckets=SIZE_BUCKETS
+)
+CONTEXT_TOKENS = REGISTRY.histogram(
+    "rag_context_tokens", "Tokens estimados do contexto depois da montagem.", buckets=SIZE_BUCKETS
+)
+TIME_TO_FIRST_TOKEN = REGISTRY.histogram(
+    "rag_generation_time_to_first_token_seconds", "Tempo até o primeiro pedaço da resposta em streaming."
+)
+CACHE_LOOKUPS = REGISTRY.counter(
+    "rag_answer_cache_lookups_total", "Consultas ao cache semântico de respostas.", ("result",)
+)
+STRUCTURED_ANSWERS = REGISTRY.counter(
+    "rag_structured_answers_total", "Perguntas respondidas direto pelo índice de obras, sem RAG."
+)
+GENERATION_ERRORS = REGISTRY.counter(
+    "rag_generation_errors_total", "Chamadas ao gerador que falharam."
+)
+GENERATION_RETRIES = REGISTRY.counter(
+    "rag_generation_retries_total", "Novas tentativas de chamadas ao gerador, por motivo.", ("reason",)
+)
+GENERATION_COALESCED = REGISTRY.counter(
+    "rag_generation_coalesced_total", "Chamadas ao gerador evitadas por já haver um prompt idêntico em andamento."
+)
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "rag_http_request_duration_seconds", "Duração das requisições HTTP da API.", ("method", "path", "status")
+)
+
+
+@contextmanager
+def span(stage: str):
+    """Mede a duração de um bloco e a registra em `rag_stage_duration_seconds{stage=...}`."""
+    with STAGE_SECONDS.time(stage=stage):
+        yield
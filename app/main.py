@@ -1,18 +1,20 @@
 import sys
+from dotenv import load_dotenv
 from app.rag.pipeline import RAGPipeline
+from app.core.logging_config import configure_logging
 
 def main():
     """
     Função principal para executar o pipeline RAG a partir do terminal.
     """
-    # Inicializa o pipeline. Isso irá carregar o retriever e o nosso
-    # novo gerador baseado no Gemini.
+    load_dotenv()
+    configure_logging()
+
+    # Inicializa o pipeline. A construção é instantânea: o modelo de embeddings,
+    # o banco vetorial e o cliente do Gemini são carregados em segundo plano
+    # enquanto o usuário digita a primeira pergunta.
     rag_pipeline = RAGPipeline()
-    
-    # Prepara o banco de dados vetorial (carrega se já existir)
-    print("\nVerificando o banco de dados vetorial...")
-    rag_pipeline.retriever.setup_vector_store()
-    print("Banco de dados pronto para uso.")
+    rag_pipeline.warm_up(background=True)
 
     print("\n🤖 Assistente de Documentos com Gemini está pronto!")
     print("Digite sua pergunta ou 'sair' para terminar.")
@@ -28,8 +30,17 @@ def main():
         if not question:
             continue
 
+        # Perguntas sobre a lista de obras saem do índice estruturado, sem recuperação.
+        structured_answer = rag_pipeline.answer_structured(question)
+        if structured_answer is not None:
+            print("\n--- RESPOSTA ---")
+            print(structured_answer)
+            print("----------------")
+            continue
+
         print("\n--- DEBUG: VERIFICANDO O QUE O RETRIEVER ESTÁ ENCONTRANDO ---")
-        retrieved_docs = rag_pipeline.retriever.retrieve_context(question)
+        # O mesmo número de documentos que o pipeline coloca no prompt (menor com o reranker).
+        retrieved_docs = rag_pipeline.retriever.retrieve_context(question, k=rag_pipeline.context_k)
         if retrieved_docs:
             print(f"O retriever encontrou {len(retrieved_docs)} documentos:")
             for i, doc in enumerate(retrieved_docs):
@@ -40,13 +51,16 @@ def main():
             print("O retriever NÃO encontrou nenhum documento relevante.")
         print("--- FIM DO DEBUG ---\n")
 
-        # Usa o pipeline para obter a resposta
-        answer = rag_pipeline.ask(question)
-
-        # Imprime a resposta final
+        # Usa o pipeline para obter a resposta em streaming, reaproveitando os
+        # documentos já recuperados, e imprime cada pedaço assim que ele chega
+        stats = {}
         print("\n--- RESPOSTA ---")
-        print(answer)
-        print("----------------")
+        for chunk in rag_pipeline.ask_stream(question, context_docs=retrieved_docs, stats=stats):
+            print(chunk, end="", flush=True)
+        print("\n----------------")
+        if 'time_to_first_token' in stats:
+            print(f"(primeiro pedaço em {stats['time_to_first_token'] * 1000:.0f} ms, "
+                  f"resposta completa em {stats['total_time'] * 1000:.0f} ms)")
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,179 @@
+import os
+import time
+import random
+import asyncio
+import hashlib
+import logging
+
+from .generator import GenerationError, GenerationUnavailable, GenerationTimeout
+from app.core.metrics import span, GENERATION_ERRORS, GENERATION_RETRIES, GENERATION_COALESCED
+
+logger = logging.getLogger(__name__)
+
+# Nomes das exceções do google.api_core para limite de taxa (429) e indisponibilidade (500/503).
+_RATE_LIMIT_ERRORS = frozenset({'ResourceExhausted', 'TooManyRequests'})
+_UNAVAILABLE_ERRORS = frozenset({'ServiceUnavailable', 'InternalServerError'})
+
+
+def retry_reason(error: Exception):
+    """
+    Returns:
+        str | None: "rate_limit" ou "unavailable" para erros transitórios, que valem uma
+                    nova tentativa; None para erros definitivos.
+    """
+    code = getattr(error, 'code', None)
+    name = type(error).__name__
+    if code == 429 or name in _RATE_LIMIT_ERRORS:
+        return "rate_limit"
+    if code in (500, 503) or name in _UNAVAILABLE_ERRORS:
+        return "unavailable"
+    return None
+
+
+class AsyncGenerator:
+    """
+    Cliente assíncrono do modelo gerador, usado pela API.
+
+    - No máximo `max_concurrency` chamadas ao modelo ao mesmo tempo; as demais
+      esperam a sua vez em vez de se somarem a uma rajada que a API recusaria.
+    - Prompts idênticos já em andamento não geram uma nova chamada: todos os
+      pedidos esperam a mesma resposta.
+    - Erros de limite de taxa (429) e de indisponibilidade são repetidos com backoff
+      exponencial com jitter, sem ocupar uma vaga de concorrência durante a espera.
+    - Cada chamada tem um prazo (`timeout`) que inclui a fila e as novas tentativas.
+
+    O modelo é o mesmo do `RAGGenerator` (Gemini ou, com GENERATOR_BACKEND=fake, o
+    `FakeGenerativeModel` local). Modelos sem `generate_content_async` são chamados
+    em uma thread.
+    """
+
+    def __init__(self, generator, max_concurrency: int = 8, timeout: float = 30.0, max_retries: int = 4,
+                 backoff: float = 1.0, max_backoff: float = 16.0):
+        """
+        Args:
+            generator (RAGGenerator): Fornece o modelo (configurado no primeiro uso).
+            max_concurrency (int): Chamadas simultâneas ao modelo.
+            timeout (float): Prazo padrão de cada chamada, em segundos.
+            max_retries (int): Novas tentativas após erros transitórios.
+            backoff (float): Espera antes da primeira nova tentativa, em segundos; dobra a cada tentativa.
+            max_backoff (float): Espera máxima entre tentativas, em segundos.
+        """
+        self.generator = generator
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        # O semáforo e as tarefas em andamento pertencem a um event loop; são recriados
+        # se o cliente passar a ser usado em outro (por exemplo, vários `asyncio.run`).
+        self._loop = None
+        self._semaphore = None
+        # sha256 do prompt -> [tarefa compartilhada, número de chamadas esperando por ela]
+        self._in_flight = {}
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._in_flight = {}
+
+    @classmethod
+    def from_env(cls, generator) -> "AsyncGenerator":
+        """Cria o cliente a partir das variáveis GENERATION_*."""
+        return cls(
+            generator,
+            max_concurrency=int(os.getenv("GENERATION_MAX_CONCURRENCY", 8)),
+            timeout=float(os.getenv("GENERATION_TIMEOUT_SECONDS", 30)),
+            max_retries=int(os.getenv("GENERATION_MAX_RETRIES", 4)),
+            backoff=float(os.getenv("GENERATION_BACKOFF_SECONDS", 1.0)),
+            max_backoff=float(os.getenv("GENERATION_MAX_BACKOFF_SECONDS", 16.0))
+        )
+
+    async def generate(self, prompt: str, timeout: float = None) -> str:
+        """
+        Gera a resposta para `prompt`.
+
+        Args:
+            prompt (str): O prompt completo.
+            timeout (float, opcional): Prazo desta chamada, em segundos. Padrão: `self.timeout`.
+
+        Raises:
+            GenerationTimeout: Se o prazo terminar antes da resposta.
+            GenerationUnavailable: Se o modelo continuar recusando chamadas depois das novas tentativas.
+            GenerationError: Se a resposta for bloqueada ou a chamada falhar de forma definitiva.
+        """
+        self._bind_loop()
+        timeout = self.timeout if timeout is None else timeout
+        key = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+        entry = self._in_flight.get(key)
+        if entry is None:
+            # Se a primeira chamada cancelar, as que estiverem esperando continuam
+            # com a mesma tarefa, que respeita o prazo de quem a criou.
+            task = asyncio.ensure_future(self._generate(prompt, time.monotonic() + timeout))
+            entry = self._in_flight[key] = [task, 0]
+
+            def _done(_, entry=entry):
+                if self._in_flight.get(key) is entry:
+                    del self._in_flight[key]
+
+            task.add_done_callback(_done)
+        else:
+            GENERATION_COALESCED.inc()
+
+        task = entry[0]
+        entry[1] += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            GENERATION_ERRORS.inc()
+            logger.error("A geração excedeu o prazo de %.1f s.", timeout)
+            raise GenerationTimeout("A resposta demorou mais que o esperado. Tente novamente em instantes.") from None
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not task.done():
+                task.cancel()
+
+    @staticmethod
+    async def _call(model, prompt: str):
+        if hasattr(model, 'generate_content_async'):
+            return await model.generate_content_async(prompt)
+        return await asyncio.to_thread(model.generate_content, prompt)
+
+    async def _generate(self, prompt: str, deadline: float) -> str:
+        model = self.generator.model
+        if not model:
+            raise GenerationError("Erro: O modelo gerador não foi inicializado corretamente.")
+
+        logger.info("Gerando resposta com o Gemini...")
+        attempt = 0
+        while True:
+            async with self._semaphore:
+                try:
+                    with span("generation"):
+                        response = await self._call(model, prompt)
+                    break
+                except Exception as e:
+                    error = e
+
+            reason = retry_reason(error)
+            delay = min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+            if reason is None or attempt >= self.max_retries or time.monotonic() + delay >= deadline:
+                GENERATION_ERRORS.inc()
+                logger.error("Erro ao chamar a API do Gemini (%d tentativa(s)): %s", attempt + 1, error)
+                if reason is not None:
+                    raise GenerationUnavailable(
+                        "O serviço de geração está sobrecarregado no momento. Tente novamente em instantes."
+                    ) from error
+                raise GenerationError(f"Desculpe, ocorreu um erro ao gerar a resposta: {error}") from error
+
+            GENERATION_RETRIES.inc(reason=reason)
+            logger.warning("Erro transitório do gerador (%s); nova tentativa em %.1f s.", reason, delay)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+        if not response.parts:
+            GENERATION_ERRORS.inc()
+            raise GenerationError("A resposta foi bloqueada devido às políticas de segurança. Tente reformular a pergunta.")
+        logger.info("Resposta gerada com sucesso.")
+        return response.text
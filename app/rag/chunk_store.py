@@ -0,0 +1,248 @@
+import os
+import json
+
+import numpy as np
+from langchain_core.documents import Document
+
+# Valor que marca a ausência do campo em colunas inteiras.
+MISSING_INT = np.iinfo(np.int64).min
+# Campo de metadado que repete o ID do chunk; não é guardado em uma coluna própria.
+ID_FIELD = 'chunk_id'
+
+
+def _is_int(value) -> bool:
+    return isinstance(value, (int, np.integer)) and not isinstance(value, (bool, np.bool_))
+
+
+def _save_array(path: str, array: np.ndarray):
+    with open(path + ".tmp", 'wb') as file:
+        np.save(file, np.ascontiguousarray(array))
+    os.replace(path + ".tmp", path)
+
+
+class ChunkStore:
+    """
+    Armazena textos, IDs e metadados dos chunks em formato colunar compacto.
+
+    - Os textos ficam em um único buffer UTF-8 contíguo (`texts.bin`), com os
+      deslocamentos de cada chunk em um array (`text_offsets.npy`).
+    - Cada campo de metadado é uma coluna: campos inteiros (como `start_index`)
+      são um array int64; os demais são codificados por dicionário, com cada valor
+      distinto (`source_url`, `title`, `section`...) guardado uma única vez e um
+      código int32 por chunk.
+    - Tudo é salvo em arquivos que são abertos com memory-map, então carregar o
+      corpus não cria nenhum objeto Python por chunk.
+
+    `Document`s são criados apenas para as linhas pedidas (`document`), tipicamente
+    o top-k de uma busca.
+    """
+
+    IDS_FILE = "chunk_ids.npy"
+    OFFSETS_FILE = "text_offsets.npy"
+    TEXTS_FILE = "texts.bin"
+    COLUMNS_FILE = "metadata_columns.json"
+
+    def __init__(self):
+        self._ids = np.zeros(0, dtype='S1')
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._text = np.zeros(0, dtype=np.uint8)
+        self._columns = {}
+        # Campos codificados por dicionário: campo -> valores distintos (o código é o índice).
+        self._dictionaries = {}
+        self._codes = {}
+        # Se o metadado `chunk_id` de todas as linhas é igual ao próprio ID.
+        self._id_in_metadata = None
+        # Lotes adicionados e ainda não incorporados aos arrays, para que inserções em
+        # lotes não copiem os arrays inteiros a cada lote.
+        self._pending = []
+        self._pending_count = 0
+
+    def __len__(self):
+        return len(self._ids) + self._pending_count
+
+    @classmethod
+    def exists(cls, directory: str) -> bool:
+        return os.path.exists(os.path.join(directory, cls.COLUMNS_FILE))
+
+    @classmethod
+    def from_records(cls, ids: list, texts: list, metadatas: list) -> "ChunkStore":
+        store = cls()
+        store.append(ids, texts, metadatas)
+        return store
+
+    def append(self, ids: list, texts: list, metadatas: list):
+        if ids:
+            self._pending.append((list(ids), list(texts), list(metadatas)))
+            self._pending_count += len(ids)
+
+    def _code_map(self, field: str) -> dict:
+        if field not in self._codes:
+            self._codes[field] = {value: code for code, value in enumerate(self._dictionaries[field])}
+        return self._codes[field]
+
+    def _intern(self, field: str, value) -> int:
+        if value is None:
+            return -1
+        codes = self._code_map(field)
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self._dictionaries[field])
+            self._dictionaries[field].append(value)
+        return code
+
+    def _to_dictionary(self, field: str):
+        """Converte uma coluna inteira em codificada por dicionário (quando aparece um valor não inteiro)."""
+        column = np.asarray(self._columns[field])
+        self._dictionaries[field] = []
+        self._columns[field] = np.fromiter(
+            (self._intern(field, None if value == MISSING_INT else int(value)) for value in column),
+            dtype=np.int32, count=len(column)
+        )
+
+    def _encode_column(self, field: str, values: list, n_existing: int) -> np.ndarray:
+        numeric = field not in self._dictionaries and all(value is None or _is_int(value) for value in values)
+        if field not in self._columns:
+            if numeric:
+                self._columns[field] = np.full(n_existing, MISSING_INT, dtype=np.int64)
+            else:
+                self._dictionaries[field] = []
+                self._columns[field] = np.full(n_existing, -1, dtype=np.int32)
+        elif not numeric and field not in self._dictionaries:
+            self._to_dictionary(field)
+
+        if field in self._dictionaries:
+            return np.fromiter((self._intern(field, value) for value in values), dtype=np.int32, count=len(values))
+        return np.fromiter((MISSING_INT if value is None else value for value in values),
+                           dtype=np.int64, count=len(values))
+
+    def _consolidate(self):
+        if not self._pending:
+            return
+        ids = [chunk_id for batch in self._pending for chunk_id in batch[0]]
+        texts = [text for batch in self._pending for text in batch[1]]
+        metadatas = [metadata for batch in self._pending for metadata in batch[2]]
+        self._pending = []
+        self._pending_count = 0
+
+        n_existing = len(self._ids)
+        encoded = [text.encode('utf-8') for text in texts]
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        self._offsets = np.concatenate([np.asarray(self._offsets), self._offsets[-1] + np.cumsum(lengths)])
+        self._text = np.concatenate([np.asarray(self._text), np.frombuffer(b"".join(encoded), dtype=np.uint8)])
+        self._ids = np.concatenate([np.asarray(self._ids), np.array([chunk_id.encode('utf-8') for chunk_id in ids])])
+
+        mirrors_id = all(metadata.get(ID_FIELD) == chunk_id for chunk_id, metadata in zip(ids, metadatas))
+        if self._id_in_metadata is None and n_existing == 0:
+            self._id_in_metadata = mirrors_id
+        elif self._id_in_metadata and not mirrors_id:
+            # Passa a guardar o campo como uma coluna comum.
+            self._dictionaries[ID_FIELD] = []
+            self._columns[ID_FIELD] = np.fromiter(
+                (self._intern(ID_FIELD, chunk_id.decode('utf-8')) for chunk_id in self._ids[:n_existing].tolist()),
+                dtype=np.int32, count=n_existing
+            )
+            self._id_in_metadata = False
+
+        fields = set(self._columns) | {field for metadata in metadatas for field in metadata}
+        if self._id_in_metadata:
+            fields.discard(ID_FIELD)
+        for field in sorted(fields):
+            codes = self._encode_column(field, [metadata.get(field) for metadata in metadatas], n_existing)
+            self._columns[field] = np.concatenate([np.asarray(self._columns[field]), codes])
+
+    def ids(self) -> list:
+        self._consolidate()
+        return [chunk_id.decode('utf-8') for chunk_id in self._ids.tolist()]
+
+    def text(self, row: int) -> str:
+        self._consolidate()
+        return self._text[self._offsets[row]:self._offsets[row + 1]].tobytes().decode('utf-8')
+
+    def metadata(self, row: int) -> dict:
+        self._consolidate()
+        metadata = {ID_FIELD: self._ids[row].decode('utf-8')} if self._id_in_metadata else {}
+        for field, column in self._columns.items():
+            value = column[row]
+            if field in self._dictionaries:
+                if value >= 0:
+                    metadata[field] = self._dictionaries[field][value]
+            elif value != MISSING_INT:
+                metadata[field] = int(value)
+        return metadata
+
+    def document(self, row: int) -> Document:
+        return Document(page_content=self.text(row), metadata=self.metadata(row))
+
+    def rows_matching(self, field: str, values: list) -> np.ndarray:
+        """Linhas (ordenadas) em que `field` tem um dos `values`."""
+        self._consolidate()
+        if field == ID_FIELD and self._id_in_metadata:
+            wanted = np.array([value.encode('utf-8') for value in values if isinstance(value, str)])
+            return np.flatnonzero(np.isin(self._ids, wanted)) if len(wanted) else np.zeros(0, dtype=np.int64)
+        column = self._columns.get(field)
+        if column is None:
+            return np.zeros(0, dtype=np.int64)
+        if field in self._dictionaries:
+            codes = self._code_map(field)
+            wanted = [codes[value] for value in values if value in codes]
+        else:
+            wanted = [int(value) for value in values if _is_int(value)]
+        if not wanted:
+            return np.zeros(0, dtype=np.int64)
+        return np.flatnonzero(np.isin(column, wanted))
+
+    def take(self, rows) -> "ChunkStore":
+        """Uma nova ChunkStore só com as linhas `rows`, na ordem dada."""
+        self._consolidate()
+        rows = np.asarray(rows, dtype=np.int64)
+        store = ChunkStore()
+        starts, ends = self._offsets[:-1][rows], self._offsets[1:][rows]
+        store._text = (np.concatenate([self._text[start:end] for start, end in zip(starts, ends)])
+                       if len(rows) else np.zeros(0, dtype=np.uint8))
+        store._offsets = np.concatenate([[0], np.cumsum(ends - starts)]).astype(np.int64)
+        store._ids = np.asarray(self._ids)[rows]
+        store._columns = {field: np.asarray(column)[rows] for field, column in self._columns.items()}
+        store._dictionaries = {field: list(values) for field, values in self._dictionaries.items()}
+        store._id_in_metadata = self._id_in_metadata
+        return store
+
+    def save(self, directory: str):
+        """Grava os arrays e, por último, a descrição das colunas, substituindo os arquivos de forma atômica."""
+        self._consolidate()
+        os.makedirs(directory, exist_ok=True)
+        _save_array(os.path.join(directory, self.IDS_FILE), self._ids)
+        _save_array(os.path.join(directory, self.OFFSETS_FILE), self._offsets)
+        texts_path = os.path.join(directory, self.TEXTS_FILE)
+        with open(texts_path + ".tmp", 'wb') as file:
+            file.write(np.asarray(self._text).tobytes())
+        os.replace(texts_path + ".tmp", texts_path)
+
+        columns = {ID_FIELD: {'mirror': 'ids'}} if self._id_in_metadata else {}
+        for i, (field, column) in enumerate(sorted(self._columns.items())):
+            file_name = f"metadata_{i}.npy"
+            _save_array(os.path.join(directory, file_name), column)
+            columns[field] = {'file': file_name, 'values': self._dictionaries.get(field)}
+        columns_path = os.path.join(directory, self.COLUMNS_FILE)
+        with open(columns_path + ".tmp", 'w', encoding='utf-8') as file:
+            json.dump(columns, file, ensure_ascii=False)
+        os.replace(columns_path + ".tmp", columns_path)
+
+    @classmethod
+    def load(cls, directory: str) -> "ChunkStore":
+        """Abre uma ChunkStore salva, com memory-map em todos os arrays."""
+        store = cls()
+        with open(os.path.join(directory, cls.COLUMNS_FILE), 'r', encoding='utf-8') as file:
+            columns = json.load(file)
+        store._ids = np.load(os.path.join(directory, cls.IDS_FILE), mmap_mode='r')
+        store._offsets = np.load(os.path.join(directory, cls.OFFSETS_FILE), mmap_mode='r')
+        texts_path = os.path.join(directory, cls.TEXTS_FILE)
+        if os.path.getsize(texts_path):
+            store._text = np.memmap(texts_path, dtype=np.uint8, mode='r')
+        store._id_in_metadata = columns.get(ID_FIELD, {}).get('mirror') == 'ids'
+        if store._id_in_metadata:
+            del columns[ID_FIELD]
+        for field, column in columns.items():
+            store._columns[field] = np.load(os.path.join(directory, column['file']), mmap_mode='r')
+            if column['values'] is not None:
+                store._dictionaries[field] = column['values']
+        return store
@@ -0,0 +1,161 @@
+import os
+import math
+
+from .lexical import tokenize
+
+
+class ContextAssembler:
+    """
+    Monta o contexto do prompt a partir dos chunks recuperados.
+
+    1. Chunks da mesma seção que se sobrepõem (por causa do `chunk_overlap`) ou são
+       vizinhos voltam a formar um único trecho contínuo, usando o `start_index`
+       gravado na ingestão.
+    2. Trechos quase idênticos a outro mais bem ranqueado são descartados
+       (similaridade de Jaccard entre os trigramas de palavras).
+    3. Os trechos entram no contexto na ordem do ranking até esgotar o orçamento de
+       tokens; trechos que não cabem são pulados e o primeiro é truncado se preciso.
+    """
+
+    def __init__(self, token_budget: int = 1500, dedup_threshold: float = 0.85,
+                 chars_per_token: float = 4.0, adjacent_gap: int = 2):
+        """
+        Args:
+            token_budget (int): Máximo de tokens do contexto (0 = sem limite).
+            dedup_threshold (float): Similaridade de Jaccard a partir da qual um trecho
+                                     é considerado duplicado (1 desativa o descarte).
+            chars_per_token (float): Caracteres por token usados na estimativa.
+            adjacent_gap (int): Distância máxima, em caracteres, entre dois chunks da
+                                mesma seção para que sejam unidos.
+        """
+        self.token_budget = token_budget
+        self.dedup_threshold = dedup_threshold
+        self.chars_per_token = chars_per_token
+        self.adjacent_gap = adjacent_gap
+
+    @classmethod
+    def from_env(cls):
+        """Cria o montador a partir das variáveis CONTEXT_*."""
+        return cls(
+            token_budget=int(os.getenv("CONTEXT_TOKEN_BUDGET", 1500)),
+            dedup_threshold=float(os.getenv("CONTEXT_DEDUP_THRESHOLD", 0.85)),
+            chars_per_token=float(os.getenv("CONTEXT_CHARS_PER_TOKEN", 4.0))
+        )
+
+    def estimate_tokens(self, text: str) -> int:
+        return math.ceil(len(text) / self.chars_per_token)
+
+    def assemble(self, context_docs: list, stats: dict = None) -> list:
+        """
+        Args:
+            context_docs (list): Os documentos recuperados, do mais para o menos relevante.
+            stats (dict, opcional): Recebe `input_chunks`, `merged_blocks`,
+                                    `duplicates_dropped`, `output_blocks` e `context_tokens`.
+
+        Returns:
+            list: Os trechos de texto do contexto, em ordem de relevância.
+        """
+        blocks = self._merge(context_docs)
+        merged_count = len(blocks)
+        blocks = self._drop_duplicates(blocks)
+        duplicates = merged_count - len(blocks)
+        texts = self._pack(blocks)
+
+        if stats is not None:
+            stats['input_chunks'] = len(context_docs)
+            stats['merged_blocks'] = merged_count
+            stats['duplicates_dropped'] = duplicates
+            stats['output_blocks'] = len(texts)
+            stats['context_tokens'] = sum(self.estimate_tokens(text) for text in texts)
+        return texts
+
+    def _merge(self, context_docs: list) -> list:
+        """
+        Returns:
+            list: Trechos (posição no ranking do melhor chunk, texto), ordenados pelo ranking.
+        """
+        groups = {}
+        standalone = []
+        for rank, doc in enumerate(context_docs):
+            start = doc.metadata.get('start_index')
+            if start is None:
+                standalone.append((rank, doc.page_content))
+                continue
+            key = (doc.metadata.get('source_file'), doc.metadata.get('section'), doc.metadata.get('subsection'))
+            groups.setdefault(key, []).append((int(start), rank, doc.page_content))
+
+        blocks = list(standalone)
+        for spans in groups.values():
+            spans.sort()
+            block_start, block_rank, block_text = spans[0]
+            # Fim do trecho em posições da seção original, e não pelo tamanho do texto
+            # unido, que inclui os espaços inseridos entre chunks vizinhos.
+            block_end = block_start + len(block_text)
+            for start, rank, text in spans[1:]:
+                if start > block_end + self.adjacent_gap:
+                    blocks.append((block_rank, block_text))
+                    block_rank, block_text, block_end = rank, text, start + len(text)
+                    continue
+                end = start + len(text)
+                if end > block_end:
+                    separator = " " if start > block_end else ""
+                    block_text += separator + text[max(0, block_end - start):]
+                    block_end = end
+                block_rank = min(block_rank, rank)
+            blocks.append((block_rank, block_text))
+
+        blocks.sort(key=lambda block: block[0])
+        return blocks
+
+    @staticmethod
+    def _shingles(text: str) -> set:
+        tokens = tokenize(text)
+        if len(tokens) < 3:
+            return set(tokens)
+        return set(zip(tokens, tokens[1:], tokens[2:]))
+
+    def _drop_duplicates(self, blocks: list) -> list:
+        if self.dedup_threshold >= 1:
+            return blocks
+        kept = []
+        kept_shingles = []
+        for rank, text in blocks:
+            shingles = self._shingles(text)
+            duplicate = False
+            for other in kept_shingles:
+                union = len(shingles | other)
+                if union and len(shingles & other) / union >= self.dedup_threshold:
+                    duplicate = True
+                    break
+                # Um trecho inteiramente contido em outro já escolhido também é redundante.
+                if shingles and shingles <= other:
+                    duplicate = True
+                    break
+            if not duplicate:
+                kept.append((rank, text))
+                kept_shingles.append(shingles)
+        return kept
+
+    def _pack(self, blocks: list) -> list:
+        texts = [text for _, text in blocks]
+        if not self.token_budget:
+            return texts
+
+        packed = []
+        remaining = self.token_budget
+        for text in texts:
+            tokens = self.estimate_tokens(text)
+            if tokens <= remaining:
+                packed.append(text)
+                remaining -= tokens
+            elif not packed:
+                packed.append(self._truncate(text, remaining))
+                remaining = 0
+            if remaining <= 0:
+                break
+        return packed
+
+    def _truncate(self, text: str, tokens: int) -> str:
+        limit = int(tokens * self.chars_per_token)
+        cut = text.rfind(" ", 0, limit)
+        return text[:cut if cut > 0 else limit]
@@ -0,0 +1,281 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from .lazy_embeddings import embed_queries
+
+logger = logging.getLogger(__name__)
+
+
+def _open_array(path: str, dtype, shape: tuple) -> np.memmap:
+    """Abre um arquivo memory-mapped, aumentando-o (nunca diminuindo) até caber `shape`."""
+    size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+    with open(path, 'ab') as file:
+        if file.tell() < size:
+            file.truncate(size)
+    return np.memmap(path, dtype=dtype, mode='r+', shape=shape)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Cache em disco na frente de um modelo de embeddings.
+
+    Os vetores ficam em um arquivo memory-mapped (`<modelo>.vectors`) com capacidade
+    fixa de `max_entries` linhas, e um índice SQLite (`<modelo>.sqlite`) mapeia cada
+    chave (hash do texto) para a linha onde o vetor está. Quando o cache enche, as
+    entradas usadas há mais tempo são despejadas e suas linhas reaproveitadas.
+
+    Cada linha também guarda, em `<modelo>.keys`, os primeiros 16 bytes da chave do
+    vetor. A consulta ao SQLite e a leitura do vetor não são atômicas: outro processo
+    pode reaproveitar a linha entre as duas. Por isso a leitura confere a marca antes
+    e depois de copiar o vetor, e uma linha que mudou conta como ausente.
+
+    Como os arquivos são nomeados pelo modelo, cada modelo tem o seu próprio cache,
+    que pode ser compartilhado por vários bancos vetoriais e por vários processos.
+    Dentro de um processo, a conexão SQLite e os arquivos mapeados são usados por
+    uma thread de cada vez (`_lock`); o modelo calcula os embeddings fora do lock.
+    """
+
+    def __init__(self, embeddings: Embeddings, model_name: str, cache_dir: str = ".cache/embeddings",
+                 max_entries: int = 100_000):
+        """
+        Args:
+            embeddings (Embeddings): O modelo de embeddings real.
+            model_name (str): Nome do modelo, usado para separar os caches.
+            cache_dir (str): Diretório onde os arquivos do cache são guardados.
+            max_entries (int): Número máximo de vetores mantidos em disco.
+        """
+        self.embeddings = embeddings
+        self.model_name = model_name or "default"
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        slug = re.sub(r'[^A-Za-z0-9_.-]+', '_', self.model_name)
+        self._vectors_path = os.path.join(cache_dir, f"{slug}.vectors")
+        self._tags_path = os.path.join(cache_dir, f"{slug}.keys")
+        self._db_path = os.path.join(cache_dir, f"{slug}.sqlite")
+        self._conn = None
+        self.reconnect()
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, slot INTEGER UNIQUE, last_used REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+
+        self._set_capacity(max_entries)
+        self._set_meta('model_name', self.model_name)
+        self.capacity = max_entries
+        self._vectors = None
+        self._tags = None
+
+    def reconnect(self):
+        """
+        Abre uma conexão nova com o índice SQLite. Um processo criado por fork deve
+        chamar este método antes de usar o cache, já que conexões SQLite não podem
+        ser compartilhadas entre processos. O lock também é recriado: o do processo
+        pai pode ter sido copiado no fork enquanto outra thread o segurava.
+        """
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self._db_path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+
+    def _get_meta(self, key):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value, replace: bool = False):
+        if replace:
+            self._conn.execute("INSERT INTO meta (key, value) VALUES (?, ?) "
+                               "ON CONFLICT (key) DO UPDATE SET value = excluded.value", (key, str(value)))
+        else:
+            self._conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def _set_capacity(self, capacity: int):
+        """
+        Grava a capacidade. Ao diminuí-la, as entradas nas linhas que deixam de
+        existir são removidas; os arquivos só crescem (em `_open_array`), para não
+        invalidar os mapas de outros processos.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                stored = self._get_meta('capacity')
+                if stored is not None and int(stored) != capacity:
+                    logger.info("Capacidade do cache de embeddings alterada de %s para %d.", stored, capacity)
+                    self._conn.execute("DELETE FROM entries WHERE slot >= ?", (capacity,))
+                    next_slot = int(self._get_meta('next_slot') or 0)
+                    self._set_meta('next_slot', min(next_slot, capacity), replace=True)
+                self._set_meta('capacity', capacity, replace=True)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _open_vectors(self, dim=None):
+        """Abre (ou cria, quando a dimensão já é conhecida) o arquivo memory-mapped."""
+        if self._vectors is not None:
+            return self._vectors
+        stored_dim = self._get_meta('dim')
+        if stored_dim is None:
+            if dim is None:
+                return None
+            self._set_meta('dim', dim)
+            stored_dim = self._get_meta('dim')
+        dim = int(stored_dim)
+        self._tags = _open_array(self._tags_path, np.uint64, (self.capacity, 2))
+        self._vectors = _open_array(self._vectors_path, np.float32, (self.capacity, dim))
+        return self._vectors
+
+    def _key(self, text: str, kind: str) -> str:
+        return hashlib.sha256(f"{kind}\x00{text}".encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _tag(key: str) -> np.ndarray:
+        """A marca de uma chave na linha do vetor: os seus primeiros 16 bytes."""
+        return np.frombuffer(bytes.fromhex(key[:32]), dtype=np.uint64)
+
+    def _read(self, found: dict) -> dict:
+        """
+        Copia os vetores das linhas em `found` (chave -> linha), descartando as que
+        outro processo reaproveitou desde a consulta.
+        """
+        found = {key: slot for key, slot in found.items() if slot < self.capacity}
+        if not found:
+            return {}
+        keys = list(found)
+        slots = np.fromiter(found.values(), dtype=np.int64, count=len(found))
+        expected = np.stack([self._tag(key) for key in keys])
+        with self._lock:
+            memmap = self._open_vectors()
+            if memmap is None:
+                return {}
+            before = self._tags[slots]
+            vectors = np.array(memmap[slots])
+            after = self._tags[slots]
+        valid = (before == expected).all(axis=1) & (after == expected).all(axis=1)
+        return {key: vectors[i] for i, key in enumerate(keys) if valid[i]}
+
+    def _select_slots(self, keys):
+        found = {}
+        unique_keys = list(set(keys))
+        for start in range(0, len(unique_keys), 500):
+            batch = unique_keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = self._conn.execute(
+                f"SELECT key, slot FROM entries WHERE key IN ({placeholders})", batch
+            ).fetchall()
+            found.update(rows)
+        return found
+
+    def _lookup(self, keys):
+        with self._lock:
+            found = self._select_slots(keys)
+            if found:
+                now = time.time()
+                self._conn.executemany("UPDATE entries SET last_used = ? WHERE key = ?",
+                                       [(now, key) for key in found])
+        return found
+
+    def _store(self, keys, vectors):
+        """Grava novos vetores, despejando as entradas menos usadas se necessário."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        keys = keys[-self.capacity:]
+        vectors = vectors[-self.capacity:]
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                memmap = self._open_vectors(vectors.shape[1])
+                if memmap.shape[1] != vectors.shape[1]:
+                    self._conn.execute("ROLLBACK")
+                    return
+
+                # Outro processo pode ter diminuído a capacidade depois que este abriu o cache.
+                capacity = min(self.capacity, int(self._get_meta('capacity')))
+                # Outro processo pode ter gravado as mesmas chaves desde a consulta. Linhas
+                # cuja marca não confere (ex.: de antes de `<modelo>.keys` existir) são regravadas.
+                already = self._select_slots(keys)
+                rewrite = [(key, vec, already[key]) for key, vec in zip(keys, vectors)
+                           if key in already and already[key] < capacity
+                           and not (self._tags[already[key]] == self._tag(key)).all()]
+                pending = [(key, vec) for key, vec in zip(keys, vectors) if key not in already][-capacity:]
+
+                next_slot = int(self._get_meta('next_slot') or 0)
+                free_slots = list(range(next_slot, min(capacity, next_slot + len(pending))))
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('next_slot', ?)",
+                                   (str(next_slot + len(free_slots)),))
+                missing = len(pending) - len(free_slots)
+                if missing > 0:
+                    evicted = self._conn.execute(
+                        "SELECT key, slot FROM entries WHERE slot < ? ORDER BY last_used LIMIT ?", (capacity, missing)
+                    ).fetchall()
+                    self._conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in evicted])
+                    free_slots.extend(slot for _, slot in evicted)
+                    pending = pending[len(pending) - len(free_slots):]
+                    evicted_keys = {key for key, _ in evicted}
+                    rewrite = [entry for entry in rewrite if entry[0] not in evicted_keys]
+
+                writes = [(key, vec, slot) for (key, vec), slot in zip(pending, free_slots)] + rewrite
+                if not writes:
+                    self._conn.execute("COMMIT")
+                    return
+                slots = np.asarray([slot for _, _, slot in writes], dtype=np.int64)
+                # A marca é apagada antes de o vetor ser trocado e gravada depois, para que
+                # um leitor nunca aceite um vetor pela metade.
+                self._tags[slots] = 0
+                memmap[slots] = np.stack([vec for _, vec, _ in writes])
+                self._tags[slots] = np.stack([self._tag(key) for key, _, _ in writes])
+                memmap.flush()
+                self._tags.flush()
+                now = time.time()
+                rows = [(key, int(slot), now) for key, _, slot in writes[:len(pending)]]
+                self._conn.executemany("INSERT INTO entries (key, slot, last_used) VALUES (?, ?, ?)", rows)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _embed(self, texts, kind, compute):
+        keys = [self._key(text, kind) for text in texts]
+        found = self._lookup(keys)
+        cached = self._read(found) if found else {}
+
+        results = [None] * len(texts)
+        missing = {}
+        for i, key in enumerate(keys):
+            if key in cached:
+                results[i] = cached[key].tolist()
+            else:
+                missing.setdefault(key, []).append(i)
+
+        with self._lock:
+            self.hits += len(texts) - sum(len(positions) for positions in missing.values())
+            self.misses += len(missing)
+
+        if missing:
+            missing_keys = list(missing)
+            missing_texts = [texts[missing[key][0]] for key in missing_keys]
+            new_vectors = compute(missing_texts)
+            for key, vector in zip(missing_keys, new_vectors):
+                for i in missing[key]:
+                    results[i] = list(vector)
+            self._store(missing_keys, new_vectors)
+        return results
+
+    def embed_documents(self, texts):
+        return self._embed(list(texts), "document", self.embeddings.embed_documents)
+
+    def embed_query(self, text):
+        return self._embed([text], "query", lambda texts: [self.embeddings.embed_query(texts[0])])[0]
+
+    def embed_queries(self, texts):
+        return self._embed(list(texts), "query", lambda missing: embed_queries(self.embeddings, missing))
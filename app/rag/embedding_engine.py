@@ -0,0 +1,187 @@
+import os
+import time
+import logging
+import threading
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.core.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_NAME = "sentence-transformers/all-mpnet-base-v2"
+
+EMBEDDED_TEXTS = REGISTRY.counter(
+    "rag_embedding_texts_total", "Textos processados pelo motor de embeddings."
+)
+EMBEDDING_SECONDS = REGISTRY.counter(
+    "rag_embedding_seconds_total", "Tempo gasto pelo motor de embeddings, em segundos."
+)
+
+
+class CPUEmbeddingEngine(Embeddings):
+    """
+    Motor de embeddings otimizado para CPU, sobre o sentence-transformers.
+
+    - Pesos das camadas lineares quantizados dinamicamente para int8 (`quantize`),
+      o que costuma reduzir a latência em 1,5-2x com perda mínima de qualidade.
+    - Número de threads intra-op do torch controlado (`num_threads`).
+    - Textos ordenados por tamanho antes de formar os lotes, de modo que cada lote
+      tenha textos de comprimento parecido e pouco padding.
+    - Uma passada de aquecimento na construção, para que a primeira consulta real
+      não pague a inicialização preguiçosa do torch.
+    - Carregamento apenas de arquivos locais (`local_files_only`), sem rede.
+
+    A vazão acumulada (textos por segundo) fica em `stats`.
+    """
+
+    def __init__(self, model_name: str = None, num_threads: int = None, quantize: bool = True,
+                 batch_size: int = 32, sort_by_length: bool = True, warm_up: bool = True,
+                 local_files_only: bool = False, max_seq_length: int = None, model=None):
+        """
+        Args:
+            model_name (str): Nome ou caminho do modelo sentence-transformers.
+            num_threads (int, opcional): Threads intra-op do torch. Afeta o processo inteiro.
+            quantize (bool): Aplica quantização dinâmica int8 às camadas lineares.
+            batch_size (int): Textos por lote.
+            sort_by_length (bool): Agrupa textos de tamanho parecido nos lotes.
+            warm_up (bool): Roda um lote de aquecimento na construção.
+            local_files_only (bool): Usa apenas o modelo já presente no cache local.
+            max_seq_length (int, opcional): Trunca as entradas neste número de tokens.
+            model (opcional): Um modelo já carregado com a interface `encode` do
+                              sentence-transformers (usado em testes).
+        """
+        self.model_name = model_name or DEFAULT_MODEL_NAME
+        self.batch_size = batch_size
+        self.sort_by_length = sort_by_length
+        self.quantize = quantize
+        self._texts = 0
+        self._seconds = 0.0
+        self._lock = threading.Lock()
+
+        if model is None:
+            model = self._load_model(num_threads, local_files_only)
+        self.model = model
+        if max_seq_length:
+            self.model.max_seq_length = max_seq_length
+
+        if warm_up:
+            self._encode(["aquecimento do modelo de embeddings"] * min(batch_size, 8), record=False)
+
+    def _load_model(self, num_threads: int, local_files_only: bool):
+        # Importados aqui: torch e sentence-transformers levam segundos para carregar.
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        logger.info("Carregando o modelo de embeddings '%s' (threads=%s, int8=%s, somente local=%s)...",
+                    self.model_name, torch.get_num_threads(), self.quantize, local_files_only)
+        model = SentenceTransformer(self.model_name, device="cpu", local_files_only=local_files_only)
+        model.eval()
+        if self.quantize:
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return model
+
+    @classmethod
+    def from_env(cls, model_name: str = None) -> "CPUEmbeddingEngine":
+        """Cria o motor a partir das variáveis EMBEDDING_*."""
+        threads = os.getenv("EMBEDDING_THREADS")
+        max_seq_length = os.getenv("EMBEDDING_MAX_SEQ_LENGTH")
+        offline = os.getenv("HF_HUB_OFFLINE", "0").lower() in ("1", "true", "yes")
+        return cls(
+            model_name=model_name,
+            num_threads=int(threads) if threads else None,
+            quantize=os.getenv("EMBEDDING_QUANTIZE", "true").lower() in ("1", "true", "yes"),
+            batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", 32)),
+            local_files_only=offline or os.getenv("EMBEDDING_LOCAL_FILES_ONLY", "false").lower() in ("1", "true", "yes"),
+            max_seq_length=int(max_seq_length) if max_seq_length else None
+        )
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'texts': self._texts,
+                'seconds': self._seconds,
+                'texts_per_second': self._texts / self._seconds if self._seconds else None,
+            }
+
+    def _encode(self, texts: list, record: bool = True) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i])) if self.sort_by_length else range(len(texts))
+        order = list(order)
+
+        start = time.perf_counter()
+        batches = []
+        for offset in range(0, len(order), self.batch_size):
+            batch = [texts[i] for i in order[offset:offset + self.batch_size]]
+            batches.append(np.asarray(self.model.encode(
+                batch, batch_size=len(batch), convert_to_numpy=True, show_progress_bar=False
+            ), dtype=np.float32))
+        elapsed = time.perf_counter() - start
+
+        sorted_vectors = np.concatenate(batches)
+        vectors = np.empty_like(sorted_vectors)
+        vectors[order] = sorted_vectors
+
+        if record:
+            with self._lock:
+                self._texts += len(texts)
+                self._seconds += elapsed
+            EMBEDDED_TEXTS.inc(len(texts))
+            EMBEDDING_SECONDS.inc(elapsed)
+            logger.debug("%d textos em %.0f ms (%.0f textos/s).", len(texts), elapsed * 1000,
+                         len(texts) / elapsed if elapsed else float('inf'))
+        return vectors
+
+    def embed_documents(self, texts):
+        return self._encode(list(texts)).tolist()
+
+    def embed_query(self, text):
+        return self._encode([text])[0].tolist()
+
+    def embed_queries(self, texts):
+        # As queries não têm prefixo próprio neste motor: o lote é o mesmo de `embed_query`.
+        return self._encode(list(texts)).tolist()
+
+
+def _benchmark(model_name: str, n_texts: int, configurations: list):
+    """Mede a vazão de algumas configurações sobre chunks reais de `data/`."""
+    from app.rag.ingestion import iter_chunks
+
+    texts = [doc.page_content for _, doc in iter_chunks(1000, 200)][:n_texts]
+    while texts and len(texts) < n_texts:
+        texts = texts + texts[:n_texts - len(texts)]
+    for label, options in configurations:
+        engine = CPUEmbeddingEngine(model_name, **options)
+        engine.embed_documents(texts)
+        stats = engine.stats
+        print(f"{label:<28} {stats['texts_per_second']:8.1f} textos/s ({stats['texts']} textos)")
+
+
+if __name__ == "__main__":
+    import argparse
+    from dotenv import load_dotenv
+    from app.core.logging_config import configure_logging
+
+    load_dotenv()
+    configure_logging()
+    parser = argparse.ArgumentParser(description="Mede a vazão do motor de embeddings em CPU.")
+    parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL_NAME"))
+    parser.add_argument("--texts", type=int, default=256)
+    parser.add_argument("--threads", type=int, nargs="+", default=[os.cpu_count() or 1])
+    parser.add_argument("--local-files-only", action="store_true")
+    args = parser.parse_args()
+
+    configurations = []
+    for threads in args.threads:
+        for quantize in (False, True):
+            for sort_by_length in (False, True):
+                label = f"threads={threads} int8={quantize} ordenado={sort_by_length}"
+                configurations.append((label, {'num_threads': threads, 'quantize': quantize,
+                                               'sort_by_length': sort_by_length,
+                                               'local_files_only': args.local_files_only}))
+    _benchmark(args.model, args.texts, configurations)
@@ -0,0 +1,152 @@
+import re
+import time
+import asyncio
+import hashlib
+import threading
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+_TOKEN = re.compile(r'\w+')
+
+
+class FakeResponse:
+    """Imita a resposta (ou um pedaço da resposta em streaming) do Gemini."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.parts = [text] if text else []
+
+
+class FakeRateLimitError(Exception):
+    """Imita o erro 429 (`ResourceExhausted`) da API do Gemini."""
+
+    code = 429
+
+
+class FakeGenerativeModel:
+    """
+    Modelo gerador local com a mesma interface de `genai.GenerativeModel`, para
+    testar o pipeline (inclusive em streaming e com `generate_content_async`) sem
+    rede e sem API key.
+
+    A resposta é fixa ou, por padrão, derivada do próprio prompt, e é emitida em
+    pedaços de `words_per_chunk` palavras com atrasos configuráveis. As primeiras
+    `rate_limit_errors` chamadas falham com `FakeRateLimitError`.
+    """
+
+    def __init__(self, response_text: str = None, words_per_chunk: int = 3,
+                 first_token_delay: float = 0.0, chunk_delay: float = 0.0, rate_limit_errors: int = 0):
+        """
+        Args:
+            response_text (str): Texto fixo da resposta. Se omitido, a resposta cita o
+                                 tamanho do prompt e a sua última linha não vazia.
+            words_per_chunk (int): Palavras por pedaço no modo streaming.
+            first_token_delay (float): Atraso, em segundos, antes do primeiro pedaço.
+            chunk_delay (float): Atraso, em segundos, entre os pedaços seguintes.
+            rate_limit_errors (int): Número de chamadas iniciais que falham por limite de taxa.
+        """
+        self.response_text = response_text
+        self.words_per_chunk = words_per_chunk
+        self.first_token_delay = first_token_delay
+        self.chunk_delay = chunk_delay
+        self.rate_limit_errors = rate_limit_errors
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _count_call(self):
+        with self._lock:
+            self.calls += 1
+            if self.calls <= self.rate_limit_errors:
+                raise FakeRateLimitError("429 Resource has been exhausted (e.g. check quota).")
+
+    def _answer(self, prompt: str) -> str:
+        if self.response_text is not None:
+            return self.response_text
+        lines = [line.strip() for line in prompt.splitlines() if line.strip()]
+        last_line = lines[-1] if lines else ""
+        return f"Resposta de teste para um prompt de {len(prompt)} caracteres ({last_line})."
+
+    def _stream(self, text: str):
+        words = text.split(" ")
+        time.sleep(self.first_token_delay)
+        for start in range(0, len(words), self.words_per_chunk):
+            if start:
+                time.sleep(self.chunk_delay)
+            piece = " ".join(words[start:start + self.words_per_chunk])
+            yield FakeResponse(piece if start + self.words_per_chunk >= len(words) else piece + " ")
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        self._count_call()
+        text = self._answer(prompt)
+        if stream:
+            return self._stream(text)
+        time.sleep(self.first_token_delay)
+        return FakeResponse(text)
+
+    async def generate_content_async(self, prompt: str):
+        self._count_call()
+        await asyncio.sleep(self.first_token_delay)
+        return FakeResponse(self._answer(prompt))
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Modelo de embeddings determinístico e local, por feature hashing: cada palavra
+    soma ±1 em uma dimensão escolhida pelo seu hash. Textos com palavras em comum
+    ficam próximos, o que basta para benchmarks e testes sem baixar modelos.
+    """
+
+    def __init__(self, dimension: int = 384):
+        """
+        Args:
+            dimension (int): Dimensão dos vetores gerados.
+        """
+        self.dimension = dimension
+        self._token_slots = {}
+
+    def _slot(self, token: str) -> tuple:
+        slot = self._token_slots.get(token)
+        if slot is None:
+            value = int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'little')
+            slot = self._token_slots[token] = (value % self.dimension, 1.0 if (value >> 32) & 1 else -1.0)
+        return slot
+
+    def embed_array(self, texts: list) -> np.ndarray:
+        """Como `embed_documents`, mas devolve uma matriz float32 normalizada."""
+        matrix = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            slots = [self._slot(token) for token in _TOKEN.findall(text.lower())]
+            if slots:
+                columns, signs = zip(*slots)
+                np.add.at(matrix[row], np.asarray(columns), np.asarray(signs, dtype=np.float32))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def embed_documents(self, texts):
+        return self.embed_array(list(texts)).tolist()
+
+    def embed_query(self, text):
+        return self.embed_array([text])[0].tolist()
+
+
+class FakeCrossEncoder:
+    """
+    Imita `sentence_transformers.CrossEncoder` para testes e benchmarks sem baixar
+    modelos: a pontuação de um par é a fração das palavras da pergunta (com mais de
+    três letras) que aparecem no texto.
+    """
+
+    def __init__(self):
+        self.pairs_scored = 0
+
+    def predict(self, pairs, batch_size: int = 32, **kwargs) -> np.ndarray:
+        scores = np.zeros(len(pairs), dtype=np.float32)
+        for i, (query, text) in enumerate(pairs):
+            query_tokens = {token for token in _TOKEN.findall(query.lower()) if len(token) > 3}
+            if query_tokens:
+                text_tokens = set(_TOKEN.findall(text.lower()))
+                scores[i] = len(query_tokens & text_tokens) / len(query_tokens)
+        self.pairs_scored += len(pairs)
+        return scores
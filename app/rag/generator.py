@@ -1,49 +1,169 @@
 import os
-from dotenv import load_dotenv
-import google.generativeai as genai
+import time
+import threading
+import logging
+
+from .fake_models import FakeGenerativeModel
+from app.core.metrics import span, STAGE_SECONDS, TIME_TO_FIRST_TOKEN, GENERATION_ERRORS
+
+logger = logging.getLogger(__name__)
+
+
+class GenerationError(Exception):
+    """Falha ao gerar uma resposta. A mensagem é adequada para ser exibida ao usuário."""
+
+
+class GenerationUnavailable(GenerationError):
+    """O gerador continuou recusando chamadas (limite de taxa, indisponibilidade) depois das novas tentativas."""
+
+
+class GenerationTimeout(GenerationError):
+    """A resposta não ficou pronta dentro do prazo da chamada."""
 
-load_dotenv()
 
 class RAGGenerator:
-    def __init__(self):
+    def __init__(self, model=None):
+        """
+        Prepara o gerador. O cliente da API do Gemini só é configurado no primeiro
+        uso (ou em `warm_up`), já que importar `google.generativeai` é lento.
+
+        Args:
+            model (opcional): Um modelo com a mesma interface de `genai.GenerativeModel`,
+                              usado no lugar do Gemini (por exemplo, `FakeGenerativeModel`
+                              em testes). Com GENERATOR_BACKEND=fake, o modelo falso
+                              local é usado automaticamente.
+        """
+        self._model = model
+        self._configured = model is not None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if not self._configured:
+            with self._lock:
+                if not self._configured:
+                    self._model = self._configure_model()
+                    self._configured = True
+        return self._model
+
+    def warm_up(self):
+        """Configura o cliente do modelo antes da primeira pergunta."""
+        return self.model is not None
+
+    def _configure_model(self):
         """
         Configura o cliente da API do Gemini.
         """
-        print("Configurando o gerador com a API do Gemini...")
+        if os.getenv("GENERATOR_BACKEND", "gemini") == "fake":
+            logger.info("Usando o modelo gerador falso local (GENERATOR_BACKEND=fake).")
+            # FAKE_GENERATOR_DELAY simula a latência do Gemini em testes de carga.
+            return FakeGenerativeModel(first_token_delay=float(os.getenv("FAKE_GENERATOR_DELAY", 0)))
+
+        logger.info("Configurando o gerador com a API do Gemini...")
         
         try:
             api_key = os.getenv("GOOGLE_API_KEY")
             if not api_key:
                 raise ValueError("API key do Google não encontrada. Verifique seu arquivo .env")
             
+            import google.generativeai as genai
             genai.configure(api_key=api_key)
             
-            self.model = genai.GenerativeModel('gemini-1.5-flash')
-            print("Gerador Gemini configurado com sucesso. ✨")
+            model = genai.GenerativeModel('gemini-1.5-flash')
+            logger.info("Gerador Gemini configurado com sucesso.")
+            return model
 
         except Exception as e:
-            print(f"Erro ao configurar o gerador Gemini: {e}")
-            self.model = None
+            logger.error("Erro ao configurar o gerador Gemini: %s", e)
+            return None
 
-    def generate_response(self, prompt: str) -> str:
+    def generate(self, prompt: str) -> str:
         """
         Gera uma resposta usando o modelo Gemini a partir de um prompt.
+
+        Raises:
+            GenerationError: Se o modelo não estiver configurado, se a resposta for
+                             bloqueada ou se a chamada à API falhar. A mensagem da
+                             exceção pode ser mostrada diretamente ao usuário.
         """
         if not self.model:
-            return "Erro: O modelo gerador não foi inicializado corretamente."
+            raise GenerationError("Erro: O modelo gerador não foi inicializado corretamente.")
             
-        print("Gerando resposta com o Gemini...")
+        logger.info("Gerando resposta com o Gemini...")
         
         try:
-            response = self.model.generate_content(prompt)
-            
-            if not response.parts:
-                 return "A resposta foi bloqueada devido às políticas de segurança. Tente reformular a pergunta."
+            with span("generation"):
+                response = self.model.generate_content(prompt)
+        except Exception as e:
+            logger.error("Erro ao chamar a API do Gemini: %s", e)
+            GENERATION_ERRORS.inc()
+            raise GenerationError(f"Desculpe, ocorreu um erro ao gerar a resposta: {e}") from e
             
-            generated_text = response.text
+        if not response.parts:
+            GENERATION_ERRORS.inc()
+            raise GenerationError("A resposta foi bloqueada devido às políticas de segurança. Tente reformular a pergunta.")
             
-            print("Resposta gerada com sucesso.")
-            return generated_text
+        generated_text = response.text
+        
+        logger.info("Resposta gerada com sucesso.")
+        return generated_text
+
+    def generate_response(self, prompt: str) -> str:
+        """
+        Gera uma resposta usando o modelo Gemini a partir de um prompt. Em caso de
+        falha, devolve a mensagem de erro como texto para o usuário.
+        """
+        try:
+            return self.generate(prompt)
+        except GenerationError as e:
+            return str(e)
+
+    def generate_response_stream(self, prompt: str, stats: dict = None):
+        """
+        Gera a resposta em streaming, produzindo pedaços de texto assim que o Gemini
+        os devolve.
+
+        Args:
+            prompt (str): O prompt completo.
+            stats (dict, opcional): Recebe `time_to_first_token` e `total_time`, em segundos,
+                                    e `error` quando a resposta é uma mensagem de erro.
+        """
+        if not self.model:
+            if stats is not None:
+                stats['error'] = True
+            yield "Erro: O modelo gerador não foi inicializado corretamente."
+            return
+
+        logger.info("Gerando resposta em streaming com o Gemini...")
+        start = time.perf_counter()
+        produced_text = False
+
+        try:
+            for chunk in self.model.generate_content(prompt, stream=True):
+                if not chunk.parts:
+                    continue
+                if not produced_text:
+                    produced_text = True
+                    time_to_first_token = time.perf_counter() - start
+                    if stats is not None:
+                        stats['time_to_first_token'] = time_to_first_token
+                    TIME_TO_FIRST_TOKEN.observe(time_to_first_token)
+                    logger.info("Primeiro pedaço da resposta em %.0f ms.", time_to_first_token * 1000)
+                yield chunk.text
+
+            if not produced_text:
+                GENERATION_ERRORS.inc()
+                if stats is not None:
+                    stats['error'] = True
+                yield "A resposta foi bloqueada devido às políticas de segurança. Tente reformular a pergunta."
         except Exception as e:
-            print(f"Erro ao chamar a API do Gemini: {e}")
-            return f"Desculpe, ocorreu um erro ao gerar a resposta: {e}"
\ No newline at end of file
+            logger.error("Erro ao chamar a API do Gemini: %s", e)
+            GENERATION_ERRORS.inc()
+            if stats is not None:
+                stats['error'] = True
+            yield f"Desculpe, ocorreu um erro ao gerar a resposta: {e}"
+        finally:
+            total_time = time.perf_counter() - start
+            STAGE_SECONDS.observe(total_time, stage="generation")
+            if stats is not None:
+                stats['total_time'] = total_time
@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def corpus_hash(json_paths: list) -> str:
+    """Hash do conteúdo de todos os arquivos do corpus (independente da ordem da lista)."""
+    digest = hashlib.sha256()
+    for path in sorted(json_paths, key=os.path.basename):
+        file_digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                file_digest.update(block)
+        digest.update(os.path.basename(path).encode('utf-8'))
+        digest.update(file_digest.digest())
+    return digest.hexdigest()
+
+
+def corpus_files(json_paths: list) -> dict:
+    """
+    Tamanho e data de modificação de cada arquivo do corpus. Só usa `stat`, então
+    serve para verificar a cada inicialização, sem ler o corpus, se ele mudou desde
+    a construção de uma versão.
+    """
+    files = {}
+    for path in json_paths:
+        stat = os.stat(path)
+        files[os.path.basename(path)] = [stat.st_size, stat.st_mtime_ns]
+    return files
+
+
+def config_fingerprint(config: dict) -> str:
+    """Identificador estável de uma configuração de índice."""
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def _write_atomic(path: str, content: str):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        file.write(content)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+class IndexVersions:
+    """
+    Versões do índice dentro de `root`:
+
+        root/CURRENT                      nome da versão ativa
+        root/versions/<nome>/             banco vetorial, índices BM25 e de obras
+        root/versions/<nome>/manifest.json
+
+    Uma versão nova é construída no seu próprio diretório e o manifesto só é
+    gravado quando ela está completa; depois, `CURRENT` é trocado com `os.replace`,
+    que é atômico. Leitores nunca veem um índice pela metade, e os que ainda usam a
+    versão anterior continuam funcionando até recarregarem.
+
+    Ao deixar de ser a ativa, uma versão recebe o arquivo `RETIRED`, cuja data marca
+    quando isso aconteceu. `prune` só remove versões aposentadas há mais de
+    `grace_seconds`, para que os processos que ainda a usam (por exemplo, os outros
+    workers do servidor pre-fork, com o índice em memory-map) tenham tempo de recarregar.
+    """
+
+    CURRENT_FILE = "CURRENT"
+    VERSIONS_DIRECTORY = "versions"
+    MANIFEST_FILE = "manifest.json"
+    RETIRED_FILE = "RETIRED"
+    # Diretórios sem manifesto mais antigos que isso são sobras de construções interrompidas.
+    STALE_BUILD_SECONDS = 3600
+
+    def __init__(self, root: str):
+        self.root = root
+        self.versions_directory = os.path.join(root, self.VERSIONS_DIRECTORY)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.versions_directory, name)
+
+    def current(self):
+        """
+        Returns:
+            str | None: O nome da versão ativa, ou None se ainda não há nenhuma.
+        """
+        try:
+            with open(os.path.join(self.root, self.CURRENT_FILE), 'r', encoding='utf-8') as file:
+                name = file.read().strip()
+        except FileNotFoundError:
+            return None
+        return name if name and self.manifest(name) is not None else None
+
+    def manifest(self, name: str):
+        try:
+            with open(os.path.join(self.path(name), self.MANIFEST_FILE), 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def complete_versions(self) -> list:
+        """Nomes das versões completas, da mais antiga para a mais recente."""
+        if not os.path.isdir(self.versions_directory):
+            return []
+        manifests = {name: self.manifest(name) for name in os.listdir(self.versions_directory)}
+        complete = [name for name, manifest in manifests.items() if manifest is not None]
+        return sorted(complete, key=lambda name: (manifests[name].get('created_at', ''), name))
+
+    def find(self, fingerprint: str):
+        """
+        Procura uma versão completa construída com a mesma configuração, dando
+        preferência à versão ativa e depois à mais recente.
+        """
+        current = self.current()
+        candidates = ([current] if current else []) + self.complete_versions()[::-1]
+        for name in candidates:
+            if self.manifest(name).get('fingerprint') == fingerprint:
+                return name
+        return None
+
+    def create(self, fingerprint: str) -> str:
+        """Cria o diretório de uma versão nova e devolve o seu nome."""
+        os.makedirs(self.versions_directory, exist_ok=True)
+        base = f"{time.strftime('%Y%m%d-%H%M%S')}-{fingerprint[:8]}"
+        for attempt in range(1000):
+            name = base if attempt == 0 else f"{base}-{attempt}"
+            try:
+                os.makedirs(self.path(name))
+                return name
+            except FileExistsError:
+                continue
+        raise RuntimeError(f"Não foi possível criar um diretório de versão em '{self.versions_directory}'.")
+
+    def write_manifest(self, name: str, manifest: dict):
+        _write_atomic(os.path.join(self.path(name), self.MANIFEST_FILE),
+                      json.dumps(manifest, ensure_ascii=False, indent=2))
+
+    def commit(self, name: str, manifest: dict):
+        """Grava o manifesto (marcando a versão como completa) e a torna a versão ativa."""
+        self.write_manifest(name, manifest)
+        self.activate(name)
+
+    def activate(self, name: str):
+        previous = self.current()
+        try:
+            os.remove(os.path.join(self.path(name), self.RETIRED_FILE))
+        except FileNotFoundError:
+            pass
+        _write_atomic(os.path.join(self.root, self.CURRENT_FILE), name + "\n")
+        if previous is not None and previous != name:
+            self._retire(previous)
+
+    def _retire(self, name: str):
+        with open(os.path.join(self.path(name), self.RETIRED_FILE), 'w', encoding='utf-8') as file:
+            file.write(f"{time.time()}\n")
+
+    def _retired_for(self, name: str):
+        """Segundos desde que a versão deixou de ser a ativa, ou None se não há registro."""
+        try:
+            return time.time() - os.path.getmtime(os.path.join(self.path(name), self.RETIRED_FILE))
+        except FileNotFoundError:
+            return None
+
+    def discard(self, name: str):
+        shutil.rmtree(self.path(name), ignore_errors=True)
+
+    def prune(self, keep: int = 2, grace_seconds: float = 600):
+        """
+        Remove as versões completas mais antigas (mantendo as `keep` mais recentes, a
+        ativa e as aposentadas há menos de `grace_seconds`) e as sobras de construções
+        interrompidas.
+        """
+        current = self.current()
+        complete = self.complete_versions()
+        for name in complete[:max(0, len(complete) - keep)]:
+            if name == current:
+                continue
+            retired_for = self._retired_for(name)
+            if retired_for is None:
+                # Versão de antes do registro de aposentadoria: o prazo começa agora.
+                self._retire(name)
+            elif retired_for >= grace_seconds:
+                logger.info("Removendo a versão antiga do índice '%s'.", name)
+                self.discard(name)
+
+        now = time.time()
+        for name in os.listdir(self.versions_directory) if os.path.isdir(self.versions_directory) else []:
+            path = self.path(name)
+            if name not in complete and now - os.path.getmtime(path) > self.STALE_BUILD_SECONDS:
+                logger.info("Removendo a construção incompleta '%s'.", name)
+                self.discard(name)
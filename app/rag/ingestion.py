@@ -0,0 +1,180 @@
+import os
+import json
+import hashlib
+import itertools
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from langchain_core.documents import Document
+
+DATA_DIRECTORY = 'data'
+
+logger = logging.getLogger(__name__)
+
+
+def chunk_id_for(metadata: dict, text: str, seen: dict) -> str:
+    """
+    Gera um ID determinístico para um chunk a partir do seu conteúdo.
+
+    O hash combina arquivo de origem, seção, subseção e texto do chunk, de modo
+    que um chunk só muda de ID quando o seu conteúdo (ou a seção onde ele está)
+    muda. Chunks idênticos dentro da mesma seção recebem um sufixo de ocorrência,
+    contado em `seen`.
+    """
+    key = "\x1f".join([
+        metadata.get('source_file', ''),
+        metadata.get('section', ''),
+        metadata.get('subsection', ''),
+        text,
+    ])
+    chunk_id = hashlib.sha256(key.encode('utf-8')).hexdigest()
+    occurrence = seen.get(chunk_id, 0)
+    seen[chunk_id] = occurrence + 1
+    if occurrence:
+        chunk_id = f"{chunk_id}-{occurrence}"
+    return chunk_id
+
+
+def _section_text(section_data: dict) -> str:
+    parts = []
+    for item in section_data.get('content', []):
+        if item.get('type') == 'paragraph':
+            parts.append(item.get('text', ''))
+            parts.append("\n\n")
+        elif item.get('type') == 'works_list':
+            parts.append(f"Categoria: {item.get('category', '')}\n")
+            for work in item.get('items', []):
+                year = work.get('year')
+                title = work.get('title')
+                parts.append(f"- {title} ({year})\n" if year else f"- {title}\n")
+            parts.append("\n")
+    return "".join(parts)
+
+
+def _subsection_text(subsection_data: dict) -> str:
+    parts = []
+    for item in subsection_data.get('content', []):
+        if item.get('type') == 'paragraph':
+            parts.append(item.get('text', ''))
+            parts.append("\n\n")
+    return "".join(parts)
+
+
+def chunk_file(json_path: str, chunk_size: int, chunk_overlap: int) -> list:
+    """
+    Lê um arquivo JSON do scraper e o divide em chunks.
+
+    É a unidade de trabalho dos processos de ingestão, por isso devolve apenas
+    tipos simples (fáceis de serializar entre processos).
+
+    Returns:
+        list: Tuplas (chunk_id, texto, metadados), na ordem do documento.
+    """
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        add_start_index=True
+    )
+
+    with open(json_path, 'r', encoding='utf-8') as file:
+        data = json.load(file)
+
+    global_metadata = {
+        'source_url': data.get('metadata', {}).get('source_url', 'N/A'),
+        'title': data.get('metadata', {}).get('title', 'Sem Título'),
+        'source_file': os.path.basename(json_path)
+    }
+
+    chunks = []
+    seen = {}
+
+    def _add(full_text, metadata):
+        # `start_index` (posição do chunk no texto da seção) permite que a montagem do
+        # contexto junte novamente chunks vizinhos; ele não entra no ID do chunk.
+        for split in text_splitter.create_documents([full_text], [metadata]):
+            text = split.page_content
+            chunk_metadata = dict(split.metadata)
+            chunk_metadata['chunk_id'] = chunk_id_for(chunk_metadata, text, seen)
+            chunks.append((chunk_metadata['chunk_id'], text, chunk_metadata))
+
+    for section in data.get('content_sections', []):
+        section_title = section.get('section_title', 'Sem Título')
+        section_text = _section_text(section).strip()
+        if section_text:
+            _add(f"Título da Seção: {section_title}\n\n{section_text}",
+                 {**global_metadata, 'section': section_title})
+
+        for subsection in section.get('subsections', []):
+            subsection_title = subsection.get('subsection_title', 'Sem Subtítulo')
+            subsection_text = _subsection_text(subsection).strip()
+            if subsection_text:
+                _add(f"Título da Seção: {section_title}\nTítulo da Subseção: {subsection_title}\n\n{subsection_text}",
+                     {**global_metadata, 'section': section_title, 'subsection': subsection_title})
+
+    return chunks
+
+
+def list_data_files(data_directory: str = DATA_DIRECTORY) -> list:
+    if not os.path.exists(data_directory):
+        return []
+    return sorted(
+        os.path.join(data_directory, filename)
+        for filename in os.listdir(data_directory)
+        if filename.endswith('.json')
+    )
+
+
+def iter_chunks(chunk_size: int, chunk_overlap: int, data_directory: str = DATA_DIRECTORY,
+                workers: int = None, min_files_for_pool: int = 8):
+    """
+    Produz os chunks de todos os arquivos de `data_directory` como um gerador.
+
+    Os arquivos são processados em paralelo por `workers` processos, com no máximo
+    `2 * workers` arquivos em andamento, e os chunks saem na ordem dos arquivos.
+    Assim a memória usada depende do tamanho de alguns arquivos, e não do corpus.
+    Com poucos arquivos, o processamento é feito no próprio processo.
+
+    Yields:
+        tuple: (chunk_id, Document)
+    """
+    paths = list_data_files(data_directory)
+    if workers is None:
+        workers = int(os.getenv("INGEST_WORKERS", os.cpu_count() or 1))
+
+    def _documents(path, chunks):
+        logger.info("  -> Processado arquivo: %s (%d chunks)", os.path.basename(path), len(chunks))
+        for chunk_id, text, metadata in chunks:
+            yield chunk_id, Document(page_content=text, metadata=metadata)
+
+    if workers <= 1 or len(paths) < min_files_for_pool:
+        for path in paths:
+            yield from _documents(path, chunk_file(path, chunk_size, chunk_overlap))
+        return
+
+    # "spawn" evita copiar para os filhos um processo que pode já ter threads do torch.
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        pending = deque()
+        remaining = iter(paths)
+        for path in itertools.islice(remaining, 2 * workers):
+            pending.append((path, executor.submit(chunk_file, path, chunk_size, chunk_overlap)))
+        while pending:
+            path, future = pending.popleft()
+            chunks = future.result()
+            next_path = next(remaining, None)
+            if next_path is not None:
+                pending.append((next_path, executor.submit(chunk_file, next_path, chunk_size, chunk_overlap)))
+            yield from _documents(path, chunks)
+
+
+def batched(iterable, size: int):
+    """Agrupa um iterável em listas de até `size` itens."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
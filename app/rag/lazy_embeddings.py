@@ -0,0 +1,55 @@
+import threading
+
+from langchain_core.embeddings import Embeddings
+
+
+def embed_queries(embeddings, texts: list) -> list:
+    """
+    Embeddings de várias queries pelo caminho de queries do modelo (`embed_query`,
+    que pode usar um prefixo de instrução ou parâmetros próprios), e não pelo de
+    documentos. Usa o `embed_queries` em lote do modelo, se houver.
+    """
+    texts = list(texts)
+    if hasattr(embeddings, 'embed_queries'):
+        return embeddings.embed_queries(texts)
+    return [embeddings.embed_query(text) for text in texts]
+
+
+class LazyEmbeddings(Embeddings):
+    """
+    Adia a criação do modelo de embeddings até o primeiro uso.
+
+    Carregar o sentence-transformer (e importar torch/transformers) leva segundos;
+    com este invólucro, construir o retriever é instantâneo e, com o cache de
+    embeddings na frente, perguntas já vistas nem chegam a carregar o modelo.
+    """
+
+    def __init__(self, factory):
+        """
+        Args:
+            factory (callable): Função sem argumentos que cria o modelo real.
+        """
+        self._factory = factory
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._factory()
+        return self._model
+
+    def embed_documents(self, texts):
+        return self.model.embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.model.embed_query(text)
+
+    def embed_queries(self, texts):
+        return embed_queries(self.model, texts)
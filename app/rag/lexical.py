@@ -0,0 +1,204 @@
+import os
+import re
+import unicodedata
+from collections import Counter
+
+import numpy as np
+
+# Palavras muito frequentes em português, já sem acentos (a comparação é feita
+# depois de `fold_accents`).
+PORTUGUESE_STOPWORDS = frozenset("""
+a ao aos as ate com como da das de dela dele deles do dos e ela elas ele eles em
+entre era eram essa esse esta estava este eu foi foram ha isso isto ja la lhe mais
+mas me mesmo meu minha muito na nao nas nem no nos o os ou para pela pelas pelo
+pelos por qual quais quando que quem se seja sem ser seu seus si sobre sua suas
+tambem te tem ter teve um uma umas uns voce
+""".split())
+
+_CAMEL_BOUNDARY = re.compile(r'(?<=[a-zà-ÿ])(?=[A-ZÀ-Þ])')
+_TOKEN = re.compile(r'\w+')
+
+
+def fold_accents(text: str) -> str:
+    """Remove acentos e cedilhas e converte para minúsculas ("Graça" -> "graca")."""
+    decomposed = unicodedata.normalize('NFKD', text)
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+
+def _light_stem(token: str) -> str:
+    """Normaliza os plurais mais comuns do português (romances -> romance, coracoes -> coracao)."""
+    if len(token) <= 4:
+        return token
+    if token.endswith('oes') or token.endswith('aes'):
+        return token[:-3] + 'ao'
+    if token.endswith('ais'):
+        return token[:-3] + 'al'
+    if token.endswith('eis'):
+        return token[:-3] + 'el'
+    if token.endswith('s') and not token.endswith(('ss', 'us', 'is')):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> list:
+    """
+    Tokenização para português: separa palavras coladas pelo scraper ("deO Lustre"),
+    remove acentos, descarta stopwords e normaliza plurais.
+    """
+    text = fold_accents(_CAMEL_BOUNDARY.sub(' ', text))
+    return [_light_stem(token) for token in _TOKEN.findall(text) if token not in PORTUGUESE_STOPWORDS]
+
+
+class BM25Index:
+    """
+    Índice invertido BM25 em memória.
+
+    As listas de postings ficam em formato CSR: para o termo `t`, os documentos estão
+    em `indices[indptr[t]:indptr[t + 1]]` e as frequências em `tfs` no mesmo intervalo.
+    Uma consulta só visita as postings dos seus próprios termos: o IDF de cada termo e
+    a normalização por tamanho de cada documento são calculados uma vez, ao construir
+    ou carregar o índice (`_precompute`), e não a cada consulta.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids = []
+        self.vocabulary = {}
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.indices = np.zeros(0, dtype=np.int32)
+        self.tfs = np.zeros(0, dtype=np.float32)
+        self.doc_lengths = np.zeros(0, dtype=np.float32)
+        self.length_norm = np.zeros(0, dtype=np.float32)
+        self.idf = np.zeros(0, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, ids: list, texts: list, k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        builder = BM25IndexBuilder(k1=k1, b=b)
+        for chunk_id, text in zip(ids, texts):
+            builder.add(chunk_id, text)
+        return builder.build()
+
+    def _precompute(self):
+        """Calcula `k1 * (1 - b + b * dl / avgdl)` de cada documento e o IDF de cada termo."""
+        n_docs = len(self.doc_lengths)
+        average_length = float(self.doc_lengths.mean()) if n_docs else 1.0
+        self.length_norm = (self.k1 * (1 - self.b + self.b * self.doc_lengths / (average_length or 1.0))
+                            ).astype(np.float32)
+        document_frequency = np.diff(self.indptr).astype(np.float64)
+        self.idf = np.log1p((n_docs - document_frequency + 0.5) / (document_frequency + 0.5)).astype(np.float32)
+
+    def search(self, query: str, k: int) -> list:
+        """
+        Returns:
+            list: Os k melhores pares (id do chunk, score BM25), em ordem decrescente.
+        """
+        if not self.ids:
+            return []
+
+        postings_docs = []
+        postings_scores = []
+        for term in set(tokenize(query)):
+            term_index = self.vocabulary.get(term)
+            if term_index is None:
+                continue
+            start, end = self.indptr[term_index], self.indptr[term_index + 1]
+            docs = self.indices[start:end]
+            tfs = self.tfs[start:end]
+            postings_docs.append(docs)
+            postings_scores.append(self.idf[term_index] * tfs * (self.k1 + 1) / (tfs + self.length_norm[docs]))
+        if not postings_docs:
+            return []
+
+        # Soma as contribuições de cada documento só entre os que aparecem nas postings.
+        candidates, positions = np.unique(np.concatenate(postings_docs), return_inverse=True)
+        scores = np.bincount(positions, weights=np.concatenate(postings_scores)).astype(np.float32)
+        k = min(k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(self.ids[candidates[i]], float(scores[i])) for i in top]
+
+    def save(self, path: str):
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        tmp_path = path + ".tmp.npz"
+        np.savez_compressed(
+            tmp_path,
+            ids=np.asarray(self.ids, dtype=str),
+            terms=np.asarray(terms, dtype=str),
+            indptr=self.indptr,
+            indices=self.indices,
+            tfs=self.tfs,
+            doc_lengths=self.doc_lengths,
+            params=np.asarray([self.k1, self.b], dtype=np.float64),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with np.load(path) as data:
+            k1, b = data['params']
+            index = cls(k1=float(k1), b=float(b))
+            index.ids = data['ids'].tolist()
+            index.vocabulary = {term: i for i, term in enumerate(data['terms'].tolist())}
+            index.indptr = data['indptr']
+            index.indices = data['indices']
+            index.tfs = data['tfs']
+            index.doc_lengths = data['doc_lengths']
+        index._precompute()
+        return index
+
+
+class BM25IndexBuilder:
+    """
+    Constrói um BM25Index incrementalmente, um chunk por vez, guardando apenas as
+    postings (e não os textos) para que a ingestão possa ser feita em streaming.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._ids = []
+        self._lengths = []
+        self._postings = {}
+
+    def add(self, chunk_id: str, text: str):
+        doc_index = len(self._ids)
+        tokens = tokenize(text)
+        self._ids.append(chunk_id)
+        self._lengths.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            self._postings.setdefault(term, []).append((doc_index, tf))
+
+    def build(self) -> BM25Index:
+        index = BM25Index(k1=self.k1, b=self.b)
+        index.ids = list(self._ids)
+
+        postings = self._postings
+        terms = sorted(postings)
+        index.vocabulary = {term: i for i, term in enumerate(terms)}
+        sizes = [len(postings[term]) for term in terms]
+        index.indptr = np.concatenate([[0], np.cumsum(sizes, dtype=np.int64)]).astype(np.int64)
+        index.indices = np.fromiter((d for term in terms for d, _ in postings[term]), dtype=np.int32,
+                                    count=int(index.indptr[-1]))
+        index.tfs = np.fromiter((tf for term in terms for _, tf in postings[term]), dtype=np.float32,
+                                count=int(index.indptr[-1]))
+        index.doc_lengths = np.asarray(self._lengths, dtype=np.float32)
+        index._precompute()
+        return index
+
+
+def reciprocal_rank_fusion(rankings: list, rrf_k: int = 60) -> list:
+    """
+    Combina várias listas ordenadas de IDs com Reciprocal Rank Fusion.
+
+    Cada ID recebe a soma de 1 / (rrf_k + posição) sobre as listas onde aparece, o
+    que dispensa normalizar scores de escalas diferentes (cosseno e BM25).
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (rrf_k + rank + 1)
+    return sorted(fused, key=fused.get, reverse=True)
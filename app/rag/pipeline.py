@@ -1,15 +1,79 @@
+import os
+import asyncio
+import threading
+import logging
+
 from .retriever import RAGRetriever
-from .generator import RAGGenerator
+from .generator import RAGGenerator, GenerationError
+from .async_generator import AsyncGenerator
+from .semantic_cache import SemanticAnswerCache
+from .context import ContextAssembler
+from app.core.metrics import span, CACHE_LOOKUPS, CONTEXT_TOKENS, PROMPT_CHARS, STRUCTURED_ANSWERS
+
+logger = logging.getLogger(__name__)
 
 class RAGPipeline:
     def __init__(self):
-        print("Inicializando o pipeline RAG...")
+        logger.info("Inicializando o pipeline RAG...")
         self.retriever = RAGRetriever()
         self.generator = RAGGenerator()
-        print("Pipeline RAG inicializado com sucesso.")
+        # Chunks enviados no prompt (CONTEXT_K). Com o reranker os melhores chunks vêm
+        # primeiro, então o padrão cai de 5 para 3 e o prompt fica menor.
+        self.context_k = int(os.getenv("CONTEXT_K", 3 if self.retriever.reranker is not None else 5))
+        # Cliente assíncrono usado pela API (configurado pelas variáveis GENERATION_*).
+        self.async_generator = AsyncGenerator.from_env(self.generator)
+        # Cache semântico de respostas, desativado por padrão (SEMANTIC_CACHE_ENABLED=true o ativa).
+        self.answer_cache = SemanticAnswerCache.from_env()
+        # Junta chunks sobrepostos, remove duplicatas e respeita CONTEXT_TOKEN_BUDGET.
+        self.context_assembler = ContextAssembler.from_env()
+        # Perguntas de contagem, listagem e filtro por ano sobre a lista de obras são
+        # respondidas pelo índice estruturado, sem recuperação nem Gemini.
+        self.structured_answers = os.getenv("STRUCTURED_ANSWERS", "true").lower() in ("1", "true", "yes")
+        logger.info("Pipeline RAG inicializado com sucesso.")
+
+    def warm_up(self, background: bool = False):
+        """
+        Carrega o modelo de embeddings, o banco vetorial e o cliente do Gemini antes
+        da primeira pergunta, opcionalmente em uma thread de fundo.
+
+        Returns:
+            threading.Thread | None: A thread de aquecimento, quando `background=True`.
+        """
+        def _warm_up():
+            self.generator.warm_up()
+            self.retriever.warm_up()
+
+        if not background:
+            _warm_up()
+            return None
+        thread = threading.Thread(target=_warm_up, name="pipeline-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def answer_structured(self, question: str):
+        """
+        Tenta responder a pergunta direto pelo índice de obras.
+
+        Returns:
+            str | None: A resposta, ou None quando a pergunta deve seguir pelo RAG.
+        """
+        if not self.structured_answers:
+            return None
+        with span("structured_answer"):
+            answer = self.retriever.works_index.answer(question)
+        if answer is not None:
+            STRUCTURED_ANSWERS.inc()
+            logger.info("Pergunta respondida pelo índice de obras.")
+        return answer
 
     def _format_context(self, context_docs: list) -> str:
-        return "\n\n".join(doc.page_content for doc in context_docs)
+        stats = {}
+        blocks = self.context_assembler.assemble(context_docs, stats=stats)
+        CONTEXT_TOKENS.observe(stats['context_tokens'])
+        logger.info("Contexto: %d chunks -> %d trechos (%d duplicados removidos, ~%d tokens).",
+                    stats['input_chunks'], stats['output_blocks'], stats['duplicates_dropped'],
+                    stats['context_tokens'])
+        return "\n\n".join(blocks)
 
     def _create_prompt(self, context: str, question: str) -> str:
         """
@@ -23,7 +87,7 @@ class RAGPipeline:
             prompt_de_contagem = True
 
         if prompt_de_contagem:
-            print("INFO: Usando prompt especializado para contagem.")
+            logger.info("Usando prompt especializado para contagem.")
             prompt_template = f"""
 Você é um assistente de IA especialista em analisar e contar itens em um texto.
 
@@ -65,23 +129,216 @@ Resposta Analítica:
 """
         return prompt_template
 
-    def ask(self, question: str) -> str:
-        
-        retrieved_context_docs = self.retriever.retrieve_context(question)
-        
-        formatted_context = self._format_context(retrieved_context_docs)
-        
-        final_prompt = self._create_prompt(formatted_context, question)
+    def _prepare(self, question: str, context_docs: list = None, query_embedding: list = None,
+                 filter: dict = None):
+        """
+        Obtém o embedding da pergunta e o contexto, reaproveitando o que o chamador
+        já tiver calculado.
+        """
+        if query_embedding is None and (self.answer_cache is not None or context_docs is None):
+            query_embedding = self.retriever.embed_queries([question])[0]
+        if context_docs is None:
+            context_docs = self.retriever.search_by_embeddings(
+                [query_embedding], k=self.context_k, queries=[question], filter=filter
+            )[0]
+        return query_embedding, context_docs
 
-        print("\n\n--- PROMPT COMPLETO ENVIADO PARA O GEMINI ---")
-        print(final_prompt)
-        print("--- FIM DO PROMPT ---\n\n")
+    def _cache_scope(self, context_docs: list):
+        return [doc.metadata.get('chunk_id') for doc in context_docs], self.retriever.index_version
 
-        final_answer = self.generator.generate_response(final_prompt)
-        
-        return final_answer
+    def _build_prompt(self, question: str, context_docs: list) -> str:
+        with span("prompt_build"):
+            formatted_context = self._format_context(context_docs)
+            final_prompt = self._create_prompt(formatted_context, question)
+
+        PROMPT_CHARS.observe(len(final_prompt))
+        # O prompt completo só é formatado quando o nível DEBUG está ativo.
+        logger.debug("Prompt completo enviado para o Gemini:\n%s", final_prompt)
+        return final_prompt
+
+    def _lookup_cached_answer(self, query_embedding, chunk_ids: list, index_version: str, question: str):
+        with span("answer_cache_lookup"):
+            cached_answer = self.answer_cache.lookup(query_embedding, chunk_ids, index_version, question)
+        CACHE_LOOKUPS.inc(result="hit" if cached_answer is not None else "miss")
+        if cached_answer is not None:
+            logger.info("Resposta encontrada no cache semântico.")
+        return cached_answer
+
+    def ask(self, question: str, context_docs: list = None, query_embedding: list = None,
+            filter: dict = None) -> str:
+        """
+        Responde a uma pergunta usando o contexto recuperado.
+
+        Perguntas de contagem, listagem ou filtro por ano sobre a lista de obras são
+        respondidas pelo índice estruturado, desde que o chamador não tenha recuperado
+        o contexto nem restringido a busca com `filter`. Se uma pergunta semanticamente
+        equivalente já foi respondida com exatamente os mesmos chunks, a resposta vem do
+        cache. Em ambos os casos o Gemini não é chamado.
+
+        Args:
+            question (str): A pergunta do usuário.
+            context_docs (list, opcional): Documentos já recuperados para a pergunta.
+                                           Quando omitido, o retriever é consultado.
+            query_embedding (list, opcional): Embedding da pergunta, se já calculado.
+            filter (dict, opcional): Filtro de metadados da busca (veja
+                                     `RAGRetriever.search_by_embeddings`).
+        """
+        with span("ask"):
+            answer, final_prompt, cache_key = self._answer_or_prompt(question, context_docs, query_embedding,
+                                                                     filter)
+            if answer is not None:
+                return answer
+
+            try:
+                final_answer = self.generator.generate(final_prompt)
+            except GenerationError as e:
+                return str(e)
+
+            self._store_answer(cache_key, final_answer)
+            return final_answer
+
+    async def ask_async(self, question: str, context_docs: list = None, query_embedding: list = None,
+                        executor=None, filter: dict = None) -> str:
+        """
+        Versão assíncrona de `ask`, usada pela API. A chamada ao gerador passa pelo
+        `AsyncGenerator`, com limite de concorrência, prompts idênticos coalescidos,
+        backoff em erros de limite de taxa e prazo por chamada.
+
+        Args:
+            question (str): A pergunta do usuário.
+            context_docs (list, opcional): Documentos já recuperados para a pergunta.
+            query_embedding (list, opcional): Embedding da pergunta, se já calculado.
+            executor (opcional): Executor das etapas síncronas (índice de obras, cache e
+                                 montagem do prompt). Padrão: o executor do event loop.
+            filter (dict, opcional): Filtro de metadados da busca.
+
+        Raises:
+            GenerationError: Ao contrário de `ask`, as falhas do gerador são propagadas
+                             (inclusive `GenerationTimeout` e `GenerationUnavailable`).
+        """
+        loop = asyncio.get_running_loop()
+        with span("ask"):
+            answer, final_prompt, cache_key = await loop.run_in_executor(
+                executor, self._answer_or_prompt, question, context_docs, query_embedding, filter
+            )
+            if answer is not None:
+                return answer
+
+            final_answer = await self.async_generator.generate(final_prompt)
+            self._store_answer(cache_key, final_answer)
+            return final_answer
+
+    def _answer_or_prompt(self, question: str, context_docs: list = None, query_embedding: list = None,
+                          filter: dict = None):
+        """
+        Tudo o que `ask` faz antes de chamar o gerador.
+
+        Returns:
+            tuple: (resposta, prompt, chave do cache). A resposta vem preenchida quando
+                   sai do índice de obras ou do cache semântico; caso contrário, o
+                   prompt deve ser enviado ao gerador e a resposta guardada com
+                   `_store_answer(chave, resposta)`.
+        """
+        if self._may_answer_structured(context_docs, filter):
+            structured_answer = self.answer_structured(question)
+            if structured_answer is not None:
+                return structured_answer, None, None
+
+        query_embedding, context_docs = self._prepare(question, context_docs, query_embedding, filter)
+
+        cache_key = None
+        if self.answer_cache is not None:
+            chunk_ids, index_version = self._cache_scope(context_docs)
+            cached_answer = self._lookup_cached_answer(query_embedding, chunk_ids, index_version, question)
+            if cached_answer is not None:
+                return cached_answer, None, None
+            cache_key = (query_embedding, chunk_ids, index_version, question)
+
+        return None, self._build_prompt(question, context_docs), cache_key
+
+    @staticmethod
+    def _may_answer_structured(context_docs: list, filter: dict) -> bool:
+        """
+        O índice de obras cobre o corpus inteiro. Com um filtro a resposta seria de
+        outro escopo, e quem já recuperou o contexto já fez (ou dispensou) a consulta
+        estruturada antes da recuperação.
+        """
+        return context_docs is None and not filter
+
+    def _store_answer(self, cache_key, answer: str):
+        if cache_key is not None:
+            self.answer_cache.store(*cache_key, answer)
+
+    def ask_stream(self, question: str, context_docs: list = None, stats: dict = None,
+                   query_embedding: list = None, filter: dict = None):
+        """
+        Versão em streaming de `ask`: produz pedaços da resposta à medida que são gerados.
+
+        Args:
+            question (str): A pergunta do usuário.
+            context_docs (list, opcional): Documentos já recuperados para a pergunta.
+            stats (dict, opcional): Recebe as medições do gerador, como `time_to_first_token`,
+                                    `cache_hit` quando a resposta vem do cache e
+                                    `structured` quando vem do índice de obras.
+            query_embedding (list, opcional): Embedding da pergunta, se já calculado.
+            filter (dict, opcional): Filtro de metadados da busca.
+        """
+        if stats is None:
+            stats = {}
+        if self._may_answer_structured(context_docs, filter):
+            structured_answer = self.answer_structured(question)
+            if structured_answer is not None:
+                stats['structured'] = True
+                stats['time_to_first_token'] = 0.0
+                stats['total_time'] = 0.0
+                yield structured_answer
+                return
+
+        query_embedding, context_docs = self._prepare(question, context_docs, query_embedding, filter)
+
+        if self.answer_cache is not None:
+            chunk_ids, index_version = self._cache_scope(context_docs)
+            cached_answer = self._lookup_cached_answer(query_embedding, chunk_ids, index_version, question)
+            if cached_answer is not None:
+                stats['cache_hit'] = True
+                stats['time_to_first_token'] = 0.0
+                stats['total_time'] = 0.0
+                yield cached_answer
+                return
+
+        final_prompt = self._build_prompt(question, context_docs)
+        pieces = []
+        for piece in self.generator.generate_response_stream(final_prompt, stats=stats):
+            pieces.append(piece)
+            yield piece
+
+        if self.answer_cache is not None and not stats.get('error'):
+            self.answer_cache.store(query_embedding, chunk_ids, index_version, question, "".join(pieces))
+
+    def ask_batch(self, questions: list) -> list:
+        """
+        Responde a várias perguntas, recuperando o contexto de todas em um único lote.
+        As respondidas pelo índice de obras não passam pela recuperação.
+        """
+        answers = [self.answer_structured(question) for question in questions]
+        pending = [i for i, answer in enumerate(answers) if answer is None]
+        if not pending:
+            return answers
+
+        pending_questions = [questions[i] for i in pending]
+        query_embeddings = self.retriever.embed_queries(pending_questions)
+        all_context_docs = self.retriever.search_by_embeddings(query_embeddings, k=self.context_k,
+                                                               queries=pending_questions)
+        for i, context_docs, query_embedding in zip(pending, all_context_docs, query_embeddings):
+            answers[i] = self.ask(questions[i], context_docs, query_embedding)
+        return answers
 
 if __name__ == '__main__':
+    from dotenv import load_dotenv
+    from app.core.logging_config import configure_logging
+    load_dotenv()
+    configure_logging()
+
     rag_pipeline = RAGPipeline()
     
     print("\n--- INICIANDO TESTE 1 ---")
@@ -0,0 +1,145 @@
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from app.core.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Cross-encoder multilíngue (treinado no mMARCO, inclui português) e pequeno o bastante para CPU.
+DEFAULT_MODEL_NAME = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+
+RERANK_PAIRS = REGISTRY.counter(
+    "rag_rerank_pairs_total", "Pares (pergunta, chunk) pontuados pelo reranker, por origem.", ("source",)
+)
+
+
+class CrossEncoderReranker:
+    """
+    Segundo estágio da recuperação: reordena os candidatos da primeira busca
+    (densa ou híbrida) com um cross-encoder, que lê a pergunta e o chunk juntos e
+    ordena bem melhor do que a similaridade entre embeddings.
+
+    - O modelo só é carregado no primeiro uso (ou em `warm_up`).
+    - Os pares ainda não pontuados de todas as perguntas de um lote vão ao modelo em
+      uma única chamada `predict`, em lotes de `batch_size`.
+    - As pontuações ficam em um cache LRU por (pergunta, chunk_id). Os IDs dos chunks
+      são derivados do conteúdo, então uma pontuação nunca vale para um texto diferente.
+    """
+
+    def __init__(self, model_name: str = None, batch_size: int = 32, max_length: int = 512,
+                 cache_size: int = 50_000, model=None):
+        """
+        Args:
+            model_name (str): Nome ou caminho do modelo `sentence_transformers.CrossEncoder`.
+            batch_size (int): Pares por lote na chamada ao modelo.
+            max_length (int): Tokens máximos de cada par (pergunta + chunk).
+            cache_size (int): Número máximo de pontuações guardadas.
+            model (opcional): Um modelo já carregado com a interface `predict(pairs,
+                              batch_size=...)`, como `FakeCrossEncoder` em testes.
+        """
+        self.model_name = model_name or DEFAULT_MODEL_NAME
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.cache_size = cache_size
+        self._model = model
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._model_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """
+        Cria o reranker a partir das variáveis RERANKER_*; devolve None se
+        RERANKER_MODEL_NAME não estiver definida. Com RERANKER_MODEL_NAME=fake, usa o
+        `FakeCrossEncoder` local.
+        """
+        model_name = os.getenv("RERANKER_MODEL_NAME")
+        if not model_name:
+            return None
+        model = None
+        if model_name == "fake":
+            from .fake_models import FakeCrossEncoder
+            model = FakeCrossEncoder()
+        return cls(
+            model_name=model_name,
+            batch_size=int(os.getenv("RERANKER_BATCH_SIZE", 32)),
+            max_length=int(os.getenv("RERANKER_MAX_LENGTH", 512)),
+            cache_size=int(os.getenv("RERANKER_CACHE_SIZE", 50_000)),
+            model=model
+        )
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    # Importado aqui: sentence-transformers leva segundos para carregar.
+                    from sentence_transformers import CrossEncoder
+
+                    logger.info("Carregando o reranker '%s'...", self.model_name)
+                    self._model = CrossEncoder(self.model_name, device="cpu", max_length=self.max_length)
+        return self._model
+
+    def warm_up(self):
+        """Carrega o modelo e roda um par de aquecimento."""
+        self.model.predict([("aquecimento", "aquecimento do reranker")], batch_size=1)
+
+    @staticmethod
+    def _key(query: str, doc) -> tuple:
+        chunk_id = doc.metadata.get('chunk_id')
+        if chunk_id is None:
+            chunk_id = hashlib.blake2b(doc.page_content.encode('utf-8'), digest_size=16).hexdigest()
+        return query, chunk_id
+
+    def score_batch(self, queries: list, candidates: list) -> list:
+        """
+        Pontua os candidatos de cada pergunta.
+
+        Args:
+            queries (list): As perguntas.
+            candidates (list): Uma lista de documentos para cada pergunta.
+
+        Returns:
+            list: Uma lista de pontuações (maior é mais relevante) para cada pergunta.
+        """
+        keys = [[self._key(query, doc) for doc in docs] for query, docs in zip(queries, candidates)]
+        scores = {}
+        missing = {}
+        with self._lock:
+            for query, docs, doc_keys in zip(queries, candidates, keys):
+                for doc, key in zip(docs, doc_keys):
+                    if key in self._cache:
+                        self._cache.move_to_end(key)
+                        scores[key] = self._cache[key]
+                    elif key not in missing:
+                        missing[key] = (query, doc.page_content)
+
+        RERANK_PAIRS.inc(len(scores), source="cache")
+        if missing:
+            RERANK_PAIRS.inc(len(missing), source="model")
+            predicted = self.model.predict(list(missing.values()), batch_size=self.batch_size)
+            with self._lock:
+                for key, score in zip(missing, predicted):
+                    scores[key] = self._cache[key] = float(score)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        return [[scores[key] for key in doc_keys] for doc_keys in keys]
+
+    def rerank_batch(self, queries: list, candidates: list, k: int) -> list:
+        """
+        Reordena os candidatos de cada pergunta e mantém os `k` melhores.
+
+        Returns:
+            list: Uma lista de documentos para cada pergunta, do mais para o menos relevante.
+        """
+        all_scores = self.score_batch(queries, candidates)
+        reranked = []
+        for docs, scores in zip(candidates, all_scores):
+            # A ordem da primeira busca desempata pontuações iguais.
+            order = sorted(range(len(docs)), key=lambda i: -scores[i])
+            reranked.append([docs[i] for i in order[:k]])
+        return reranked
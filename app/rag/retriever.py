@@ -1,135 +1,638 @@
 import os
-import json
-from dotenv import load_dotenv
+import time
+import shutil
+import hashlib
+import threading
+import itertools
+import logging
+from datetime import datetime, timezone
 
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain.docstore.document import Document
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from .embedding_cache import CachedEmbeddings
+from .lazy_embeddings import LazyEmbeddings, embed_queries
+from .vector_stores import create_vector_store, matches_filter, ChromaVectorStore, ShardedVectorStore
+from .lexical import BM25Index, BM25IndexBuilder, reciprocal_rank_fusion
+from .ingestion import iter_chunks, batched, list_data_files
+from .works_index import WorksIndex
+from .reranker import CrossEncoderReranker
+from .index_manifest import IndexVersions, config_fingerprint, corpus_hash, corpus_files
+from app.core.metrics import span, RETRIEVED_CHUNKS
 
-load_dotenv()
+logger = logging.getLogger(__name__)
+
+
+def _peek(iterator):
+    """Devolve um iterador equivalente, ou None se `iterator` estiver vazio."""
+    iterator = iter(iterator)
+    try:
+        first = next(iterator)
+    except StopIteration:
+        return None
+    return itertools.chain([first], iterator)
+
+
+def _add_to_index_version(version: int, chunk_id: str) -> int:
+    # Soma modular dos hashes: não depende da ordem e pode ser calculada em streaming.
+    digest = hashlib.blake2b(chunk_id.encode('utf-8'), digest_size=16).digest()
+    return (version + int.from_bytes(digest, 'big')) % (1 << 128)
+
+
+def _format_index_version(version: int) -> str:
+    return f"{version:032x}"[:16]
+
+
+def _create_huggingface_embeddings(model_name: str):
+    # Importado aqui porque langchain_huggingface carrega torch e transformers.
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(
+        model_name=model_name,
+        model_kwargs={'device': 'cpu'}
+    )
+
+
+def _create_embeddings(model_name: str, engine: str):
+    if engine == "optimized":
+        from .embedding_engine import CPUEmbeddingEngine
+        return CPUEmbeddingEngine.from_env(model_name)
+    if engine != "huggingface":
+        raise ValueError(f"Motor de embeddings desconhecido: '{engine}'. Opções: huggingface, optimized")
+    return _create_huggingface_embeddings(model_name)
 
 class RAGRetriever:
     
-    def __init__(self, db_path: str = "db"):
+    LEXICAL_INDEX_FILE = "lexical_index.npz"
+
+    def __init__(self, db_path: str = "db", backend: str = None, hybrid: bool = None):
         """
         Inicializa o Retriever.
         
         Args:
             db_path (str): O caminho para o diretório do banco de dados vetorial.
-                           O padrão é "db" para uso normal.
+                           O padrão é "db" para uso normal. As versões do índice
+                           ficam em `versions/` e a ativa é indicada por `CURRENT`.
+            backend (str): O backend do banco vetorial: "chroma" (padrão) ou "numpy",
+                           a busca exata em memória. Quando omitido, usa a variável
+                           de ambiente VECTOR_STORE_BACKEND. No backend "numpy",
+                           VECTOR_QUANTIZATION=int8|binary ativa a busca quantizada
+                           com rescoring (fator em VECTOR_RESCORE_FACTOR).
+            hybrid (bool): Combina a busca densa com BM25 sobre os mesmos chunks.
+                           Quando omitido, usa a variável de ambiente HYBRID_SEARCH.
+
+        Com VECTOR_STORE_SHARD_BY=<campo> (ex.: source_file ou title), o banco é
+        dividido em um shard por valor desse campo (veja ShardedVectorStore).
+
+        A cada INDEX_REFRESH_SECONDS (padrão: 5; 0 desativa), as buscas verificam se
+        outra versão do índice foi ativada e passam a usá-la, sem reiniciar o processo.
+        Versões substituídas só são removidas depois de INDEX_PRUNE_GRACE_SECONDS
+        (padrão: 600), para que os processos que ainda as usam tenham tempo de recarregar.
+
+        Com RERANKER_MODEL_NAME=<cross-encoder>, a busca passa a ter dois estágios: a
+        primeira traz RERANKER_FETCH_K candidatos (padrão: 20) e o cross-encoder escolhe
+        os k melhores entre eles (veja CrossEncoderReranker).
         """
         self.db_path = db_path  
+        self.backend = backend or os.getenv("VECTOR_STORE_BACKEND", "chroma")
+        if hybrid is None:
+            hybrid = os.getenv("HYBRID_SEARCH", "false").lower() in ("1", "true", "yes")
+        self.hybrid = hybrid
+        self.hybrid_fetch_k = int(os.getenv("HYBRID_FETCH_K", 20))
+        self.shard_by = os.getenv("VECTOR_STORE_SHARD_BY") or None
+        self.reranker = CrossEncoderReranker.from_env()
+        self.rerank_fetch_k = int(os.getenv("RERANKER_FETCH_K", 20))
+        self.ingest_batch_size = int(os.getenv("INGEST_BATCH_SIZE", 256))
+        self.versions = IndexVersions(db_path)
+        self.keep_versions = int(os.getenv("INDEX_KEEP_VERSIONS", 2))
+        self.refresh_interval = float(os.getenv("INDEX_REFRESH_SECONDS", 5))
+        self.prune_grace_seconds = float(os.getenv("INDEX_PRUNE_GRACE_SECONDS", 600))
+        self._last_refresh_check = time.monotonic()
+        self._active_version = None
+        self.index_path = None
+        self.lexical_index = None
+        self._works_index = None
+        self._index_version = None
         embedding_model_name = os.getenv("EMBEDDING_MODEL_NAME")
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=embedding_model_name,
-            model_kwargs={'device': 'cpu'}
-        )
+        # "huggingface" (padrão) ou "optimized", o motor para CPU com pesos int8,
+        # threads controladas e lotes ordenados por tamanho (veja CPUEmbeddingEngine).
+        embedding_engine = os.getenv("EMBEDDING_ENGINE", "huggingface")
+        # O modelo só é carregado na primeira vez que um embedding precisar ser
+        # calculado (ou em `warm_up`), e não na construção do retriever.
+        self.embedding_model = LazyEmbeddings(lambda: _create_embeddings(embedding_model_name, embedding_engine))
+        self.embeddings = self.embedding_model
+
+        # Os vetores do modelo quantizado diferem levemente dos originais, então não
+        # podem dividir o mesmo cache.
+        cache_model_name = embedding_model_name
+        if embedding_engine == "optimized" and os.getenv("EMBEDDING_QUANTIZE", "true").lower() in ("1", "true", "yes"):
+            cache_model_name = f"{embedding_model_name or 'default'}+int8"
+        self.embedding_model_id = cache_model_name or "default"
+
+        # Cache de embeddings em disco, compartilhado entre todos os bancos vetoriais
+        # construídos com o mesmo modelo. Defina EMBEDDING_CACHE_DIR="" para desativar.
+        cache_dir = os.getenv("EMBEDDING_CACHE_DIR", ".cache/embeddings")
+        if cache_dir:
+            self.embeddings = CachedEmbeddings(
+                self.embeddings,
+                model_name=cache_model_name,
+                cache_dir=cache_dir,
+                max_entries=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", 100_000))
+            )
         self.vector_store = None 
+        self._setup_lock = threading.Lock()
 
-    def _load_and_chunk_documents(self, chunk_size: int, chunk_overlap: int):
-        DATA_DIRECTORY = 'data'
-        if not os.path.exists(DATA_DIRECTORY): return []
+    def warm_up(self, background: bool = False):
+        """
+        Carrega o modelo de embeddings e o banco vetorial antes da primeira pergunta.
 
-        print(f"Lendo e dividindo documentos com chunk_size={chunk_size}, chunk_overlap={chunk_overlap}...")
-        
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap
-        )
-        
-        all_documents = []
-
-        for filename in os.listdir(DATA_DIRECTORY):
-            if filename.endswith('.json'):
-                json_path = os.path.join(DATA_DIRECTORY, filename)
-                print(f"  -> Processando arquivo: {filename}")
-                
-                with open(json_path, 'r', encoding='utf-8') as file:
-                    data = json.load(file)
-
-                global_metadata = {
-                    'source_url': data.get('metadata', {}).get('source_url', 'N/A'),
-                    'title': data.get('metadata', {}).get('title', 'Sem Título'),
-                    'source_file': filename
-                }
-
-                for section in data.get('content_sections', []):
-                    self._process_section(section, global_metadata, text_splitter, all_documents)
-
-        print(f"Processamento concluído. {len(all_documents)} chunks criados.")
+        Args:
+            background (bool): Faz o carregamento em uma thread e retorna imediatamente.
+
+        Returns:
+            threading.Thread | None: A thread de aquecimento, quando `background=True`.
+        """
+        def _warm_up():
+            self.embedding_model.embed_documents(["aquecimento"])
+            if self.reranker is not None:
+                self.reranker.warm_up()
+            self._ensure_vector_store()
+            self.works_index
+
+        if not background:
+            _warm_up()
+            return None
+        thread = threading.Thread(target=_warm_up, name="retriever-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def after_fork(self):
+        """
+        Prepara um processo filho (criado por fork depois do carregamento) para uso:
+        recria as conexões que não podem ser herdadas. O modelo de embeddings e o
+        índice numpy (memory-map) continuam compartilhados com o processo pai.
+        """
+        if isinstance(self.embeddings, CachedEmbeddings):
+            self.embeddings.reconnect()
+        if self.backend == "chroma" and self.vector_store is not None:
+            # O cliente do Chroma mantém conexões SQLite e threads próprias.
+            self.vector_store = None
+            self._active_version = None
+
+    def _open_vector_store(self, path: str):
+        options = {}
+        quantization = os.getenv("VECTOR_QUANTIZATION", "none")
+        if self.backend == "numpy":
+            options['dtype'] = os.getenv("VECTOR_STORE_DTYPE", "float32")
+            options['quantization'] = quantization
+            if os.getenv("VECTOR_RESCORE_FACTOR"):
+                options['rescore_factor'] = int(os.getenv("VECTOR_RESCORE_FACTOR"))
+        elif quantization not in ("", "none"):
+            logger.warning("VECTOR_QUANTIZATION só é suportado pelo backend 'numpy'; ignorando com '%s'.",
+                           self.backend)
+        if self.shard_by:
+            workers = os.getenv("VECTOR_STORE_SHARD_WORKERS")
+            return ShardedVectorStore(path, self.embeddings, self.shard_by, backend=self.backend,
+                                      max_workers=int(workers) if workers else None, **options)
+        return create_vector_store(self.backend, path, self.embeddings, **options)
+
+    @property
+    def index_version(self) -> str:
+        """
+        Identifica o conteúdo atual do índice: uma combinação, independente de ordem,
+        dos hashes dos IDs de todos os chunks. Como os IDs são hashes do conteúdo,
+        qualquer mudança no corpus muda a versão.
+        """
+        if self._index_version is None and self._ensure_vector_store():
+            version = 0
+            for chunk_id in self.vector_store.ids():
+                version = _add_to_index_version(version, chunk_id)
+            self._index_version = _format_index_version(version)
+        return self._index_version
+
+    def _lexical_index_path(self):
+        return os.path.join(self.index_path, self.LEXICAL_INDEX_FILE)
+
+    def _ensure_lexical_index(self):
+        if self.lexical_index is None:
+            if os.path.exists(self._lexical_index_path()):
+                self.lexical_index = BM25Index.load(self._lexical_index_path())
+            else:
+                logger.info("Índice léxico não encontrado. Construindo a partir do banco vetorial...")
+                documents = self.vector_store.get_documents()
+                self.lexical_index = BM25Index.build(
+                    [doc.metadata.get('chunk_id') for doc in documents], [doc.page_content for doc in documents]
+                )
+                self.lexical_index.save(self._lexical_index_path())
+        return self.lexical_index
+
+    @property
+    def works_index(self) -> WorksIndex:
+        """
+        O índice estruturado das listas de obras, construído na indexação. Não
+        depende do banco vetorial nem do modelo de embeddings.
+        """
+        if self._works_index is None:
+            current = self.versions.current()
+            index_path = self.index_path or (self.versions.path(current) if current else None)
+            works_path = os.path.join(index_path, WorksIndex.FILE_NAME) if index_path else None
+            if works_path and os.path.exists(works_path):
+                self._works_index = WorksIndex.load(works_path)
+            else:
+                logger.info("Índice de obras não encontrado. Construindo a partir de 'data/'...")
+                self._works_index = WorksIndex.build(list_data_files())
+        return self._works_index
+
+    def _iter_chunks(self, chunk_size: int, chunk_overlap: int):
+        """
+        Gera os pares (chunk_id, Document) do corpus em streaming, processando os
+        arquivos em paralelo (veja `app.rag.ingestion.iter_chunks`).
+        """
+        logger.info("Lendo e dividindo documentos com chunk_size=%s, chunk_overlap=%s...", chunk_size, chunk_overlap)
+        return iter_chunks(chunk_size, chunk_overlap)
+
+    def _load_and_chunk_documents(self, chunk_size: int, chunk_overlap: int):
+        """
+        Lê e divide todo o corpus de uma vez, devolvendo uma lista de Documents.
+        Para indexação, prefira `_iter_chunks`, que não materializa o corpus inteiro.
+        """
+        all_documents = [doc for _, doc in self._iter_chunks(chunk_size, chunk_overlap)]
+        logger.info("Processamento concluído. %d chunks criados.", len(all_documents))
         return all_documents
 
-    def _process_section(self, section_data, global_metadata, text_splitter, all_documents):
-        section_title = section_data.get('section_title', 'Sem Título')
-        section_text_content = ""
-        for item in section_data.get('content', []):
-            if item.get('type') == 'paragraph':
-                section_text_content += item.get('text', '') + "\n\n"
-            elif item.get('type') == 'works_list':
-                section_text_content += f"Categoria: {item.get('category', '')}\n"
-                for work in item.get('items', []):
-                    year = work.get('year')
-                    title = work.get('title')
-                    section_text_content += f"- {title} ({year})\n" if year else f"- {title}\n"
-                section_text_content += "\n"
-        
-        if section_text_content.strip():
-            full_text_with_title = f"Título da Seção: {section_title}\n\n{section_text_content.strip()}"
-            chunks = text_splitter.split_text(full_text_with_title)
-            for chunk in chunks:
-                all_documents.append(Document(
-                    page_content=chunk,
-                    metadata={**global_metadata, 'section': section_title}
-                ))
-
-        for subsection in section_data.get('subsections', []):
-            self._process_subsection(subsection, global_metadata, section_title, text_splitter, all_documents)
-
-    def _process_subsection(self, subsection_data, global_metadata, parent_section_title, text_splitter, all_documents):
-        subsection_title = subsection_data.get('subsection_title', 'Sem Subtítulo')
-        subsection_text_content = ""
-        for item in subsection_data.get('content', []):
-            if item.get('type') == 'paragraph':
-                subsection_text_content += item.get('text', '') + "\n\n"
-
-        if subsection_text_content.strip():
-            full_text_with_title = f"Título da Seção: {parent_section_title}\nTítulo da Subseção: {subsection_title}\n\n{subsection_text_content.strip()}"
-            chunks = text_splitter.split_text(full_text_with_title)
-            for chunk in chunks:
-                all_documents.append(Document(
-                    page_content=chunk,
-                    metadata={**global_metadata, 'section': parent_section_title, 'subsection': subsection_title}
-                ))
-
-    def setup_vector_store(self, force_recreate=False, chunk_size=1000, chunk_overlap=200):
-        
-        if os.path.exists(self.db_path) and not force_recreate:
-            print(f"Carregando banco de dados vetorial existente de '{self.db_path}'...")
-            self.vector_store = Chroma(persist_directory=self.db_path, embedding_function=self.embeddings)
-            print("Banco de dados carregado com sucesso.")
-        else:
-            print(f"Criando novo banco de dados vetorial em '{self.db_path}'...")
-            documents = self._load_and_chunk_documents(chunk_size, chunk_overlap)
-            
-            if not documents:
-                print("Nenhum documento para indexar. Abortando.")
+    def _index_settings(self, chunk_size: int, chunk_overlap: int) -> dict:
+        """A configuração do índice, exceto o corpus: modelo, backend e chunking."""
+        settings = {
+            'embedding_model': self.embedding_model_id,
+            'backend': self.backend,
+            'dtype': os.getenv("VECTOR_STORE_DTYPE", "float32") if self.backend == "numpy" else None,
+            'shard_by': self.shard_by,
+            'chunk_size': chunk_size,
+            'chunk_overlap': chunk_overlap,
+        }
+        if self.backend == "chroma":
+            # Versões sem este campo têm coleções em L2 e são reconstruídas.
+            settings['distance'] = ChromaVectorStore.DISTANCE_SPACE
+        return settings
+
+    def _index_config(self, chunk_size: int, chunk_overlap: int) -> dict:
+        """
+        Tudo o que determina o conteúdo do índice; vai para o manifesto de cada versão.
+        Lê o corpus inteiro para calcular o hash, então só é usado ao (re)construir.
+        """
+        config = self._index_settings(chunk_size, chunk_overlap)
+        config['corpus_hash'] = corpus_hash(list_data_files())
+        return config
+
+    def _has_settings(self, name: str, settings: dict) -> bool:
+        config = dict(self.versions.manifest(name).get('config', {}))
+        config.pop('corpus_hash', None)
+        return config == settings
+
+    def _activate(self, name: str, vector_store, lexical_index=None, works_index=None, index_version=None):
+        """
+        Passa a usar a versão `name` do índice neste processo. Buscas em andamento
+        terminam com o banco anterior, cujo objeto continua válido.
+        """
+        path = self.versions.path(name)
+        if lexical_index is None and self.hybrid and os.path.exists(os.path.join(path, self.LEXICAL_INDEX_FILE)):
+            lexical_index = BM25Index.load(os.path.join(path, self.LEXICAL_INDEX_FILE))
+        self.index_path = path
+        self.lexical_index = lexical_index
+        self._works_index = works_index
+        self._index_version = index_version
+        self.vector_store = vector_store
+        self._active_version = name
+
+    def _load_version(self, name: str):
+        manifest = self.versions.manifest(name)
+        self._activate(name, self._open_vector_store(self.versions.path(name)),
+                       index_version=manifest.get('index_version'))
+
+    def setup_vector_store(self, force_recreate=False, chunk_size=1000, chunk_overlap=200, incremental=False):
+        """
+        Prepara o banco de dados vetorial.
+
+        Cada índice é uma versão em `<db_path>/versions/`, com um manifesto que
+        registra o modelo de embeddings, os parâmetros de chunking e o hash do corpus.
+        Uma versão existente com a mesma configuração é reaproveitada; caso contrário,
+        uma nova é construída em um diretório à parte e ativada atomicamente ao final
+        (veja IndexVersions), sem interromper quem está lendo a versão anterior.
+
+        Args:
+            force_recreate (bool): Reconstrói o índice mesmo que exista uma versão
+                                   com a mesma configuração.
+            chunk_size (int): Tamanho máximo de cada chunk, em caracteres.
+            chunk_overlap (int): Sobreposição entre chunks consecutivos.
+            incremental (bool): Constrói a nova versão a partir de uma cópia da versão
+                                ativa (se ela usa o mesmo modelo e chunking), gerando
+                                embeddings apenas para chunks novos ou alterados e
+                                removendo chunks cujas seções não existem mais.
+
+        O hash do corpus só é calculado se o tamanho ou a data de algum arquivo de
+        `data/` mudou desde a construção da versão ativa.
+        """
+        files = corpus_files(list_data_files())
+        current = self.versions.current()
+        if (not force_recreate and current is not None
+                and self._has_settings(current, self._index_settings(chunk_size, chunk_overlap))
+                and self.versions.manifest(current).get('corpus_files') == files):
+            logger.info("Carregando a versão '%s' do banco de dados vetorial de '%s'...", current, self.db_path)
+            self._load_version(current)
+            logger.info("Banco de dados carregado com sucesso.")
+            return
+
+        config = self._index_config(chunk_size, chunk_overlap)
+        fingerprint = config_fingerprint(config)
+
+        if not force_recreate:
+            name = self.versions.find(fingerprint)
+            if name is not None:
+                if name != current:
+                    logger.info("Reaproveitando a versão '%s', construída com a mesma configuração.", name)
+                    self.versions.activate(name)
+                manifest = self.versions.manifest(name)
+                if manifest.get('corpus_files') != files:
+                    # Mesmo conteúdo com datas novas (ex.: um checkout): evita recalcular o hash da próxima vez.
+                    self.versions.write_manifest(name, dict(manifest, corpus_files=files))
+                logger.info("Carregando a versão '%s' do banco de dados vetorial de '%s'...", name, self.db_path)
+                self._load_version(name)
+                logger.info("Banco de dados carregado com sucesso.")
                 return
-                
-            self.vector_store = Chroma.from_documents(documents=documents, embedding=self.embeddings, persist_directory=self.db_path)
-            print("Banco de dados vetorial criado e salvo com sucesso.")
 
-    def retrieve_context(self, query: str, k: int = 5):
-        if self.vector_store is None:
-            default_size = int(os.getenv("CHUNK_SIZE", 1000))
-            default_overlap = int(os.getenv("CHUNK_OVERLAP", 200))
-            self.setup_vector_store(chunk_size=default_size, chunk_overlap=default_overlap)
-        
+        legacy_files = [name for name in (os.listdir(self.db_path) if os.path.isdir(self.db_path) else [])
+                        if name not in (IndexVersions.CURRENT_FILE, IndexVersions.VERSIONS_DIRECTORY)]
+        if legacy_files and self.versions.current() is None:
+            logger.warning("'%s' contém um banco sem manifesto (formato antigo), que será ignorado.", self.db_path)
+
+        base = None
+        if incremental and not force_recreate:
+            base = self._compatible_version(config)
+            if base is None:
+                logger.info("Nenhuma versão ativa com o mesmo modelo e chunking; construindo do zero.")
+        self._build_version(config, fingerprint, chunk_size, chunk_overlap, base, files)
+
+    def _compatible_version(self, config: dict):
+        """A versão ativa, se ela difere de `config` apenas no corpus."""
+        current = self.versions.current()
+        if current is None:
+            return None
+        settings = {key: value for key, value in config.items() if key != 'corpus_hash'}
+        return current if self._has_settings(current, settings) else None
+
+    def _build_version(self, config: dict, fingerprint: str, chunk_size: int, chunk_overlap: int, base: str = None,
+                       files: dict = None):
+        chunks = _peek(self._iter_chunks(chunk_size, chunk_overlap))
+        if chunks is None:
+            logger.warning("Nenhum documento para indexar. Abortando.")
+            return
+
+        name = self.versions.create(fingerprint)
+        path = self.versions.path(name)
+        try:
+            if base is not None:
+                logger.info("Sincronizando a versão '%s' em uma cópia: '%s'...", base, path)
+                shutil.copytree(self.versions.path(base), path, dirs_exist_ok=True,
+                                ignore=shutil.ignore_patterns(IndexVersions.MANIFEST_FILE,
+                                                              IndexVersions.RETIRED_FILE))
+            else:
+                logger.info("Criando novo banco de dados vetorial em '%s'...", path)
+            vector_store = self._open_vector_store(path)
+            lexical_index, index_version, stats = self._index_chunks(vector_store, chunks)
+            lexical_index.save(os.path.join(path, self.LEXICAL_INDEX_FILE))
+            works_index = WorksIndex.build(list_data_files())
+            works_index.save(os.path.join(path, WorksIndex.FILE_NAME))
+            self.versions.commit(name, {
+                'fingerprint': fingerprint,
+                'config': config,
+                'corpus_files': files if files is not None else corpus_files(list_data_files()),
+                'created_at': datetime.now(timezone.utc).isoformat(),
+                'base_version': base,
+                'chunks': stats['total'],
+                'index_version': index_version,
+            })
+        except BaseException:
+            self.versions.discard(name)
+            raise
+
+        self._activate(name, vector_store, lexical_index, works_index, index_version)
+        if base is not None:
+            logger.info("Sincronização concluída: %d chunks novos ou alterados, %d removidos, %d inalterados.",
+                        stats['added'], stats['removed'], stats['existing'] - stats['removed'])
+        else:
+            logger.info("Banco de dados vetorial criado e salvo com sucesso (%d chunks).", stats['total'])
+        logger.info("Versão '%s' ativada (%d obras no índice de obras).", name, len(works_index))
+        self.versions.prune(self.keep_versions, self.prune_grace_seconds)
+
+    def _index_chunks(self, vector_store, chunks):
+        """
+        Leva o banco vetorial ao conteúdo de `chunks` e constrói o índice BM25.
+
+        Como os IDs dos chunks são hashes do conteúdo, um chunk alterado aparece como
+        um ID novo (que é embutido e inserido) mais um ID antigo (que é removido).
+        Chunks que o banco já tem não passam novamente pelo modelo de embeddings.
+
+        Returns:
+            tuple: (índice BM25, versão do índice, contagens).
+        """
+        existing_ids = set(vector_store.ids())
+        unseen_ids = set(existing_ids)
+        lexical_builder = BM25IndexBuilder()
+        version = 0
+        total = 0
+        added = 0
+        for batch in batched(chunks, self.ingest_batch_size):
+            new_chunks = [(chunk_id, doc) for chunk_id, doc in batch if chunk_id not in existing_ids]
+            vector_store.add([doc for _, doc in new_chunks], [chunk_id for chunk_id, _ in new_chunks])
+            added += len(new_chunks)
+            total += len(batch)
+            for chunk_id, doc in batch:
+                unseen_ids.discard(chunk_id)
+                lexical_builder.add(chunk_id, doc.page_content)
+                version = _add_to_index_version(version, chunk_id)
+
+        vector_store.delete(list(unseen_ids))
+        vector_store.persist()
+        stats = {'total': total, 'added': added, 'removed': len(unseen_ids), 'existing': len(existing_ids)}
+        return lexical_builder.build(), _format_index_version(version), stats
+
+    def refresh(self) -> bool:
+        """
+        Carrega a versão ativa do índice se ela mudou desde a última carga, por
+        exemplo porque outro processo terminou uma reconstrução.
+
+        Returns:
+            bool: Se uma nova versão foi carregada.
+        """
+        name = self.versions.current()
+        if name is None or name == self._active_version:
+            return False
+        with self._setup_lock:
+            if name == self._active_version:
+                return False
+            logger.info("Nova versão do índice detectada ('%s'). Recarregando...", name)
+            self._load_version(name)
+        return True
+
+    def _maybe_refresh(self):
+        if self.refresh_interval <= 0:
+            return
+        now = time.monotonic()
+        if now - self._last_refresh_check >= self.refresh_interval:
+            self._last_refresh_check = now
+            self.refresh()
+
+    def _open_current_version(self, chunk_size: int, chunk_overlap: int):
+        """
+        Abre a versão ativa do índice sem ler o corpus. Se os arquivos de `data/`
+        mudaram desde a construção, a versão continua em uso e um aviso indica como
+        atualizá-la (`python -m app.build_index`); a reconstrução não acontece dentro
+        de uma pergunta. Só constrói um índice (pelo caminho incremental) quando não há
+        nenhuma versão com o modelo e o chunking configurados.
+        """
+        current = self.versions.current()
+        if current is not None and self._has_settings(current, self._index_settings(chunk_size, chunk_overlap)):
+            if self.versions.manifest(current).get('corpus_files') != corpus_files(list_data_files()):
+                logger.warning("Os arquivos de 'data/' mudaram desde a construção da versão '%s'. "
+                               "Rode `python -m app.build_index` para atualizar o índice.", current)
+            logger.info("Carregando a versão '%s' do banco de dados vetorial de '%s'...", current, self.db_path)
+            self._load_version(current)
+            return
+        logger.info("Nenhuma versão ativa do índice com esta configuração em '%s'.", self.db_path)
+        self.setup_vector_store(chunk_size=chunk_size, chunk_overlap=chunk_overlap, incremental=True)
+
+    def _ensure_vector_store(self):
         if self.vector_store is None:
-            print("Erro: vector_store não foi inicializado.")
+            # O lock evita que o aquecimento em segundo plano e a primeira pergunta
+            # abram o banco ao mesmo tempo.
+            with self._setup_lock:
+                if self.vector_store is None:
+                    default_size = int(os.getenv("CHUNK_SIZE", 1000))
+                    default_overlap = int(os.getenv("CHUNK_OVERLAP", 200))
+                    self._open_current_version(default_size, default_overlap)
+        else:
+            self._maybe_refresh()
+        return self.vector_store is not None
+
+    def embed_queries(self, queries: list) -> list:
+        """
+        Gera os embeddings de várias queries pelo caminho de queries do modelo, em
+        lote quando o modelo oferece `embed_queries` (veja `embed_queries`).
+        """
+        with span("query_embedding"):
+            return embed_queries(self.embeddings, queries)
+
+    def search_by_embeddings(self, query_embeddings: list, k: int = 5, queries: list = None,
+                             filter: dict = None) -> list:
+        """
+        Busca os k chunks mais próximos de cada embedding em uma única consulta ao
+        banco vetorial, que processa todas as queries juntas.
+
+        Args:
+            query_embeddings (list): Os embeddings das queries.
+            k (int): Número de documentos recuperados por query.
+            queries (list, opcional): O texto das queries. Necessário para a busca
+                                      híbrida e para o reranking; sem ele a busca
+                                      é apenas densa, em um estágio.
+            filter (dict, opcional): Restringe a busca aos chunks cujos metadados
+                                     atendem ao filtro, ex.: `{"title": "Clarice Lispector"}`
+                                     ou `{"section": ["Biografia", "Obras"]}`.
+
+        Returns:
+            list: Uma lista de documentos para cada embedding, na mesma ordem.
+        """
+        if not query_embeddings:
             return []
+        if not self._ensure_vector_store():
+            logger.error("vector_store não foi inicializado.")
+            return [[] for _ in query_embeddings]
+
+        rerank = self.reranker is not None and queries is not None
+        # Com reranking, o primeiro estágio traz mais candidatos do que os k pedidos.
+        fetch_k = max(k, self.rerank_fetch_k) if rerank else k
+        with span("vector_search"):
+            if self.hybrid and queries is not None:
+                all_docs = self._hybrid_search(queries, query_embeddings, fetch_k, filter)
+            else:
+                all_docs = [
+                    [doc for doc, _ in hits]
+                    for hits in self.vector_store.search(query_embeddings, fetch_k, filter=filter)
+                ]
+        if rerank:
+            with span("rerank"):
+                all_docs = self.reranker.rerank_batch(queries, all_docs, k)
+        for docs in all_docs:
+            RETRIEVED_CHUNKS.observe(len(docs))
+        return all_docs
+
+    def _hybrid_search(self, queries: list, query_embeddings: list, k: int, filter: dict = None) -> list:
+        """
+        Busca densa e BM25 com `hybrid_fetch_k` candidatos cada, combinadas por
+        Reciprocal Rank Fusion. Termos exatos (nomes de obras e prêmios) sobem no
+        ranking mesmo quando a similaridade semântica do chunk é baixa.
+
+        O índice BM25 cobre o corpus inteiro, então com `filter` os seus candidatos
+        são filtrados pelos metadados antes da fusão.
+        """
+        lexical_index = self._ensure_lexical_index()
+        fetch_k = max(k, self.hybrid_fetch_k)
+        dense_results = self.vector_store.search(query_embeddings, fetch_k, filter=filter)
+
+        all_docs = []
+        for query, dense_hits in zip(queries, dense_results):
+            docs_by_id = {doc.metadata.get('chunk_id'): doc for doc, _ in dense_hits}
+            lexical_ids = [chunk_id for chunk_id, _ in lexical_index.search(query, fetch_k)]
+            if filter:
+                missing_ids = [chunk_id for chunk_id in lexical_ids if chunk_id not in docs_by_id]
+                for doc in self.vector_store.get_documents(missing_ids):
+                    docs_by_id[doc.metadata.get('chunk_id')] = doc
+                lexical_ids = [
+                    chunk_id for chunk_id in lexical_ids
+                    if chunk_id in docs_by_id and matches_filter(docs_by_id[chunk_id].metadata, filter)
+                ]
+            fused_ids = reciprocal_rank_fusion([
+                [doc.metadata.get('chunk_id') for doc, _ in dense_hits],
+                lexical_ids,
+            ])[:k]
 
-        print(f"Recuperando contexto para a query: '{query}'")
-        retrieved_docs = self.vector_store.similarity_search(query, k=k)
-        print(f"{len(retrieved_docs)} documentos relevantes recuperados.")
-        return retrieved_docs
\ No newline at end of file
+            missing_ids = [chunk_id for chunk_id in fused_ids if chunk_id not in docs_by_id]
+            for doc in self.vector_store.get_documents(missing_ids):
+                docs_by_id[doc.metadata.get('chunk_id')] = doc
+            all_docs.append([docs_by_id[chunk_id] for chunk_id in fused_ids if chunk_id in docs_by_id])
+        return all_docs
+
+    def retrieve_context_batch(self, queries: list, k: int = 5, filter: dict = None) -> list:
+        """
+        Recupera o contexto de várias queries de uma vez.
+
+        Todas as queries passam pelo modelo de embeddings em um único lote e são
+        buscadas juntas, o que é bem mais eficiente do que chamar `retrieve_context`
+        em um laço.
+
+        Args:
+            queries (list): As perguntas a serem buscadas.
+            k (int): Número de documentos recuperados por pergunta.
+            filter (dict, opcional): Filtro de metadados (veja `search_by_embeddings`).
+
+        Returns:
+            list: Uma lista de documentos para cada query, na mesma ordem.
+        """
+        if not queries:
+            return []
+        if not self._ensure_vector_store():
+            logger.error("vector_store não foi inicializado.")
+            return [[] for _ in queries]
+
+        return self.search_by_embeddings(self.embed_queries(queries), k=k, queries=queries, filter=filter)
+
+    def retrieve_context(self, query: str, k: int = 5, filter: dict = None):
+        """
+        Recupera os k chunks mais relevantes para a query.
+
+        Args:
+            query (str): A pergunta.
+            k (int): Número de documentos recuperados.
+            filter (dict, opcional): Restringe a busca pelos metadados `source_file`,
+                                     `title`, `section` ou `subsection`, ex.:
+                                     `{"source_file": "dados_clarice_final.json"}`.
+        """
+        logger.info("Recuperando contexto para a query: '%s'", query)
+        retrieved_docs = self.retrieve_context_batch([query], k=k, filter=filter)[0]
+        logger.info("%d documentos relevantes recuperados.", len(retrieved_docs))
+        return retrieved_docs
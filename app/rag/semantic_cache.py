@@ -0,0 +1,219 @@
+import os
+import re
+import json
+import time
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .lexical import fold_accents, PORTUGUESE_STOPWORDS
+
+_WORD = re.compile(r'\w+')
+_NEGATIONS = frozenset({'nao', 'nunca', 'jamais', 'nenhum', 'nenhuma', 'nem', 'sem'})
+# Palavras comuns no início de uma pergunta, que não são nomes apesar da maiúscula.
+_SENTENCE_STARTERS = PORTUGUESE_STOPWORDS | {
+    'onde', 'quanto', 'quanta', 'quantos', 'quantas', 'porque', 'existe', 'existem', 'houve', 'ha',
+    'liste', 'cite', 'diga', 'fale', 'conte', 'descreva', 'explique', 'resuma',
+}
+
+
+def key_terms(question: str) -> tuple:
+    """
+    Os termos que mudam a resposta mesmo quando as perguntas são quase idênticas
+    para o modelo de embeddings: números (anos, quantidades), negações e nomes
+    próprios (palavras com maiúscula, exceto as palavras comuns no início da
+    pergunta), sem acentos.
+
+    "O que ela publicou em 1943?" e "O que ela publicou em 1944?" têm similaridade
+    de cosseno altíssima, mas termos diferentes.
+    """
+    terms = set()
+    for position, word in enumerate(_WORD.findall(question)):
+        folded = fold_accents(word)
+        is_name = word[0].isupper() and (position > 0 or folded not in _SENTENCE_STARTERS)
+        if folded.isdigit() or folded in _NEGATIONS or is_name:
+            terms.add(folded)
+    return tuple(sorted(terms))
+
+
+class SemanticAnswerCache:
+    """
+    Cache de respostas indexado pela semântica da pergunta.
+
+    Uma resposta é reaproveitada quando a nova pergunta tem similaridade de cosseno
+    de pelo menos `similarity_threshold` com uma pergunta já respondida, os mesmos
+    termos-chave (anos, números, negações e nomes; veja `key_terms`) **e** o
+    retriever devolveu exatamente os mesmos chunks, na mesma ordem, da mesma versão
+    do índice. Assim a resposta reaproveitada foi gerada a partir do mesmo prompt de
+    contexto, apenas com outra redação da pergunta.
+
+    As entradas são despejadas por LRU (`max_entries`) e por idade (`ttl_seconds`),
+    e podem ser persistidas em um arquivo JSON Lines: cada resposta nova é acrescentada
+    ao final, e o arquivo só é reescrito (compactado) quando passa de
+    `2 * max_entries` linhas.
+    """
+
+    def __init__(self, similarity_threshold: float = 0.95, max_entries: int = 1000,
+                 ttl_seconds: float = 86400, persist_path: str = None):
+        """
+        Args:
+            similarity_threshold (float): Similaridade mínima entre as perguntas.
+            max_entries (int): Número máximo de respostas guardadas.
+            ttl_seconds (float): Idade máxima de uma resposta, em segundos.
+            persist_path (str, opcional): Arquivo JSON onde o cache é salvo e carregado.
+        """
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persist_path = persist_path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._next_id = 0
+        self._persisted_lines = 0
+        self._lock = threading.Lock()
+
+        if persist_path and os.path.exists(persist_path):
+            self.load()
+
+    @classmethod
+    def from_env(cls):
+        """
+        Cria o cache a partir das variáveis SEMANTIC_CACHE_*. Desativado por padrão:
+        devolve None a menos que SEMANTIC_CACHE_ENABLED=true.
+        """
+        if os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() not in ("1", "true", "yes"):
+            return None
+        return cls(
+            similarity_threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.95)),
+            max_entries=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", 1000)),
+            ttl_seconds=float(os.getenv("SEMANTIC_CACHE_TTL", 86400)),
+            persist_path=os.getenv("SEMANTIC_CACHE_PATH") or None
+        )
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    @staticmethod
+    def _scope(chunk_ids: list, index_version: str, terms) -> tuple:
+        return (index_version, tuple(chunk_ids), tuple(terms))
+
+    def _evict_expired(self, now: float):
+        expired = [entry_id for entry_id, entry in self._entries.items()
+                   if now - entry['created_at'] > self.ttl_seconds]
+        for entry_id in expired:
+            del self._entries[entry_id]
+
+    def lookup(self, query_embedding, chunk_ids: list, index_version: str, question: str):
+        """
+        Returns:
+            str | None: A resposta guardada, ou None se não houver uma equivalente.
+        """
+        query = self._normalize(query_embedding)
+        scope = self._scope(chunk_ids, index_version, key_terms(question))
+        now = time.time()
+
+        with self._lock:
+            self._evict_expired(now)
+            candidates = [(entry_id, entry) for entry_id, entry in self._entries.items() if entry['scope'] == scope]
+            if candidates:
+                similarities = np.stack([entry['embedding'] for _, entry in candidates]) @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    entry_id, entry = candidates[best]
+                    self._entries.move_to_end(entry_id)
+                    self.hits += 1
+                    return entry['answer']
+            self.misses += 1
+            return None
+
+    def store(self, query_embedding, chunk_ids: list, index_version: str, question: str, answer: str):
+        with self._lock:
+            entry = self._entries[self._next_id] = {
+                'embedding': self._normalize(query_embedding),
+                'scope': self._scope(chunk_ids, index_version, key_terms(question)),
+                'answer': answer,
+                'created_at': time.time(),
+            }
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            if self.persist_path:
+                if self._persisted_lines >= 2 * self.max_entries:
+                    self._save_locked()
+                else:
+                    self._append_locked(entry)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self.persist_path:
+                self._save_locked()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _serialize(entry: dict) -> str:
+        index_version, chunk_ids, terms = entry['scope']
+        return json.dumps({
+            'embedding': entry['embedding'].tolist(),
+            'index_version': index_version,
+            'chunk_ids': list(chunk_ids),
+            'key_terms': list(terms),
+            'answer': entry['answer'],
+            'created_at': entry['created_at'],
+        }, ensure_ascii=False) + "\n"
+
+    def _append_locked(self, entry: dict):
+        directory = os.path.dirname(self.persist_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.persist_path, 'a', encoding='utf-8') as file:
+            file.write(self._serialize(entry))
+        self._persisted_lines += 1
+
+    def _save_locked(self):
+        """Reescreve o arquivo apenas com as entradas atuais."""
+        directory = os.path.dirname(self.persist_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.persist_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.writelines(self._serialize(entry) for entry in self._entries.values())
+        os.replace(tmp_path, self.persist_path)
+        self._persisted_lines = len(self._entries)
+
+    def save(self):
+        with self._lock:
+            self._save_locked()
+
+    def load(self):
+        with open(self.persist_path, 'r', encoding='utf-8') as file:
+            lines = [line for line in file if line.strip()]
+        items = []
+        for line in lines:
+            try:
+                items.append(json.loads(line))
+            except json.JSONDecodeError:
+                # Uma linha cortada por uma interrupção durante a gravação.
+                continue
+        with self._lock:
+            self._entries.clear()
+            for item in items[-self.max_entries:]:
+                if not isinstance(item, dict) or 'key_terms' not in item:
+                    # Formato anterior (uma lista JSON, sem os termos-chave): descartado.
+                    continue
+                self._entries[self._next_id] = {
+                    'embedding': self._normalize(item['embedding']),
+                    'scope': self._scope(item['chunk_ids'], item['index_version'], item['key_terms']),
+                    'answer': item['answer'],
+                    'created_at': item['created_at'],
+                }
+                self._next_id += 1
+            self._persisted_lines = len(lines)
+            self._evict_expired(time.time())
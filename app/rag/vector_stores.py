@@ -0,0 +1,645 @@
+import os
+import re
+import json
+import heapq
+import shutil
+import hashlib
+import logging
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .quantization import QUANTIZERS
+from .chunk_store import ChunkStore
+
+logger = logging.getLogger(__name__)
+
+
+def _filter_values(value) -> list:
+    return list(value) if isinstance(value, (list, tuple, set, frozenset)) else [value]
+
+
+def matches_filter(metadata: dict, filter: dict) -> bool:
+    """
+    Verifica se os metadados de um chunk atendem a um filtro no formato
+    `{campo: valor}` ou `{campo: [valores aceitos]}`; todos os campos precisam bater.
+    """
+    return all(metadata.get(field) in _filter_values(value) for field, value in (filter or {}).items())
+
+
+def _chroma_where(filter: dict):
+    """Traduz o filtro de metadados para a cláusula `where` do Chroma."""
+    if not filter:
+        return None
+    clauses = []
+    for field, value in filter.items():
+        values = _filter_values(value)
+        clauses.append({field: values[0]} if len(values) == 1 else {field: {"$in": values}})
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+class ChromaVectorStore:
+    """
+    Backend padrão: adapta o Chroma (persistido em SQLite) para a interface de
+    armazenamento usada pelo RAGRetriever.
+
+    A coleção é criada com distância de cosseno (`hnsw:space`), já que os modelos de
+    embeddings não devolvem vetores normalizados e a distância L2, padrão do Chroma,
+    não corresponde ao cosseno entre eles.
+    """
+
+    DISTANCE_SPACE = "cosine"
+
+    def __init__(self, persist_directory: str, embeddings):
+        self.persist_directory = persist_directory
+        self.embeddings = embeddings
+        self.store = self._open()
+
+    def _open(self):
+        # Importado aqui porque o chromadb é pesado e só é necessário neste backend.
+        from langchain_chroma import Chroma
+        store = Chroma(persist_directory=self.persist_directory, embedding_function=self.embeddings,
+                       collection_metadata={"hnsw:space": self.DISTANCE_SPACE})
+        # Uma coleção existente mantém o espaço com que foi criada.
+        self._space = (store._collection.metadata or {}).get("hnsw:space", "l2")
+        if self._space != self.DISTANCE_SPACE:
+            logger.warning("A coleção do Chroma em '%s' usa distância '%s'; as similaridades só estão corretas "
+                           "para embeddings normalizados. Reconstrua o índice (python -m app.build_index --full).",
+                           self.persist_directory, self._space)
+        return store
+
+    def ids(self) -> list:
+        return self.store.get(include=[])['ids']
+
+    def count(self) -> int:
+        return self.store._collection.count()
+
+    def get_documents(self, ids: list = None) -> list:
+        """Devolve os documentos com os IDs pedidos, na mesma ordem (todos, se `ids` for None)."""
+        if ids is not None and not ids:
+            return []
+        result = self.store.get(ids=ids, include=['documents', 'metadatas'])
+        by_id = {
+            chunk_id: Document(page_content=text, metadata=metadata or {})
+            for chunk_id, text, metadata in zip(result['ids'], result['documents'], result['metadatas'])
+        }
+        order = result['ids'] if ids is None else ids
+        return [by_id[chunk_id] for chunk_id in order if chunk_id in by_id]
+
+    def add(self, documents: list, ids: list):
+        if documents:
+            self.store.add_documents(documents=documents, ids=ids)
+
+    def delete(self, ids: list):
+        if ids:
+            self.store.delete(ids=ids)
+
+    def reset(self):
+        # Apaga a coleção pelo próprio cliente do Chroma em vez de remover o
+        # diretório, que pode estar aberto por este mesmo processo.
+        self.store.delete_collection()
+        self.store = self._open()
+
+    def persist(self):
+        # O Chroma grava as alterações no disco a cada operação.
+        pass
+
+    def _similarity(self, distance: float) -> float:
+        if self._space == "cosine":
+            return 1.0 - distance
+        # Coleções antigas, em L2: o Chroma devolve a distância ao quadrado, que para
+        # vetores normalizados equivale a 2 - 2 * cosseno.
+        return 1.0 - distance / 2.0
+
+    def search(self, query_embeddings: list, k: int, filter: dict = None) -> list:
+        """
+        Busca todas as queries em uma única consulta ao Chroma.
+
+        Args:
+            query_embeddings (list): Os embeddings das queries.
+            k (int): Número de resultados por query.
+            filter (dict, opcional): Filtro de metadados (veja `matches_filter`),
+                                     aplicado pelo Chroma antes da busca.
+
+        Returns:
+            list: Para cada query, uma lista de pares (Document, similaridade).
+        """
+        result = self.store._collection.query(
+            query_embeddings=[list(embedding) for embedding in query_embeddings],
+            n_results=k,
+            where=_chroma_where(filter),
+            include=['documents', 'metadatas', 'distances']
+        )
+        return [
+            [
+                (Document(page_content=text, metadata=metadata or {}), self._similarity(distance))
+                for text, metadata, distance in zip(texts, metadatas, distances)
+            ]
+            for texts, metadatas, distances in zip(result['documents'], result['metadatas'], result['distances'])
+        ]
+
+
+class NumpyVectorStore:
+    """
+    Backend de busca exata em memória, pensado para corpora pequenos e médios.
+
+    Os embeddings normalizados ficam em uma única matriz contígua (`vectors.npy`,
+    float32 ou float16) carregada com memory-map, e os textos e metadados em uma
+    ChunkStore colunar, também com memory-map. O top-k é calculado com produtos
+    escalares vetorizados e `argpartition`, sem nenhum servidor ou banco SQL, e só
+    os chunks do top-k viram `Document`s.
+
+    Com `quantization`, a primeira passada usa códigos int8 ou binários mantidos em
+    memória (`codes.npy`) e só os `k * rescore_factor` melhores candidatos são
+    reavaliados com os vetores completos, que ficam no disco (memory-map) e são
+    lidos apenas nas linhas necessárias.
+    """
+
+    VECTORS_FILE = "vectors.npy"
+    # Tabela lateral em JSON das versões anteriores; ainda lida, mas não mais gravada.
+    LEGACY_CHUNKS_FILE = "chunks.json"
+    CODES_FILE = "codes.npy"
+    QUANTIZER_FILE = "quantizer.npz"
+
+    def __init__(self, persist_directory: str, embeddings, dtype: str = "float32",
+                 quantization: str = None, rescore_factor: int = None):
+        """
+        Args:
+            persist_directory (str): Diretório onde a matriz e a tabela são salvas.
+            embeddings (Embeddings): Modelo usado para gerar os embeddings dos chunks.
+            dtype (str): "float32" ou "float16" (metade da memória, com pouca perda).
+            quantization (str, opcional): "int8" (4x menos memória) ou "binary" (32x
+                                          menos) para a primeira passada da busca.
+            rescore_factor (int, opcional): Candidatos reavaliados com precisão total,
+                                            como múltiplo de k (padrão: 4 para int8,
+                                            10 para binary). Maior = mais recall,
+                                            busca mais lenta.
+        """
+        if quantization in (None, "", "none"):
+            quantization = None
+        elif quantization not in QUANTIZERS:
+            raise ValueError(f"Quantização desconhecida: '{quantization}'. Opções: none, {', '.join(QUANTIZERS)}")
+        self.persist_directory = persist_directory
+        self.embeddings = embeddings
+        self.dtype = np.dtype(dtype)
+        self.quantization = quantization
+        if rescore_factor is None and quantization:
+            rescore_factor = QUANTIZERS[quantization].default_rescore_factor
+        self.rescore_factor = max(1, int(rescore_factor or 1))
+        self._quantizer = None
+        self._codes = None
+        self._vectors = np.zeros((0, 0), dtype=self.dtype)
+        self._chunks = ChunkStore()
+        self._row_by_id = None
+        # Blocos adicionados por `add` ainda não concatenados à matriz principal, para
+        # que inserções em lotes não copiem a matriz inteira a cada lote.
+        self._pending_vectors = []
+
+        vectors_path = os.path.join(persist_directory, self.VECTORS_FILE)
+        legacy_path = os.path.join(persist_directory, self.LEGACY_CHUNKS_FILE)
+        if os.path.exists(vectors_path) and ChunkStore.exists(persist_directory):
+            self._vectors = np.load(vectors_path, mmap_mode='r')
+            self._chunks = ChunkStore.load(persist_directory)
+            self._load_codes()
+        elif os.path.exists(vectors_path) and os.path.exists(legacy_path):
+            self._vectors = np.load(vectors_path, mmap_mode='r')
+            with open(legacy_path, 'r', encoding='utf-8') as file:
+                table = json.load(file)
+            columns = table['metadata']
+            self._chunks = ChunkStore.from_records(table['ids'], table['texts'], [
+                {field: values[i] for field, values in columns.items() if values[i] is not None}
+                for i in range(len(table['ids']))
+            ])
+            self._load_codes()
+
+    def _load_codes(self):
+        codes_path = os.path.join(self.persist_directory, self.CODES_FILE)
+        quantizer_path = os.path.join(self.persist_directory, self.QUANTIZER_FILE)
+        if not self.quantization or not (os.path.exists(codes_path) and os.path.exists(quantizer_path)):
+            return
+        with np.load(quantizer_path) as state:
+            if str(state['name']) != self.quantization:
+                return
+            quantizer = QUANTIZERS[self.quantization].from_state(state)
+        # Os códigos são lidos inteiros para a memória: são eles que a busca percorre.
+        codes = np.load(codes_path)
+        if codes.shape[0] == len(self._chunks):
+            self._quantizer, self._codes = quantizer, codes
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def ids(self) -> list:
+        return self._chunks.ids()
+
+    def count(self) -> int:
+        return len(self._chunks)
+
+    def _rows(self):
+        if self._row_by_id is None:
+            self._row_by_id = {chunk_id: row for row, chunk_id in enumerate(self._chunks.ids())}
+        return self._row_by_id
+
+    def _filter_rows(self, filter: dict):
+        """
+        Returns:
+            np.ndarray | None: As linhas (ordenadas) que atendem ao filtro, ou None sem filtro.
+        """
+        if not filter:
+            return None
+        rows = None
+        for field, value in filter.items():
+            matched = self._chunks.rows_matching(field, _filter_values(value))
+            rows = matched if rows is None else np.intersect1d(rows, matched, assume_unique=True)
+        return rows
+
+    def _document(self, row: int) -> Document:
+        return self._chunks.document(int(row))
+
+    def get_documents(self, ids: list = None) -> list:
+        """Devolve os documentos com os IDs pedidos, na mesma ordem (todos, se `ids` for None)."""
+        if ids is None:
+            return [self._document(row) for row in range(len(self._chunks))]
+        rows = self._rows()
+        return [self._document(rows[chunk_id]) for chunk_id in ids if chunk_id in rows]
+
+    def add(self, documents: list, ids: list):
+        if not documents:
+            return
+        vectors = self._normalize(np.asarray(
+            self.embeddings.embed_documents([doc.page_content for doc in documents]), dtype=np.float32
+        )).astype(self.dtype)
+
+        self._pending_vectors.append(vectors)
+        self._codes = None
+        self._chunks.append(ids, [doc.page_content for doc in documents], [doc.metadata for doc in documents])
+        self._row_by_id = None
+
+    def _consolidate(self):
+        if self._pending_vectors:
+            blocks = [np.asarray(self._vectors)] if self._vectors.shape[0] else []
+            self._vectors = np.concatenate(blocks + self._pending_vectors)
+            self._pending_vectors = []
+        return self._vectors
+
+    def delete(self, ids: list):
+        if not ids:
+            return
+        self._consolidate()
+        rows = self._rows()
+        drop = {rows[chunk_id] for chunk_id in ids if chunk_id in rows}
+        if not drop:
+            return
+        keep = [row for row in range(len(self._chunks)) if row not in drop]
+
+        self._vectors = np.asarray(self._vectors)[keep]
+        self._codes = None
+        self._chunks = self._chunks.take(keep)
+        self._row_by_id = None
+
+    def reset(self):
+        self._vectors = np.zeros((0, 0), dtype=self.dtype)
+        self._pending_vectors = []
+        self._codes = None
+        self._chunks = ChunkStore()
+        self._row_by_id = None
+
+    def persist(self):
+        """Grava a matriz e a tabela lateral, substituindo os arquivos de forma atômica."""
+        os.makedirs(self.persist_directory, exist_ok=True)
+        vectors_path = os.path.join(self.persist_directory, self.VECTORS_FILE)
+
+        with open(vectors_path + ".tmp", 'wb') as file:
+            np.save(file, np.ascontiguousarray(self._consolidate(), dtype=self.dtype))
+        self._chunks.save(self.persist_directory)
+        os.replace(vectors_path + ".tmp", vectors_path)
+        self._vectors = np.load(vectors_path, mmap_mode='r')
+        self._chunks = ChunkStore.load(self.persist_directory)
+        self._row_by_id = None
+        legacy_path = os.path.join(self.persist_directory, self.LEGACY_CHUNKS_FILE)
+        if os.path.exists(legacy_path):
+            os.remove(legacy_path)
+
+        if self.quantization:
+            self._ensure_codes()
+            codes_path = os.path.join(self.persist_directory, self.CODES_FILE)
+            quantizer_path = os.path.join(self.persist_directory, self.QUANTIZER_FILE)
+            with open(codes_path + ".tmp", 'wb') as file:
+                np.save(file, self._codes)
+            with open(quantizer_path + ".tmp", 'wb') as file:
+                np.savez(file, name=self.quantization, **self._quantizer.state())
+            os.replace(codes_path + ".tmp", codes_path)
+            os.replace(quantizer_path + ".tmp", quantizer_path)
+
+    def _blocks(self, block_size: int = 65536):
+        for start in range(0, len(self._chunks), block_size):
+            yield np.asarray(self._vectors[start:start + block_size], dtype=np.float32)
+
+    def _ensure_codes(self):
+        """Ajusta o quantizador e codifica a matriz inteira, em blocos, quando necessário."""
+        if self._codes is None:
+            dimension = self._consolidate().shape[1]
+            self._quantizer = QUANTIZERS[self.quantization].fit(self._blocks(), dimension)
+            # Sem linhas (store vazio), os códigos são uma matriz vazia da largura certa.
+            blocks = [self._quantizer.encode(block) for block in self._blocks()]
+            self._codes = (np.concatenate(blocks) if blocks
+                           else self._quantizer.encode(np.zeros((0, dimension), dtype=np.float32)))
+        return self._codes
+
+    def _scores(self, queries: np.ndarray, block_size: int = 65536) -> np.ndarray:
+        """Produtos escalares em blocos, para não converter a matriz inteira de uma vez."""
+        self._consolidate()
+        scores = np.empty((queries.shape[0], len(self._chunks)), dtype=np.float32)
+        for start, block in zip(range(0, len(self._chunks), block_size), self._blocks(block_size)):
+            scores[:, start:start + block.shape[0]] = queries @ block.T
+        return scores
+
+    def _read_rows(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Lê linhas dos vetores completos. Se a matriz está persistida, lê do arquivo com
+        `pread` em vez do memory-map, para que só essas linhas (e não páginas vizinhas)
+        ocupem a memória do processo.
+        """
+        vectors = self._vectors
+        if not isinstance(vectors, np.memmap) or not hasattr(os, 'pread'):
+            return np.asarray(vectors[rows])
+        row_bytes = vectors.shape[1] * vectors.dtype.itemsize
+        with open(vectors.filename, 'rb') as file:
+            data = b"".join(os.pread(file.fileno(), row_bytes, vectors.offset + int(row) * row_bytes) for row in rows)
+        return np.frombuffer(data, dtype=vectors.dtype).reshape(len(rows), vectors.shape[1])
+
+    def _quantized_top(self, queries: np.ndarray, k: int, rows: np.ndarray = None, block_size: int = 4096):
+        """
+        Primeira passada sobre os códigos quantizados e rescoring dos candidatos com
+        os vetores completos.
+
+        Args:
+            rows (np.ndarray, opcional): Restringe a busca a estas linhas.
+
+        Returns:
+            tuple: (linhas, similaridades), cada um com forma (queries, k), ainda sem ordenar.
+        """
+        # Blocos pequenos: a conversão temporária dos códigos cabe no cache da CPU.
+        codes = self._ensure_codes()
+        n_rows = len(self._chunks) if rows is None else len(rows)
+        approximate = np.empty((queries.shape[0], n_rows), dtype=np.float32)
+        for start in range(0, n_rows, block_size):
+            block = codes[start:start + block_size] if rows is None else codes[rows[start:start + block_size]]
+            approximate[:, start:start + block_size] = self._quantizer.scores(queries, block)
+
+        shortlist = min(n_rows, k * self.rescore_factor)
+        candidates = np.argpartition(-approximate, shortlist - 1, axis=1)[:, :shortlist]
+        if rows is not None:
+            candidates = rows[candidates]
+        top_rows = np.empty((queries.shape[0], k), dtype=np.int64)
+        top_scores = np.empty((queries.shape[0], k), dtype=np.float32)
+        for i, query_candidates in enumerate(candidates):
+            query_candidates = np.sort(query_candidates)
+            exact = self._read_rows(query_candidates).astype(np.float32) @ queries[i]
+            best = np.argpartition(-exact, k - 1)[:k]
+            top_rows[i], top_scores[i] = query_candidates[best], exact[best]
+        return top_rows, top_scores
+
+    def search(self, query_embeddings: list, k: int, filter: dict = None) -> list:
+        """
+        Busca exata por similaridade de cosseno para todas as queries de uma vez.
+
+        Args:
+            query_embeddings (list): Os embeddings das queries.
+            k (int): Número de resultados por query.
+            filter (dict, opcional): Filtro de metadados (veja `matches_filter`). As
+                                     linhas são selecionadas antes da busca, que só
+                                     lê e pontua os vetores delas.
+
+        Returns:
+            list: Para cada query, uma lista de pares (Document, similaridade).
+        """
+        rows = self._filter_rows(filter)
+        n_rows = len(self._chunks) if rows is None else len(rows)
+        if not n_rows:
+            return [[] for _ in query_embeddings]
+
+        queries = self._normalize(np.asarray(query_embeddings, dtype=np.float32))
+        k = min(k, n_rows)
+        if self.quantization:
+            top, top_scores = self._quantized_top(queries, k, rows)
+        else:
+            if rows is None:
+                scores = self._scores(queries)
+            else:
+                scores = queries @ np.asarray(self._consolidate()[rows], dtype=np.float32).T
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            if rows is not None:
+                top = rows[top]
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        return [
+            [
+                (self._document(row), float(score))
+                for row, score in zip(rows, row_scores)
+            ]
+            for rows, row_scores in zip(top, top_scores)
+        ]
+
+
+class ShardedVectorStore:
+    """
+    Divide o corpus em um banco vetorial por valor de um campo de metadado
+    (`shard_by`, por exemplo `source_file` ou `title`), cada um em
+    `shards/<nome>/` e com o backend escolhido.
+
+    Uma busca com filtro nesse campo consulta apenas os shards correspondentes;
+    sem filtro, consulta todos em paralelo e combina os top-k de cada um.
+    """
+
+    SHARDS_DIRECTORY = "shards"
+    MANIFEST_FILE = "shards.json"
+
+    def __init__(self, persist_directory: str, embeddings, shard_by: str, backend: str = "chroma",
+                 max_workers: int = None, **options):
+        """
+        Args:
+            persist_directory (str): Diretório do banco; os shards ficam em `shards/`.
+            embeddings (Embeddings): Modelo usado para gerar os embeddings dos chunks.
+            shard_by (str): Campo de metadado que define o shard de cada chunk.
+            backend (str): Backend de cada shard ("chroma" ou "numpy").
+            max_workers (int, opcional): Threads da busca em paralelo nos shards.
+            **options: Opções repassadas ao backend de cada shard.
+        """
+        self.persist_directory = persist_directory
+        self.embeddings = embeddings
+        self.shard_by = shard_by
+        self.backend = backend
+        self.options = options
+        self.max_workers = max_workers or min(8, os.cpu_count() or 1)
+        self._executor = None
+        self._shards = {}
+        self._directories = {}
+        self._shard_by_id = None
+
+        manifest_path = os.path.join(persist_directory, self.MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r', encoding='utf-8') as file:
+                manifest = json.load(file)
+            if manifest['shard_by'] != shard_by:
+                logger.warning("O banco em '%s' foi dividido por '%s', não por '%s'; ignorando os shards existentes.",
+                               persist_directory, manifest['shard_by'], shard_by)
+            else:
+                self._directories = dict(manifest['shards'])
+                for value, directory in self._directories.items():
+                    self._shards[value] = self._open_shard(directory)
+
+    @staticmethod
+    def _directory_for(value: str) -> str:
+        digest = hashlib.blake2b(value.encode('utf-8'), digest_size=4).hexdigest()
+        return f"{re.sub(r'[^A-Za-z0-9_-]+', '_', value)[:40]}-{digest}"
+
+    def _open_shard(self, directory: str):
+        return create_vector_store(self.backend, os.path.join(self.persist_directory, self.SHARDS_DIRECTORY,
+                                                              directory), self.embeddings, **self.options)
+
+    def _shard_key(self, metadata: dict) -> str:
+        return str(metadata.get(self.shard_by, ""))
+
+    def _shard_for(self, value: str):
+        if value not in self._shards:
+            self._directories[value] = self._directory_for(value)
+            self._shards[value] = self._open_shard(self._directories[value])
+        return self._shards[value]
+
+    def _id_index(self) -> dict:
+        if self._shard_by_id is None:
+            self._shard_by_id = {
+                chunk_id: value for value, shard in self._shards.items() for chunk_id in shard.ids()
+            }
+        return self._shard_by_id
+
+    @property
+    def shard_values(self) -> list:
+        return list(self._shards)
+
+    def ids(self) -> list:
+        return [chunk_id for shard in self._shards.values() for chunk_id in shard.ids()]
+
+    def count(self) -> int:
+        return sum(shard.count() for shard in self._shards.values())
+
+    def get_documents(self, ids: list = None) -> list:
+        """Devolve os documentos com os IDs pedidos, na mesma ordem (todos, se `ids` for None)."""
+        if ids is None:
+            return [doc for shard in self._shards.values() for doc in shard.get_documents()]
+        shard_by_id = self._id_index()
+        ids_by_shard = {}
+        for chunk_id in ids:
+            if chunk_id in shard_by_id:
+                ids_by_shard.setdefault(shard_by_id[chunk_id], []).append(chunk_id)
+        by_id = {
+            doc.metadata.get('chunk_id'): doc
+            for value, shard_ids in ids_by_shard.items()
+            for doc in self._shards[value].get_documents(shard_ids)
+        }
+        return [by_id[chunk_id] for chunk_id in ids if chunk_id in by_id]
+
+    def add(self, documents: list, ids: list):
+        groups = {}
+        for doc, chunk_id in zip(documents, ids):
+            group_docs, group_ids = groups.setdefault(self._shard_key(doc.metadata), ([], []))
+            group_docs.append(doc)
+            group_ids.append(chunk_id)
+        for value, (group_docs, group_ids) in groups.items():
+            self._shard_for(value).add(group_docs, group_ids)
+            if self._shard_by_id is not None:
+                self._shard_by_id.update((chunk_id, value) for chunk_id in group_ids)
+
+    def delete(self, ids: list):
+        shard_by_id = self._id_index()
+        ids_by_shard = {}
+        for chunk_id in ids:
+            if chunk_id in shard_by_id:
+                ids_by_shard.setdefault(shard_by_id.pop(chunk_id), []).append(chunk_id)
+        for value, shard_ids in ids_by_shard.items():
+            self._shards[value].delete(shard_ids)
+            if not self._shards[value].count():
+                # Shards esvaziados saem da lista; `persist` remove o diretório deles.
+                del self._shards[value]
+                del self._directories[value]
+
+    def reset(self):
+        for shard in self._shards.values():
+            shard.reset()
+        self._shards = {}
+        self._directories = {}
+        self._shard_by_id = {}
+
+    def persist(self):
+        """Grava cada shard e a lista de shards; remove diretórios de shards que deixaram de existir."""
+        for shard in self._shards.values():
+            shard.persist()
+        os.makedirs(self.persist_directory, exist_ok=True)
+        manifest_path = os.path.join(self.persist_directory, self.MANIFEST_FILE)
+        with open(manifest_path + ".tmp", 'w', encoding='utf-8') as file:
+            json.dump({'shard_by': self.shard_by, 'shards': self._directories}, file, ensure_ascii=False)
+        os.replace(manifest_path + ".tmp", manifest_path)
+
+        shards_root = os.path.join(self.persist_directory, self.SHARDS_DIRECTORY)
+        live = set(self._directories.values())
+        for directory in (os.listdir(shards_root) if os.path.isdir(shards_root) else []):
+            if directory not in live:
+                shutil.rmtree(os.path.join(shards_root, directory), ignore_errors=True)
+
+    def _selected_shards(self, filter: dict):
+        """Os shards que podem ter resultados, e o filtro que ainda resta aplicar dentro deles."""
+        if not filter or self.shard_by not in filter:
+            return list(self._shards.values()), filter
+        wanted = {str(value) for value in _filter_values(filter[self.shard_by])}
+        remaining = {field: value for field, value in filter.items() if field != self.shard_by}
+        return [shard for value, shard in self._shards.items() if value in wanted], remaining or None
+
+    def search(self, query_embeddings: list, k: int, filter: dict = None) -> list:
+        """
+        Busca nos shards selecionados pelo filtro (todos, sem filtro em `shard_by`),
+        em paralelo, e combina os resultados pela similaridade.
+
+        Returns:
+            list: Para cada query, uma lista de pares (Document, similaridade).
+        """
+        shards, shard_filter = self._selected_shards(filter)
+        if not shards:
+            return [[] for _ in query_embeddings]
+        if len(shards) == 1:
+            return shards[0].search(query_embeddings, k, filter=shard_filter)
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="shard-search")
+        futures = [self._executor.submit(shard.search, query_embeddings, k, filter=shard_filter) for shard in shards]
+        per_shard = [future.result() for future in futures]
+        return [
+            heapq.nlargest(k, itertools.chain.from_iterable(hits), key=lambda hit: hit[1])
+            for hits in zip(*per_shard)
+        ]
+
+
+VECTOR_STORE_BACKENDS = {
+    "chroma": ChromaVectorStore,
+    "numpy": NumpyVectorStore,
+}
+
+
+def create_vector_store(backend: str, persist_directory: str, embeddings, **options):
+    """
+    Abre o backend de armazenamento vetorial pelo nome ("chroma" ou "numpy").
+    """
+    try:
+        store_class = VECTOR_STORE_BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Backend de vector store desconhecido: '{backend}'. "
+                         f"Opções: {', '.join(VECTOR_STORE_BACKENDS)}")
+    return store_class(persist_directory, embeddings, **options)
@@ -0,0 +1,260 @@
+import os
+import re
+import json
+
+from .lexical import fold_accents, tokenize
+
+_COUNT = re.compile(r'\b(quant[oa]s|quantidade|numero de|total de|conte)\b')
+_LIST = re.compile(r'\b(quais|liste|listar|lista|cite|enumere|relacione|mostre)\b')
+# Verbos de autoria: com eles, palavras genéricas como "livros" se referem às obras da autora.
+_AUTHORSHIP = re.compile(r'\b(escreveu|escritos?|escritas?|publicou|publicad[oa]s?|lancou|lancad[oa]s?|'
+                         r'produziu|autoria|obras de|obras da|obras do|livros de|livros da|livros do)\b')
+_YEAR = r'(1[5-9]\d{2}|20\d{2})'
+
+# Palavras que se referem a qualquer categoria da lista de obras.
+GENERIC_WORK_WORDS = frozenset({'obra', 'livro', 'publicaca', 'publicacao', 'titulo', 'escrito'})
+# Sinônimos (já tokenizados) das palavras das categorias.
+CATEGORY_SYNONYMS = {
+    'infantis': 'infantil',
+    'crianca': 'infantil',
+    'carta': 'correspondencia',
+    'jornal': 'artigo',
+    'cronica': 'cronica',
+}
+# Palavras dos nomes das categorias que, sozinhas, não identificam a categoria.
+_WEAK_CATEGORY_WORDS = frozenset({'literatura', 'jornal'})
+# Palavras que uma pergunta sobre a lista de obras pode ter além da categoria, da autora
+# e do ano. Qualquer outra ("traduzidas", "famosas", "família") restringe a pergunta de
+# um jeito que o índice não sabe responder, e ela segue pelo RAG. A comparação é feita
+# com as formas que `tokenize` produz ("antes" vira "ante").
+_QUESTION_WORDS = frozenset(token for word in (
+    'quanto', 'quanta', 'quantidade', 'numero', 'total', 'conte', 'liste', 'listar', 'lista', 'cite',
+    'enumere', 'relacione', 'mostre', 'sao', 'todo', 'toda',
+    'escreveu', 'escrito', 'escrita', 'publicou', 'publicado', 'publicada', 'lancou', 'lancado', 'lancada',
+    'produziu', 'autoria', 'autora', 'autor', 'escritora', 'escritor',
+    'depois', 'apos', 'antes', 'partir', 'desde', 'decada', 'anos', 'ano',
+) for token in tokenize(word))
+# Negações e exclusões ("não escreveu", "sem ser romance"), que `tokenize` descarta como
+# stopwords. O índice não sabe responder pelo complemento, e a pergunta segue pelo RAG.
+_NEGATION = re.compile(r'\b(nao|sem|exceto|excluindo|nenhum|nenhuma|nunca|jamais|nem)\b')
+# Referências à autora sem o nome, aceitas quando o corpus tem uma única autora.
+_AUTHOR_REFERENCE = re.compile(r'\b(ela|ele|dela|dele|sua|suas|seu|seus|autora|autor|escritora|escritor)\b')
+
+
+def extract_works(data: dict, source_file: str) -> list:
+    """Extrai os itens `works_list` de um arquivo JSON do scraper."""
+    author = data.get('metadata', {}).get('title', 'Sem Título')
+    works = []
+    for section in data.get('content_sections', []):
+        for item in section.get('content', []):
+            if item.get('type') != 'works_list':
+                continue
+            for work in item.get('items', []):
+                year = work.get('year')
+                works.append({
+                    'title': work.get('title'),
+                    'year': int(year) if year and str(year).isdigit() else None,
+                    'category': item.get('category', 'Sem Categoria'),
+                    'author': author,
+                    'source_file': source_file,
+                })
+    return works
+
+
+class YearFilter:
+    """Filtro de ano extraído da pergunta ("em 1977", "antes de 1960", "entre 1960 e 1970"...)."""
+
+    def __init__(self, start: int = None, end: int = None, description: str = ""):
+        self.start = start
+        self.end = end
+        self.description = description
+
+    def matches(self, year) -> bool:
+        if year is None:
+            return False
+        return (self.start is None or year >= self.start) and (self.end is None or year <= self.end)
+
+    @classmethod
+    def parse(cls, folded_question: str):
+        """
+        Returns:
+            YearFilter | None: O filtro, ou None se a pergunta não menciona anos.
+        """
+        match = re.search(rf'\bentre\s+{_YEAR}\s+e\s+{_YEAR}\b', folded_question)
+        if match:
+            start, end = sorted((int(match.group(1)), int(match.group(2))))
+            return cls(start, end, f" entre {start} e {end}")
+        match = re.search(rf'\bdecada de\s+{_YEAR}\b', folded_question)
+        if match:
+            decade = int(match.group(1)) // 10 * 10
+            return cls(decade, decade + 9, f" na década de {decade}")
+        match = re.search(r'\banos\s+([2-9]0)\b', folded_question)
+        if match:
+            decade = 1900 + int(match.group(1))
+            return cls(decade, decade + 9, f" na década de {decade}")
+        match = re.search(rf'\bantes de\s+{_YEAR}\b', folded_question)
+        if match:
+            year = int(match.group(1))
+            return cls(None, year - 1, f" antes de {year}")
+        match = re.search(rf'\bate\s+{_YEAR}\b', folded_question)
+        if match:
+            year = int(match.group(1))
+            return cls(None, year, f" até {year}")
+        match = re.search(rf'\b(depois de|apos)\s+{_YEAR}\b', folded_question)
+        if match:
+            year = int(match.group(2))
+            return cls(year + 1, None, f" depois de {year}")
+        match = re.search(rf'\b(a partir de|desde)\s+{_YEAR}\b', folded_question)
+        if match:
+            year = int(match.group(2))
+            return cls(year, None, f" a partir de {year}")
+        match = re.search(rf'\b{_YEAR}\b', folded_question)
+        if match:
+            year = int(match.group(1))
+            return cls(year, year, f" em {year}")
+        return None
+
+
+class WorksIndex:
+    """
+    Índice estruturado das listas de obras (`works_list`) do corpus.
+
+    Responde diretamente, sem recuperar chunks nem chamar o Gemini, perguntas de
+    contagem ("Quantos romances ela escreveu?"), de listagem ("Quais são os livros
+    infantis dela?") e com filtro de ano ("O que ela publicou depois de 1970?").
+    Perguntas que não se encaixam com segurança nesses padrões devolvem None e seguem
+    pelo RAG, inclusive as que têm qualquer palavra além do tipo de obra, da autora e
+    do ano ("Quais contos falam de família?").
+    """
+
+    FILE_NAME = "works_index.json"
+
+    def __init__(self, works: list = None):
+        self.works = works or []
+        self.categories = sorted({work['category'] for work in self.works})
+        self.authors = sorted({work['author'] for work in self.works})
+        self._category_keywords = {category: self._keywords(category) for category in self.categories}
+        self._known_words = (
+            _QUESTION_WORDS | GENERIC_WORK_WORDS | set(CATEGORY_SYNONYMS)
+            | {token for category in self.categories for token in tokenize(category)}
+            | {token for author in self.authors for token in tokenize(author)}
+        )
+
+    def __len__(self):
+        return len(self.works)
+
+    @staticmethod
+    def _keywords(category: str) -> set:
+        tokens = {CATEGORY_SYNONYMS.get(token, token) for token in tokenize(category)}
+        strong = tokens - _WEAK_CATEGORY_WORDS
+        return strong or tokens
+
+    @classmethod
+    def build(cls, json_paths: list) -> "WorksIndex":
+        works = []
+        for json_path in json_paths:
+            with open(json_path, 'r', encoding='utf-8') as file:
+                works.extend(extract_works(json.load(file), os.path.basename(json_path)))
+        return cls(works)
+
+    def save(self, path: str):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump({'works': self.works}, file, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "WorksIndex":
+        with open(path, 'r', encoding='utf-8') as file:
+            return cls(json.load(file)['works'])
+
+    def _match_categories(self, tokens: set) -> list:
+        tokens = {CATEGORY_SYNONYMS.get(token, token) for token in tokens}
+        return [category for category, keywords in self._category_keywords.items() if keywords & tokens]
+
+    def _match_author(self, folded_question: str):
+        """A autora citada pelo nome ou, com uma única autora no corpus, por um pronome ("ela")."""
+        mentioned = [
+            author for author in self.authors
+            if any(len(word) > 3 and re.search(rf'\b{re.escape(word)}\b', folded_question)
+                   for word in fold_accents(author).split())
+        ]
+        if len(mentioned) == 1:
+            return mentioned[0]
+        if not mentioned and len(self.authors) == 1 and _AUTHOR_REFERENCE.search(folded_question):
+            return self.authors[0]
+        return None
+
+    def _has_unknown_words(self, tokens: set, year_filter) -> bool:
+        for token in tokens - self._known_words:
+            if not (year_filter is not None and token.isdigit()):
+                return True
+        return False
+
+    def answer(self, question: str):
+        """
+        Returns:
+            str | None: A resposta, ou None se a pergunta deve seguir pelo RAG.
+        """
+        if not self.works:
+            return None
+        folded = fold_accents(question)
+        if _NEGATION.search(folded):
+            return None
+        tokens = set(tokenize(question))
+        wants_count = bool(_COUNT.search(folded))
+        wants_list = bool(_LIST.search(folded))
+        year_filter = YearFilter.parse(folded)
+
+        categories = self._match_categories(tokens)
+        generic = bool(tokens & GENERIC_WORK_WORDS) or bool(_AUTHORSHIP.search(folded))
+        if not categories:
+            # Palavras genéricas ("livros") só valem com contagem, autoria ou ano, para
+            # não capturar perguntas como "Quais livros influenciaram Clarice?".
+            if not (generic and (wants_count or year_filter or _AUTHORSHIP.search(folded))):
+                return None
+        if not (wants_count or wants_list or (year_filter and (categories or generic))):
+            return None
+        if self._has_unknown_words(tokens, year_filter):
+            return None
+
+        author = self._match_author(folded)
+        if author is None:
+            return None
+
+        selected = [
+            work for work in self.works
+            if work['author'] == author
+            and (not categories or work['category'] in categories)
+            and (year_filter is None or year_filter.matches(work['year']))
+        ]
+        return self._format(author, categories, selected, year_filter, wants_count)
+
+    @staticmethod
+    def _format_work(work: dict) -> str:
+        return f"- {work['title']} ({work['year']})" if work['year'] else f"- {work['title']}"
+
+    def _format(self, author: str, categories: list, selected: list, year_filter, wants_count: bool) -> str:
+        year_description = year_filter.description if year_filter else ""
+        scope = (f" na categoria \"{categories[0]}\"" if len(categories) == 1
+                 else f" nas categorias {', '.join(categories)}" if categories
+                 else "" if year_filter else " no total")
+        count = len(selected)
+        noun = "obra" if count == 1 else "obras"
+
+        if not selected:
+            return f"Nenhuma obra de {author}{scope}{year_description} consta na lista de obras."
+
+        by_category = {}
+        for work in selected:
+            by_category.setdefault(work['category'], []).append(work)
+
+        if wants_count:
+            lines = [f"A lista de obras de {author} tem {count} {noun}{scope}{year_description}."]
+        else:
+            lines = [f"Obras de {author}{scope}{year_description} ({count}):"]
+        for category, works in by_category.items():
+            if len(by_category) > 1 or not categories:
+                lines.append(f"\n{category} ({len(works)}):")
+            lines.extend(self._format_work(work) for work in works)
+        return "\n".join(lines)
@@ -0,0 +1,97 @@
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+HEAVY_MODULES = ["torch", "transformers", "chromadb", "langchain_chroma", "google.generativeai"]
+
+DEFAULT_QUESTION = "Qual foi o primeiro romance de Clarice Lispector?"
+
+
+def _measure(question: str, ask: bool, warm_up: bool) -> dict:
+    """
+    Executado em um interpretador novo: mede a importação do pipeline, a construção
+    e a latência da primeira consulta.
+    """
+    timings = {}
+
+    start = time.perf_counter()
+    from dotenv import load_dotenv
+    load_dotenv()
+    from app.rag.pipeline import RAGPipeline
+    timings['import_seconds'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pipeline = RAGPipeline()
+    timings['construct_seconds'] = time.perf_counter() - start
+    timings['heavy_modules_after_construct'] = [name for name in HEAVY_MODULES if name in sys.modules]
+
+    if warm_up:
+        start = time.perf_counter()
+        pipeline.warm_up(background=True).join()
+        timings['warm_up_seconds'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pipeline.retriever.retrieve_context(question)
+    timings['first_retrieve_seconds'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pipeline.retriever.retrieve_context(question)
+    timings['second_retrieve_seconds'] = time.perf_counter() - start
+
+    if ask:
+        start = time.perf_counter()
+        pipeline.ask(question)
+        timings['first_ask_seconds'] = time.perf_counter() - start
+
+    return timings
+
+
+def benchmark_startup(runs: int = 3, question: str = DEFAULT_QUESTION, ask: bool = False,
+                      warm_up: bool = False) -> list:
+    """
+    Roda a medição `runs` vezes, cada uma em um processo Python novo (partida a frio).
+    """
+    results = []
+    for run in range(runs):
+        command = [sys.executable, __file__, "--child", "--question", question]
+        if ask:
+            command.append("--ask")
+        if warm_up:
+            command.append("--warm-up")
+
+        start = time.perf_counter()
+        completed = subprocess.run(command, capture_output=True, text=True, check=True)
+        timings = json.loads(completed.stdout.strip().splitlines()[-1])
+        timings['process_seconds'] = time.perf_counter() - start
+        results.append(timings)
+
+        print(f"Execução {run + 1}: importação {timings['import_seconds'] * 1000:.0f} ms, "
+              f"construção {timings['construct_seconds'] * 1000:.0f} ms, "
+              f"primeira busca {timings['first_retrieve_seconds'] * 1000:.0f} ms, "
+              f"segunda busca {timings['second_retrieve_seconds'] * 1000:.0f} ms")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mede o tempo de partida a frio do pipeline RAG.")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--question", default=DEFAULT_QUESTION)
+    parser.add_argument("--ask", action="store_true", help="Mede também a primeira resposta completa.")
+    parser.add_argument("--warm-up", action="store_true", help="Aquece o pipeline antes da primeira busca.")
+    parser.add_argument("--output", help="Arquivo JSON onde os resultados são salvos.")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        timings = _measure(args.question, args.ask, args.warm_up)
+        sys.stdout.flush()
+        print(json.dumps(timings))
+        sys.exit(0)
+
+    results = benchmark_startup(args.runs, args.question, args.ask, args.warm_up)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+        print(f"Resultados salvos em '{args.output}'.")
@@ -0,0 +1,191 @@
+"""
+Teste de carga do servidor pre-fork (app.api.prefork).
+
+Para cada número de workers, sobe o servidor, dispara requisições concorrentes
+contra um endpoint durante um intervalo fixo e mede requisições por segundo e
+latências; no fim mostra como o throughput escala com o número de workers.
+
+    python -m benchmarks.load_test --workers 1 2 4 --concurrency 32 --duration 20
+
+As requisições são feitas por vários processos clientes (cada um com várias
+threads e conexões keep-alive), para que o próprio cliente não limite o resultado.
+A configuração do servidor (backend, modelo, ...) vem das variáveis de ambiente.
+"""
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import threading
+import subprocess
+import http.client
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+DEFAULT_QUESTIONS_FILE = "evaluation_questions.json"
+STARTUP_TIMEOUT_SECONDS = 600
+
+
+def _load_questions(path: str) -> list:
+    with open(path, 'r', encoding='utf-8') as file:
+        data = json.load(file)
+    return [item['question'] if isinstance(item, dict) else item for item in data]
+
+
+def _wait_until_ready(host: str, port: int, process: subprocess.Popen, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"O servidor terminou durante a inicialização (código {process.returncode}).")
+        try:
+            connection = http.client.HTTPConnection(host, port, timeout=2)
+            connection.request("GET", "/health")
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError("O servidor não ficou pronto a tempo.")
+
+
+def _client(host: str, port: int, path: str, questions: list, k: int, threads: int, duration: float,
+            offset: int) -> dict:
+    """Processo cliente: `threads` conexões fazendo requisições em sequência até o fim do intervalo."""
+    latencies = [[] for _ in range(threads)]
+    errors = [0] * threads
+    deadline = time.perf_counter() + duration
+
+    def run(slot: int):
+        connection = http.client.HTTPConnection(host, port, timeout=60)
+        i = offset + slot
+        while time.perf_counter() < deadline:
+            body = json.dumps({'question': questions[i % len(questions)], 'k': k})
+            i += threads
+            start = time.perf_counter()
+            try:
+                connection.request("POST", path, body=body, headers={'Content-Type': 'application/json'})
+                response = connection.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection(host, port, timeout=60)
+                ok = False
+            if ok:
+                latencies[slot].append(time.perf_counter() - start)
+            else:
+                errors[slot] += 1
+        connection.close()
+
+    workers = [threading.Thread(target=run, args=(slot,)) for slot in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return {'latencies': [value for values in latencies for value in values], 'errors': sum(errors)}
+
+
+def run_load(host: str, port: int, path: str, questions: list, k: int, concurrency: int, duration: float,
+             client_processes: int) -> dict:
+    client_processes = max(1, min(client_processes, concurrency))
+    threads = [concurrency // client_processes + (i < concurrency % client_processes)
+               for i in range(client_processes)]
+    with ProcessPoolExecutor(max_workers=client_processes) as pool:
+        futures = [
+            pool.submit(_client, host, port, path, questions, k, n, duration, i * 1000)
+            for i, n in enumerate(threads)
+        ]
+        results = [future.result() for future in futures]
+
+    latencies = np.array([value for result in results for value in result['latencies']])
+    errors = sum(result['errors'] for result in results)
+    percentile = (lambda q: float(np.percentile(latencies, q) * 1000)) if len(latencies) else (lambda q: None)
+    return {
+        'requests': int(len(latencies)),
+        'errors': errors,
+        'requests_per_second': len(latencies) / duration,
+        'latency_p50_ms': percentile(50),
+        'latency_p95_ms': percentile(95),
+        'latency_p99_ms': percentile(99),
+    }
+
+
+def run_case(workers: int, args, questions: list) -> dict:
+    command = [
+        sys.executable, "-m", "app.api.prefork", "--host", args.host, "--port", str(args.port),
+        "--workers", str(workers),
+    ]
+    if args.threads_per_worker:
+        command += ["--threads-per-worker", str(args.threads_per_worker)]
+    server = subprocess.Popen(command, stdout=subprocess.DEVNULL,
+                              stderr=None if args.verbose else subprocess.DEVNULL)
+    try:
+        _wait_until_ready(args.host, args.port, server, STARTUP_TIMEOUT_SECONDS)
+        # Aquecimento: conexões, caches e o primeiro lote de cada worker.
+        run_load(args.host, args.port, args.endpoint, questions, args.k, args.concurrency,
+                 min(2.0, args.duration), args.client_processes)
+        result = run_load(args.host, args.port, args.endpoint, questions, args.k, args.concurrency,
+                          args.duration, args.client_processes)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+    return {'workers': workers, **result}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do servidor pre-fork.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4],
+                        help="Números de workers testados.")
+    parser.add_argument("--threads-per-worker", type=int, default=0,
+                        help="Repassado ao servidor (padrão: núcleos / workers).")
+    parser.add_argument("--endpoint", default="/retrieve", choices=["/retrieve", "/ask"])
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=32, help="Requisições simultâneas.")
+    parser.add_argument("--duration", type=float, default=20.0, help="Segundos de carga por caso.")
+    parser.add_argument("--client-processes", type=int, default=max(1, (os.cpu_count() or 1) // 4),
+                        help="Processos que geram a carga.")
+    parser.add_argument("--questions", default=DEFAULT_QUESTIONS_FILE)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--output", help="Arquivo JSON onde os resultados são salvos.")
+    parser.add_argument("--verbose", action="store_true", help="Mostra o log do servidor.")
+    args = parser.parse_args()
+
+    questions = _load_questions(args.questions)
+    cases = []
+    for workers in args.workers:
+        print(f"Testando com {workers} worker(s)...")
+        case = run_case(workers, args, questions)
+        cases.append(case)
+        print(f"  {case['requests_per_second']:.1f} req/s, p50 {case['latency_p50_ms'] or 0:.1f} ms, "
+              f"p99 {case['latency_p99_ms'] or 0:.1f} ms, {case['errors']} erros")
+
+    base = cases[0]
+    print(f"\n{'workers':>8} {'req/s':>10} {'speedup':>8} {'eficiência':>11} {'p50 ms':>8} {'p99 ms':>8}")
+    for case in cases:
+        speedup = case['requests_per_second'] / base['requests_per_second'] if base['requests_per_second'] else 0
+        case['speedup'] = speedup
+        case['efficiency'] = speedup * base['workers'] / case['workers']
+        print(f"{case['workers']:>8} {case['requests_per_second']:>10.1f} {speedup:>7.2f}x "
+              f"{case['efficiency'] * 100:>10.0f}% {case['latency_p50_ms'] or 0:>8.1f} "
+              f"{case['latency_p99_ms'] or 0:>8.1f}")
+
+    if args.output:
+        results = {
+            'metadata': {'endpoint': args.endpoint, 'concurrency': args.concurrency, 'duration': args.duration,
+                         'cpu_count': os.cpu_count(), 'backend': os.getenv("VECTOR_STORE_BACKEND", "chroma")},
+            'cases': cases,
+        }
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+        print(f"Resultados salvos em '{args.output}'.")
+
+
+if __name__ == '__main__':
+    main()
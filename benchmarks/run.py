@@ -0,0 +1,270 @@
+import os
+import sys
+import gc
+import json
+import time
+import shutil
+import platform
+import argparse
+import resource
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+
+import numpy as np
+
+from app.rag.fake_models import HashingEmbeddings
+from app.rag.ingestion import iter_chunks, batched
+from app.rag.vector_stores import create_vector_store
+from benchmarks.synthetic import SyntheticCorpus
+
+DEFAULT_CACHE_DIR = os.path.join(".cache", "benchmarks")
+
+# Métricas comparadas com `--baseline`, e se um valor maior é melhor.
+COMPARED_METRICS = {
+    'build_chunks_per_second': True,
+    'load_seconds': False,
+    'query_p50_ms': False,
+    'query_p95_ms': False,
+    'query_p99_ms': False,
+    'batch_queries_per_second': True,
+    'memory_rss_bytes': False,
+    'disk_bytes': False,
+    'recall_at_k': True,
+}
+
+
+def _current_rss() -> int:
+    """RSS atual do processo em bytes (Linux); 0 onde /proc não existe."""
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _peak_rss() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss está em KB no Linux e em bytes no macOS.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _directory_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+
+def exact_kth_scores(corpus_dir: str, embeddings, queries: np.ndarray, k: int, chunk_size: int,
+                     chunk_overlap: int, batch_size: int) -> np.ndarray:
+    """
+    Similaridade do k-ésimo vizinho exato (float32, força bruta) de cada query,
+    calculada em uma passada em streaming sobre o corpus para servir de referência
+    ao recall. Só as k maiores similaridades de cada query ficam em memória.
+
+    Returns:
+        np.ndarray: Vetor float32 de forma (n_queries,) com, para cada query, a
+                    similaridade do k-ésimo chunk mais próximo (ou do último, se o
+                    corpus tiver menos de k chunks).
+    """
+    best_scores = np.full((queries.shape[0], 0), -np.inf, dtype=np.float32)
+    for batch in batched(iter_chunks(chunk_size, chunk_overlap, data_directory=corpus_dir), batch_size):
+        vectors = embeddings.embed_array([doc.page_content for _, doc in batch])
+        scores = np.concatenate([best_scores, queries @ vectors.T], axis=1)
+        keep = min(k, scores.shape[1])
+        best_scores = -np.partition(-scores, keep - 1, axis=1)[:, :keep]
+    return best_scores.min(axis=1)
+
+
+def run_case(corpus_dir: str, backend: str, n_queries: int, k: int, queries: list, seed: int,
+             chunk_size: int = 1000, chunk_overlap: int = 200, batch_size: int = 1024,
+             dimension: int = 384, store_options: dict = None) -> dict:
+    """
+    Mede um backend sobre um corpus já gerado: construção, tamanho em disco, carga,
+    latência por query, vazão em lote, memória e recall contra a busca exata.
+    """
+    store_options = store_options or {}
+    embeddings = HashingEmbeddings(dimension)
+    store_dir = tempfile.mkdtemp(prefix=f"bench-{backend}-")
+    result = {'backend': backend, 'options': store_options, 'k': k, 'queries': n_queries}
+    try:
+        store = create_vector_store(backend, store_dir, embeddings, **store_options)
+        start = time.perf_counter()
+        n_chunks = 0
+        for batch in batched(iter_chunks(chunk_size, chunk_overlap, data_directory=corpus_dir), batch_size):
+            store.add([doc for _, doc in batch], [chunk_id for chunk_id, _ in batch])
+            n_chunks += len(batch)
+        store.persist()
+        build_seconds = time.perf_counter() - start
+        result.update({
+            'chunks': n_chunks,
+            'build_seconds': build_seconds,
+            'build_chunks_per_second': n_chunks / build_seconds if build_seconds else None,
+            'disk_bytes': _directory_size(store_dir),
+        })
+        del store
+        gc.collect()
+
+        query_vectors = embeddings.embed_array(queries)
+        rss_before = _current_rss()
+        start = time.perf_counter()
+        store = create_vector_store(backend, store_dir, embeddings, **store_options)
+        result['load_seconds'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        store.search([query_vectors[0].tolist()], k)
+        result['first_query_seconds'] = time.perf_counter() - start
+
+        latencies = []
+        found = []
+        for vector in query_vectors:
+            start = time.perf_counter()
+            hits = store.search([vector.tolist()], k)[0]
+            latencies.append(time.perf_counter() - start)
+            found.append([doc.page_content for doc, _ in hits])
+        p50, p95, p99 = np.percentile(np.asarray(latencies) * 1000, [50, 95, 99])
+        result.update({'query_p50_ms': float(p50), 'query_p95_ms': float(p95), 'query_p99_ms': float(p99)})
+
+        start = time.perf_counter()
+        store.search(query_vectors.tolist(), k)
+        batch_seconds = time.perf_counter() - start
+        result['batch_queries_per_second'] = len(queries) / batch_seconds if batch_seconds else None
+        result['memory_rss_bytes'] = max(0, _current_rss() - rss_before)
+
+        # Um resultado conta como acerto se a sua similaridade exata alcança a do
+        # k-ésimo vizinho exato; assim empates na fronteira não contam como erro.
+        thresholds = exact_kth_scores(corpus_dir, embeddings, query_vectors, k, chunk_size, chunk_overlap, batch_size)
+        recalls = []
+        for vector, texts, threshold in zip(query_vectors, found, thresholds):
+            exact_scores = embeddings.embed_array(texts) @ vector if texts else np.zeros(0)
+            recalls.append(float(np.sum(exact_scores >= threshold - 1e-5)) / min(k, result['chunks']))
+        result['recall_at_k'] = float(np.mean(recalls))
+        result['peak_rss_bytes'] = _peak_rss()
+    finally:
+        shutil.rmtree(store_dir, ignore_errors=True)
+    return result
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Compara dois arquivos de resultados, caso a caso (tamanho + backend + opções).
+
+    Returns:
+        list: As regressões maiores que `tolerance` (fração, ex.: 0.1 = 10%).
+    """
+    def _key(case):
+        return (case['size'], case['backend'], json.dumps(case.get('options', {}), sort_keys=True))
+
+    baseline_cases = {_key(case): case for case in baseline.get('results', [])}
+    regressions = []
+    for case in results['results']:
+        previous = baseline_cases.get(_key(case))
+        if previous is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = previous.get(metric), case.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            regressed = change < -tolerance if higher_is_better else change > tolerance
+            print(f"  {case['backend']:>8} {case['size']:>9} {metric:<26} {old:>14.4f} -> {new:>14.4f} "
+                  f"({change * 100:+.1f}%){'  <-- REGRESSÃO' if regressed else ''}")
+            if regressed:
+                regressions.append({'size': case['size'], 'backend': case['backend'], 'metric': metric,
+                                    'baseline': old, 'current': new, 'change': change})
+    return regressions
+
+
+def run_benchmarks(sizes: list, backends: list, n_queries: int = 200, k: int = 10, seed: int = 0,
+                   cache_dir: str = DEFAULT_CACHE_DIR, store_options: dict = None) -> dict:
+    """
+    Roda cada combinação (tamanho, backend) em um processo Python novo, para que
+    memória e tempo de carga de um caso não contaminem o seguinte.
+    """
+    results = []
+    for size in sizes:
+        corpus = SyntheticCorpus(size, seed=seed)
+        print(f"Gerando corpus sintético com {size} chunks...")
+        corpus_dir = corpus.write(cache_dir)
+        for backend in backends:
+            print(f"  -> {backend}: medindo...")
+            command = [sys.executable, "-m", "benchmarks.run", "--child", "--corpus", corpus_dir,
+                       "--size", str(size), "--backends", backend, "--queries", str(n_queries),
+                       "--k", str(k), "--seed", str(seed), "--store-options", json.dumps(store_options or {})]
+            completed = subprocess.run(command, capture_output=True, text=True, check=True)
+            case = json.loads(completed.stdout.strip().splitlines()[-1])
+            case['size'] = size
+            results.append(case)
+            print(f"     construção {case['build_chunks_per_second']:.0f} chunks/s, "
+                  f"carga {case['load_seconds'] * 1000:.0f} ms, "
+                  f"p50 {case['query_p50_ms']:.2f} ms, p99 {case['query_p99_ms']:.2f} ms, "
+                  f"recall@{k} {case['recall_at_k']:.3f}")
+
+    return {
+        'metadata': {
+            'git_commit': _git_commit(),
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'seed': seed,
+            'queries': n_queries,
+            'k': k,
+        },
+        'results': results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de indexação e busca com corpora sintéticos.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000],
+                        help="Números de chunks dos corpora (ex.: 1000 10000 100000 1000000).")
+    parser.add_argument("--backends", nargs="+", default=["numpy", "chroma"])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--store-options", default="{}",
+                        help='Opções extras do backend em JSON, ex.: \'{"dtype": "float16"}\'.')
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Onde os corpora gerados são guardados.")
+    parser.add_argument("--output", help="Arquivo JSON onde os resultados são salvos.")
+    parser.add_argument("--baseline", help="Resultados anteriores para comparação.")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Piora relativa tolerada na comparação (padrão: 0.1 = 10%%).")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--corpus", help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    store_options = json.loads(args.store_options)
+
+    if args.child:
+        queries = SyntheticCorpus(args.size, seed=args.seed).sample_queries(args.queries)
+        case = run_case(args.corpus, args.backends[0], args.queries, args.k, queries, args.seed,
+                        store_options=store_options)
+        sys.stdout.flush()
+        print(json.dumps(case))
+        sys.exit(0)
+
+    results = run_benchmarks(args.sizes, args.backends, args.queries, args.k, args.seed, args.cache_dir,
+                             store_options)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+        print(f"Resultados salvos em '{args.output}'.")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+        print(f"\nComparação com '{args.baseline}' (commit {baseline['metadata'].get('git_commit')}):")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regressões acima de {args.tolerance * 100:.0f}%.")
+            sys.exit(1)
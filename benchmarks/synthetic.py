@@ -0,0 +1,113 @@
+import os
+import json
+
+import numpy as np
+
+SYLLABLES = [
+    "ba", "be", "bi", "bo", "ca", "ce", "ci", "co", "da", "de", "di", "do", "fa", "fe", "fi",
+    "ga", "go", "la", "le", "li", "lo", "ma", "me", "mi", "mo", "na", "ne", "no", "pa", "pe",
+    "pi", "po", "ra", "re", "ri", "ro", "sa", "se", "si", "so", "ta", "te", "ti", "to", "va",
+    "ve", "vi", "vo", "xa", "za",
+]
+
+
+def _word(rank: int) -> str:
+    """Palavra sintética determinística para o índice `rank` (0 -> "baba", 1 -> "beba", ...)."""
+    syllables = []
+    value = rank
+    while True:
+        value, digit = divmod(value, len(SYLLABLES))
+        syllables.append(SYLLABLES[digit])
+        if not value:
+            break
+    while len(syllables) < 2:
+        syllables.append(SYLLABLES[0])
+    return "".join(syllables)
+
+
+class SyntheticCorpus:
+    """
+    Gera um corpus no mesmo formato JSON do scraper (`content_sections`), com
+    palavras sintéticas em distribuição de Zipf, parecida com a de textos reais.
+
+    Cada seção tem um único parágrafo menor que o `chunk_size` usado na ingestão,
+    então cada seção vira exatamente um chunk e o número de chunks é controlado.
+    """
+
+    def __init__(self, n_chunks: int, seed: int = 0, vocabulary_size: int = 50000,
+                 words_per_section: int = 60, sections_per_file: int = 200):
+        """
+        Args:
+            n_chunks (int): Número de seções (e portanto de chunks) do corpus.
+            seed (int): Semente; o mesmo valor gera sempre o mesmo corpus.
+            vocabulary_size (int): Número de palavras distintas.
+            words_per_section (int): Palavras do parágrafo de cada seção.
+            sections_per_file (int): Seções por arquivo JSON.
+        """
+        self.n_chunks = n_chunks
+        self.seed = seed
+        self.vocabulary_size = vocabulary_size
+        self.words_per_section = words_per_section
+        self.sections_per_file = sections_per_file
+        self._words = [_word(rank) for rank in range(vocabulary_size)]
+        weights = 1.0 / np.arange(1, vocabulary_size + 1)
+        self._probabilities = weights / weights.sum()
+
+    @property
+    def name(self) -> str:
+        return f"corpus-{self.n_chunks}-seed{self.seed}"
+
+    def _n_files(self) -> int:
+        return -(-self.n_chunks // self.sections_per_file)
+
+    def _file_sections(self, file_index: int) -> list:
+        rng = np.random.default_rng([self.seed, file_index])
+        start = file_index * self.sections_per_file
+        n_sections = min(self.sections_per_file, self.n_chunks - start)
+        word_ids = rng.choice(self.vocabulary_size, size=(n_sections, self.words_per_section), p=self._probabilities)
+        return [
+            {
+                "section_title": f"Seção {start + i}",
+                "content": [{"type": "paragraph", "text": " ".join(self._words[w] for w in row) + "."}]
+            }
+            for i, row in enumerate(word_ids)
+        ]
+
+    def write(self, directory: str) -> str:
+        """
+        Grava o corpus em `directory/<nome>` (reaproveitando-o se já existir).
+
+        Returns:
+            str: O diretório com os arquivos JSON, pronto para `iter_chunks`.
+        """
+        corpus_dir = os.path.join(directory, self.name)
+        marker = os.path.join(corpus_dir, ".complete")
+        if os.path.exists(marker):
+            return corpus_dir
+
+        os.makedirs(corpus_dir, exist_ok=True)
+        for file_index in range(self._n_files()):
+            data = {
+                "metadata": {"source_url": f"synthetic://{self.name}/{file_index}", "title": f"Página {file_index}"},
+                "content_sections": self._file_sections(file_index),
+            }
+            with open(os.path.join(corpus_dir, f"pagina_{file_index:06d}.json"), 'w', encoding='utf-8') as file:
+                json.dump(data, file, ensure_ascii=False)
+        open(marker, 'w').close()
+        return corpus_dir
+
+    def sample_queries(self, n_queries: int, words_per_query: int = 8) -> list:
+        """
+        Perguntas sintéticas: palavras sorteadas de seções aleatórias do corpus,
+        misturadas com palavras de fora delas.
+        """
+        rng = np.random.default_rng([self.seed, 2 ** 31])
+        queries = []
+        for _ in range(n_queries):
+            file_index = int(rng.integers(self._n_files()))
+            sections = self._file_sections(file_index)
+            words = sections[int(rng.integers(len(sections)))]["content"][0]["text"].rstrip(".").split()
+            picked = list(rng.choice(words, size=words_per_query - 2, replace=False))
+            picked += [self._words[w] for w in rng.choice(self.vocabulary_size, size=2, p=self._probabilities)]
+            queries.append(" ".join(picked))
+        return queries
@@ -1,11 +1,14 @@
-import os
 import json
-import shutil
+from dotenv import load_dotenv
+from app.core.logging_config import configure_logging
 from app.rag.retriever import RAGRetriever
 
 BEST_CHUNK_SIZE = 250
 BEST_CHUNK_OVERLAP = 150
 BEST_K = 5
+# Com o reranker (RERANKER_MODEL_NAME) os melhores chunks vêm primeiro, então menos
+# chunks bastam no prompt.
+RERANKED_K = 3
 
 QUESTIONS_FILE = "evaluation_questions.json"
 with open(QUESTIONS_FILE, 'r', encoding='utf-8') as f:
@@ -20,26 +23,32 @@ def debug_failures():
     
     db_path = f"db_size_{BEST_CHUNK_SIZE}_overlap_{BEST_CHUNK_OVERLAP}"  
     
-    if os.path.exists(db_path):
-        shutil.rmtree(db_path)   
-    
+    # O índice só é reconstruído se o modelo, o chunking ou o corpus mudaram; a nova
+    # versão é montada à parte e ativada atomicamente no final.
     print(f"Configurando o retriever com: size={BEST_CHUNK_SIZE}, overlap={BEST_CHUNK_OVERLAP}")
     retriever = RAGRetriever(db_path=db_path)
     retriever.setup_vector_store(
-        force_recreate=True, 
         chunk_size=BEST_CHUNK_SIZE, 
         chunk_overlap=BEST_CHUNK_OVERLAP
     )
     
+    k = RERANKED_K if retriever.reranker is not None else BEST_K
+    if retriever.reranker is not None:
+        print(f"Reranker ativo: {retriever.reranker.model_name} "
+              f"({retriever.rerank_fetch_k} candidatos -> k={k})")
+
     print("\n--- ANALISANDO PERGUNTAS DE TESTE ---")
     
     total_success = 0
 
-    for i, item in enumerate(test_questions):
+    all_retrieved_docs = retriever.retrieve_context_batch(
+        [item["question"] for item in test_questions], k=k
+    )
+
+    for i, (item, retrieved_docs) in enumerate(zip(test_questions, all_retrieved_docs)):
         question = item["question"]
         expected_text = item["expected_text"]
         
-        retrieved_docs = retriever.retrieve_context(question, k=BEST_K)
         full_context_text = " ".join([doc.page_content for doc in retrieved_docs])
         
         
@@ -60,7 +69,9 @@ def debug_failures():
 
     accuracy = (total_success / len(test_questions)) * 100
     print("\n--- DEPURAÇÃO CONCLUÍDA ---")
-    print(f"Precisão final com a melhor configuração: {accuracy:.2f}% ({total_success}/{len(test_questions)})")
+    print(f"Precisão final com a melhor configuração (k={k}): {accuracy:.2f}% ({total_success}/{len(test_questions)})")
 
 if __name__ == "__main__":
+    load_dotenv()
+    configure_logging()
     debug_failures()
\ No newline at end of file
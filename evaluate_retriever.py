@@ -1,78 +1,159 @@
 import os
 import json
-import shutil
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from dotenv import load_dotenv
+from app.core.logging_config import configure_logging
 from app.rag.retriever import RAGRetriever
 
 CHUNK_SIZES = [5, 10, 25, 50, 100, 250, 500, 750, 1000]
 CHUNK_OVERLAPS = [3, 5, 10, 25, 50, 100, 150, 200, 350, 500]
 TOP_K_VALUES = [3, 5, 7, 10]
 
+# Número de processos usados na busca em grade. Cada processo carrega o modelo
+# de embeddings uma única vez e avalia várias configurações em sequência.
+MAX_WORKERS = int(os.getenv("EVAL_WORKERS", os.cpu_count() or 1))
+
 QUESTIONS_FILE = "evaluation_questions.json"
 with open(QUESTIONS_FILE, 'r', encoding='utf-8') as f:
     test_questions = json.load(f)
 
+_worker_retriever = None
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _init_worker(torch_threads: int):
+    """
+    Inicializa um processo da busca em grade: limita as threads do torch para não
+    disputar núcleos com os outros processos e carrega o modelo de embeddings.
+    """
+    global _worker_retriever
+    import torch
+    torch.set_num_threads(torch_threads)
+    _worker_retriever = RAGRetriever()
+
+
+def _score_rankings(size: int, overlap: int, rankings: list, texts: list, expected_texts: list,
+                    reranked: bool) -> list:
+    results = []
+    for k in TOP_K_VALUES:
+        success_count = 0
+        context_chars = 0
+        for row, expected_text in zip(rankings, expected_texts):
+            full_context_text = " ".join(texts[i] for i in row[:k])
+            context_chars += len(full_context_text)
+            if expected_text.lower() in full_context_text.lower():
+                success_count += 1
+
+        accuracy = (success_count / len(expected_texts)) * 100
+        results.append({
+            "chunk_size": size,
+            "chunk_overlap": overlap,
+            "k": k,
+            "reranked": reranked,
+            "accuracy": accuracy,
+            "context_chars": context_chars / len(expected_texts)
+        })
+    return results
+
+
+def _evaluate_config(size: int, overlap: int, questions: list, question_vectors: np.ndarray,
+                     expected_texts: list):
+    """
+    Avalia uma configuração (chunk_size, chunk_overlap) para todos os valores de k.
+
+    O índice é só uma matriz em memória com os embeddings normalizados dos chunks,
+    então nada é gravado em disco. Cada pergunta é buscada uma única vez com
+    k = max(TOP_K_VALUES) e o resultado é fatiado para os valores menores de k.
+
+    Com o reranker ativo (RERANKER_MODEL_NAME), a mesma busca traz RERANKER_FETCH_K
+    candidatos, que são reordenados pelo cross-encoder e avaliados também.
+    """
+    documents = _worker_retriever._load_and_chunk_documents(size, overlap)
+    if not documents:
+        return []
+
+    texts = [doc.page_content for doc in documents]
+    matrix = _normalize(np.asarray(_worker_retriever.embeddings.embed_documents(texts), dtype=np.float32))
+
+    reranker = _worker_retriever.reranker
+    scores = question_vectors @ matrix.T
+    max_k = min(max(TOP_K_VALUES), len(texts))
+    fetch_k = min(max(max_k, _worker_retriever.rerank_fetch_k), len(texts)) if reranker else max_k
+    top = np.argpartition(-scores, fetch_k - 1, axis=1)[:, :fetch_k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+    top = np.take_along_axis(top, order, axis=1)
+
+    results = _score_rankings(size, overlap, top[:, :max_k], texts, expected_texts, reranked=False)
+    if reranker is not None:
+        positions = {id(doc): i for i, doc in enumerate(documents)}
+        reranked = reranker.rerank_batch(questions, [[documents[i] for i in row] for row in top], max_k)
+        rankings = [[positions[id(doc)] for doc in docs] for docs in reranked]
+        results += _score_rankings(size, overlap, rankings, texts, expected_texts, reranked=True)
+    return results
+
+
 def evaluate_retriever():
     """
-    Orquestra um experimento completo e robusto, testando chunk_size, 
+    Orquestra um experimento completo e robusto, testando chunk_size,
     chunk_overlap e o número de documentos recuperados (k).
+
+    As configurações são distribuídas entre MAX_WORKERS processos. As perguntas são
+    transformadas em embeddings uma única vez, e os chunks repetidos entre
+    configurações são reaproveitados pelo cache de embeddings em disco.
     """
     print("--- INICIANDO AVALIAÇÃO AVANÇADA DO RETRIEVER ---")
-    
-    results = []
 
-    for size in CHUNK_SIZES:
-        for overlap in CHUNK_OVERLAPS:
-        
-            if overlap >= size:
-                continue
-        
-            print(f"\n--- CRIANDO DB PARA: chunk_size={size}, chunk_overlap={overlap} ---")
-            
-            db_path_for_run = f"db_size_{size}_overlap_{overlap}"
-            if os.path.exists(db_path_for_run):
-                shutil.rmtree(db_path_for_run)
-            
-            retriever = RAGRetriever(db_path=db_path_for_run)
-            retriever.setup_vector_store(
-                force_recreate=True, 
-                chunk_size=size, 
-                chunk_overlap=overlap
-            )
-        
-            for k in TOP_K_VALUES:
-                print(f"--- AVALIANDO com k={k} ---")
-                success_count = 0
-                
-                for item in test_questions:
-                    question = item["question"]
-                    expected_text = item["expected_text"]
-                    
-                    retrieved_docs = retriever.retrieve_context(question, k=k)
-                    
-                    full_context_text = " ".join([doc.page_content for doc in retrieved_docs])
-                    
-                    if expected_text.lower() in full_context_text.lower():
-                        success_count += 1
-                
-                accuracy = (success_count / len(test_questions)) * 100
-                print(f"Precisão para (size={size}, overlap={overlap}, k={k}): {accuracy:.2f}%")
-                
-                results.append({
-                    "chunk_size": size,
-                    "chunk_overlap": overlap,
-                    "k": k,
-                    "accuracy": accuracy
-                })
+    configs = [(size, overlap) for size in CHUNK_SIZES for overlap in CHUNK_OVERLAPS if overlap < size]
+
+    print(f"Gerando embeddings das {len(test_questions)} perguntas de teste...")
+    questions = [item["question"] for item in test_questions]
+    question_vectors = _normalize(np.asarray(RAGRetriever().embed_queries(questions), dtype=np.float32))
+    expected_texts = [item["expected_text"] for item in test_questions]
+
+    workers = max(1, min(MAX_WORKERS, len(configs)))
+    torch_threads = max(1, (os.cpu_count() or 1) // workers)
+    print(f"Avaliando {len(configs)} configurações com {workers} processos...")
+
+    results = []
+    # "spawn" evita herdar o estado de threads do torch já carregado neste processo.
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker, initargs=(torch_threads,)) as executor:
+        futures = {
+            executor.submit(
+                _evaluate_config, size, overlap, questions, question_vectors, expected_texts
+            ): (size, overlap)
+            for size, overlap in configs
+        }
+        for future in as_completed(futures):
+            for res in future.result():
+                print(f"Precisão para (size={res['chunk_size']}, overlap={res['chunk_overlap']}, "
+                      f"k={res['k']}{', rerank' if res['reranked'] else ''}): {res['accuracy']:.2f}%")
+                results.append(res)
 
     print("\n\n--- AVALIAÇÃO CONCLUÍDA ---")
-    
-    sorted_results = sorted(results, key=lambda x: x["accuracy"], reverse=True)
-    
+
+    # Em caso de empate, o menor contexto (prompt mais curto) vem primeiro.
+    sorted_results = sorted(results, key=lambda x: (-x["accuracy"], x["context_chars"], x["chunk_size"],
+                                                    x["chunk_overlap"], x["k"]))
+
     print("Melhores configurações encontradas:")
     for res in sorted_results[:10]:
-        print(f"  - Tamanho: {res['chunk_size']}, Sobreposição: {res['chunk_overlap']}, K: {res['k']} -> Precisão: {res['accuracy']:.2f}%")
-        
-    print("\nLembre-se de apagar as pastas 'db_size_*' manualmente quando terminar.")
+        print(f"  - Tamanho: {res['chunk_size']}, Sobreposição: {res['chunk_overlap']}, K: {res['k']}, "
+              f"Rerank: {'sim' if res['reranked'] else 'não'} -> Precisão: {res['accuracy']:.2f}% "
+              f"(contexto médio de {res['context_chars']:.0f} caracteres)")
+
+    return sorted_results
 
 if __name__ == "__main__":
-    evaluate_retriever()
\ No newline at end of file
+    load_dotenv()
+    configure_logging()
+    evaluate_retriever()
@@ -1,9 +1,28 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from bs4 import BeautifulSoup
+from urllib.parse import urlparse, unquote
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import argparse
+import hashlib
+import threading
+import time
 import json
 import re
 import os
 
+try:
+  import lxml  # noqa: F401
+  HTML_PARSER = 'lxml'
+except ImportError:
+  HTML_PARSER = 'html.parser'
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), '.cache', 'html')
+USER_AGENT = os.getenv('SCRAPER_USER_AGENT', 'Mozilla/5.0 (compatible; rag-corpus-builder)')
+IGNORED_SECTIONS = ["Ver também", "Notas", "Referências", "Ligações externas", "Bibliografia"]
+
 def parse_infobox(soup):
   """Extrai os dados da tabela de infobox da Wikipédia de forma mais robusta."""
   infobox = soup.find('table', class_='infobox')
@@ -17,72 +36,67 @@ def parse_infobox(soup):
 
     if header and value_cell:
       key = header.get_text(strip=True)
-  
+
       value = value_cell.get_text(separator=' ', strip=True)
-  
+
       value_cleaned = re.sub(r'\s+', ' ', re.sub(r'\[.*?\]', '', value)).strip()
-      
+
       if key and value_cleaned:
         data[key] = value_cleaned
   return data
 
-def scrape_wikipedia_to_structured_json(url: str, output_filename: str = 'dados_clarice_final.json'):
+def parse_wikipedia_html(html, url: str):
   """
-  Acessa uma URL, extrai o infobox e o conteúdo principal de forma hierárquica 
-  e salva em um único arquivo JSON bem estruturado.
+  Converte o HTML de um artigo da Wikipédia na estrutura hierárquica usada em `data/`.
+  Não acessa a rede, então pode ser testada com arquivos HTML salvos.
+
+  Returns:
+    dict | None: Os dados do artigo, ou None se o HTML não tiver o conteúdo esperado.
   """
-  print(f"1. Acessando a URL: {url}")
-  try:
-    headers = {'User-Agent': 'Mozilla/5.0'}
-    response = requests.get(url, headers=headers)
-    response.raise_for_status()
-  except requests.exceptions.RequestException as e:
-    print(f"Erro ao acessar a URL: {e}")
-    return
+  soup = BeautifulSoup(html, HTML_PARSER)
+
+  heading = soup.find('h1', id='firstHeading')
+  content_text = soup.find(id="mw-content-text")
+  content_div = content_text.find('div', class_='mw-parser-output') if content_text else None
+  if not heading or not content_div:
+    return None
 
-  print("2. HTML baixado. Iniciando análise estruturada completa...")
-  soup = BeautifulSoup(response.content, 'html.parser')
-  
   final_data = {
     "metadata": {
       "source_url": url,
-      "title": soup.find('h1', id='firstHeading').get_text(strip=True),
+      "title": heading.get_text(strip=True),
       "infobox": parse_infobox(soup)
     },
     "content_sections": []
   }
 
-  content_div = soup.find(id="mw-content-text").find('div', class_='mw-parser-output')
-  if not content_div:
-    return
-
   current_h2_section = None
   current_h3_section = None
-  
+
   tags_de_interesse = ['h2', 'h3', 'p', 'ul']
-  
+
   for element in content_div.find_all(tags_de_interesse):
-    
+
     if element.find_parent('table', class_='infobox'):
       continue
 
     if element.name == 'h2':
       section_title = element.get_text(strip=True).replace('[editar | editar código-fonte]', '')
-      if section_title in ["Ver também", "Notas", "Referências", "Ligações externas", "Bibliografia"]:
+      if section_title in IGNORED_SECTIONS:
         break
-      
+
       current_h2_section = {"section_title": section_title, "content": []}
       final_data["content_sections"].append(current_h2_section)
       current_h3_section = None
-    
+
     elif element.name == 'h3' and current_h2_section:
       subsection_title = element.get_text(strip=True).replace('[editar | editar código-fonte]', '')
       current_h3_section = {"subsection_title": subsection_title, "content": []}
-      
+
       if "subsections" not in current_h2_section:
         current_h2_section["subsections"] = []
       current_h2_section["subsections"].append(current_h3_section)
-    
+
     elif element.name == 'p' and current_h2_section:
       text = re.sub(r'\s+', ' ', re.sub(r'\[.*?\]', '', element.get_text(strip=True))).strip()
       if text:
@@ -93,11 +107,11 @@ def scrape_wikipedia_to_structured_json(url: str, output_filename: str = 'dados_
           current_h2_section["content"].append(content_to_add)
 
     elif element.name == 'ul' and current_h2_section:
-    
+
       if current_h2_section["section_title"] == "Lista de obras":
         category_tag = element.find_previous_sibling(['h2', 'h3', 'p'])
         category_name = category_tag.get_text(strip=True) if category_tag else "Sem Categoria"
-        
+
         works = []
         for li in element.find_all('li'):
           match = re.search(r'^(.*?)\s*\((\d{4})\)', li.get_text(strip=True))
@@ -105,25 +119,258 @@ def scrape_wikipedia_to_structured_json(url: str, output_filename: str = 'dados_
             works.append({"title": match.group(1).strip(), "year": match.group(2)})
           else:
             works.append({"title": li.get_text(strip=True), "year": None})
-        
-    
+
+
         current_h2_section["content"].append({
           "type": "works_list",
           "category": category_name,
           "items": works
         })
 
+  return final_data
+
+def create_session(pool_size: int = 10, retries: int = 3):
+  """
+  Cria uma sessão HTTP com pool de conexões (keep-alive) e novas tentativas com
+  backoff exponencial para respostas 429 e 5xx, respeitando o cabeçalho Retry-After.
+  """
+  session = requests.Session()
+  session.headers.update({'User-Agent': USER_AGENT})
+  retry = Retry(
+    total=retries,
+    backoff_factor=0.5,
+    status_forcelist=[429, 500, 502, 503, 504],
+    allowed_methods=['GET'],
+    respect_retry_after_header=True
+  )
+  adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+  session.mount('https://', adapter)
+  session.mount('http://', adapter)
+  return session
+
+class RateLimiter:
+  """Limita o número de requisições por segundo, compartilhado entre as threads."""
+
+  def __init__(self, requests_per_second: float):
+    self.interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+    self._next_time = 0.0
+    self._lock = threading.Lock()
+
+  def wait(self):
+    if not self.interval:
+      return
+    with self._lock:
+      now = time.monotonic()
+      start = max(now, self._next_time)
+      self._next_time = start + self.interval
+    if start > now:
+      time.sleep(start - now)
+
+class HtmlCache:
+  """
+  Cache local do HTML baixado. Cada URL tem um arquivo `.html` com o corpo e um
+  `.json` com os validadores (ETag e Last-Modified) usados na revalidação.
+  """
+
+  def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR):
+    self.cache_dir = cache_dir
+    os.makedirs(cache_dir, exist_ok=True)
+
+  def _paths(self, url: str):
+    key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+    base = os.path.join(self.cache_dir, key)
+    return base + '.html', base + '.json'
+
+  def get(self, url: str):
+    """
+    Returns:
+      tuple | None: (html, validadores), ou None se a URL não estiver no cache.
+    """
+    html_path, meta_path = self._paths(url)
+    if not (os.path.exists(html_path) and os.path.exists(meta_path)):
+      return None
+    with open(meta_path, 'r', encoding='utf-8') as f:
+      validators = json.load(f)
+    with open(html_path, 'rb') as f:
+      return f.read(), validators
+
+  def put(self, url: str, html: bytes, etag: str = None, last_modified: str = None):
+    html_path, meta_path = self._paths(url)
+    _write_atomic(html_path, html)
+    validators = {"url": url, "etag": etag, "last_modified": last_modified}
+    _write_atomic(meta_path, json.dumps(validators).encode('utf-8'))
+
+def _write_atomic(path: str, content: bytes):
+  tmp_path = f"{path}.{threading.get_ident()}.tmp"
+  with open(tmp_path, 'wb') as f:
+    f.write(content)
+  os.replace(tmp_path, path)
+
+def fetch_html(session, url: str, cache: HtmlCache = None, rate_limiter: RateLimiter = None, timeout: float = 30):
+  """
+  Baixa o HTML de `url`. Se houver uma cópia no cache, envia If-None-Match e
+  If-Modified-Since e reaproveita a cópia quando o servidor responde 304.
+
+  Returns:
+    tuple: (html em bytes, True se veio do cache)
+  """
+  cached = cache.get(url) if cache else None
+  headers = {}
+  if cached:
+    validators = cached[1]
+    if validators.get('etag'):
+      headers['If-None-Match'] = validators['etag']
+    if validators.get('last_modified'):
+      headers['If-Modified-Since'] = validators['last_modified']
+
+  if rate_limiter:
+    rate_limiter.wait()
+  response = session.get(url, headers=headers, timeout=timeout)
+
+  if response.status_code == 304 and cached:
+    return cached[0], True
+  response.raise_for_status()
+
+  if cache:
+    cache.put(url, response.content, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+  return response.content, False
+
+def output_filename_for(url: str) -> str:
+  """Nome do JSON de uma página: ".../wiki/Clarice_Lispector" -> "dados_clarice_lispector.json"."""
+  page = unquote(urlparse(url).path.rstrip('/').rsplit('/', 1)[-1]) or 'pagina'
+  slug = re.sub(r'[\W_]+', '_', page.lower()).strip('_')
+  return f"dados_{slug}.json"
+
+def existing_outputs(output_dir: str) -> dict:
+  """
+  Mapeia a `source_url` de cada JSON já presente em `output_dir` para o nome do arquivo,
+  para que uma página já no corpus (como `dados_clarice_final.json`) não seja salva
+  uma segunda vez com outro nome.
+  """
+  outputs = {}
+  if not os.path.isdir(output_dir):
+    return outputs
+  for filename in sorted(os.listdir(output_dir)):
+    if not filename.endswith('.json'):
+      continue
+    try:
+      with open(os.path.join(output_dir, filename), 'r', encoding='utf-8') as f:
+        source_url = json.load(f).get('metadata', {}).get('source_url')
+    except (OSError, ValueError, AttributeError):
+      continue
+    if source_url:
+      outputs.setdefault(source_url, filename)
+  return outputs
+
+def save_json(data: dict, output_path: str):
+  os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+  _write_atomic(output_path, json.dumps(data, ensure_ascii=False, indent=4).encode('utf-8'))
+
+def scrape_wikipedia_to_structured_json(url: str, output_filename: str = 'dados_clarice_final.json'):
+  """
+  Acessa uma URL, extrai o infobox e o conteúdo principal de forma hierárquica
+  e salva em um único arquivo JSON bem estruturado.
+  """
+  print(f"1. Acessando a URL: {url}")
+  try:
+    with create_session(pool_size=1) as session:
+      html, _ = fetch_html(session, url)
+  except requests.exceptions.RequestException as e:
+    print(f"Erro ao acessar a URL: {e}")
+    return
+
+  print("2. HTML baixado. Iniciando análise estruturada completa...")
+  final_data = parse_wikipedia_html(html, url)
+  if not final_data:
+    return
+
   print(f"3. Análise concluída. {len(final_data['content_sections'])} seções principais encontradas.")
-  
-  data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
-  os.makedirs(data_dir, exist_ok=True)
-  output_path = os.path.join(data_dir, output_filename)
-  
-  with open(output_path, 'w', encoding='utf-8') as f:
-    json.dump(final_data, f, ensure_ascii=False, indent=4)
-    
+
+  output_path = os.path.join(DATA_DIR, output_filename)
+  save_json(final_data, output_path)
+
   print(f"✅ Sucesso! Os dados completos foram salvos no arquivo '{output_path}'")
 
+def scrape_many(urls: list, output_dir: str = DATA_DIR, cache_dir: str = DEFAULT_CACHE_DIR,
+                workers: int = 8, requests_per_second: float = 5.0, timeout: float = 30):
+  """
+  Raspa várias páginas em paralelo e salva um JSON por página em `output_dir`.
+
+  As threads compartilham uma sessão com pool de conexões e um limitador de taxa.
+  Páginas já baixadas são revalidadas com ETag/Last-Modified, de modo que uma nova
+  execução sobre o mesmo corpus só baixa o que mudou. Uma URL que já tem um JSON em
+  `output_dir` com outro nome atualiza esse arquivo em vez de criar uma cópia (o que
+  duplicaria os chunks e as contagens do índice de obras).
+
+  Args:
+    urls (list): As URLs dos artigos.
+    output_dir (str): Diretório onde os JSONs são salvos.
+    cache_dir (str): Diretório do cache de HTML; None desativa o cache.
+    workers (int): Número de downloads simultâneos.
+    requests_per_second (float): Limite de requisições por segundo (0 = sem limite).
+    timeout (float): Timeout de cada requisição, em segundos.
+
+  Returns:
+    dict: Contagens de páginas baixadas, reaproveitadas do cache e com erro.
+  """
+  urls = list(dict.fromkeys(urls))
+  cache = HtmlCache(cache_dir) if cache_dir else None
+  rate_limiter = RateLimiter(requests_per_second)
+  summary = {"downloaded": 0, "cached": 0, "failed": 0}
+
+  filenames = {url: output_filename_for(url) for url in urls}
+  for url, filename in existing_outputs(output_dir).items():
+    if url in filenames and filenames[url] != filename:
+      print(f"  -> Aviso: {url} já está em '{filename}'; esse arquivo será atualizado "
+            f"em vez de criar '{filenames[url]}'.")
+      filenames[url] = filename
+
+  def _scrape(session, url):
+    html, from_cache = fetch_html(session, url, cache, rate_limiter, timeout)
+    data = parse_wikipedia_html(html, url)
+    if data is None:
+      raise ValueError("conteúdo do artigo não encontrado no HTML")
+    save_json(data, os.path.join(output_dir, filenames[url]))
+    return from_cache
+
+  print(f"Raspando {len(urls)} páginas com {workers} conexões simultâneas...")
+  with create_session(pool_size=workers) as session, ThreadPoolExecutor(max_workers=workers) as executor:
+    futures = {executor.submit(_scrape, session, url): url for url in urls}
+    for future in as_completed(futures):
+      url = futures[future]
+      try:
+        from_cache = future.result()
+      except (requests.exceptions.RequestException, ValueError) as e:
+        summary["failed"] += 1
+        print(f"  -> Erro em {url}: {e}")
+        continue
+      summary["cached" if from_cache else "downloaded"] += 1
+
+  print(f"✅ Concluído: {summary['downloaded']} baixadas, {summary['cached']} sem alterações (cache), "
+        f"{summary['failed']} com erro.")
+  return summary
+
+def _read_urls(path: str) -> list:
+  with open(path, 'r', encoding='utf-8') as f:
+    return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
 if __name__ == '__main__':
-  wikipedia_url = "https://pt.wikipedia.org/wiki/Clarice_Lispector"
-  scrape_wikipedia_to_structured_json(wikipedia_url)
\ No newline at end of file
+  parser = argparse.ArgumentParser(description="Converte artigos da Wikipédia em JSON estruturado.")
+  parser.add_argument("urls", nargs="*", help="URLs dos artigos.")
+  parser.add_argument("--urls-file", help="Arquivo com uma URL por linha.")
+  parser.add_argument("--output-dir", default=DATA_DIR)
+  parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+  parser.add_argument("--no-cache", action="store_true", help="Não usa o cache de HTML.")
+  parser.add_argument("--workers", type=int, default=8)
+  parser.add_argument("--rps", type=float, default=5.0, help="Requisições por segundo (0 = sem limite).")
+  args = parser.parse_args()
+
+  urls = list(args.urls)
+  if args.urls_file:
+    urls.extend(_read_urls(args.urls_file))
+
+  if urls:
+    scrape_many(urls, args.output_dir, None if args.no_cache else args.cache_dir, args.workers, args.rps)
+  else:
+    wikipedia_url = "https://pt.wikipedia.org/wiki/Clarice_Lispector"
+    scrape_wikipedia_to_structured_json(wikipedia_url)
@@ -0,0 +1,44 @@
+import os
+
+import pytest
+
+from app.rag.fake_models import HashingEmbeddings
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    """
+    Pipeline completo sobre o corpus de `data/`, sem rede e sem modelos: índice numpy
+    em um diretório temporário, embeddings por hashing e o gerador falso.
+    """
+    monkeypatch.chdir(REPO_ROOT)
+    monkeypatch.setenv("VECTOR_STORE_BACKEND", "numpy")
+    monkeypatch.setenv("GENERATOR_BACKEND", "fake")
+    monkeypatch.setenv("EMBEDDING_CACHE_DIR", "")
+    monkeypatch.setenv("SEMANTIC_CACHE_ENABLED", "false")
+    monkeypatch.delenv("RERANKER_MODEL_NAME", raising=False)
+
+    from app.rag.pipeline import RAGPipeline
+    from app.rag.retriever import RAGRetriever
+
+    rag_pipeline = RAGPipeline()
+    retriever = RAGRetriever(db_path=str(tmp_path / "db"))
+    retriever.embedding_model = retriever.embeddings = HashingEmbeddings()
+    rag_pipeline.retriever = retriever
+    return rag_pipeline
+
+
+@pytest.fixture
+def client(pipeline):
+    """TestClient da API usando o `pipeline` acima no lugar do carregado na inicialização."""
+    from fastapi.testclient import TestClient
+    from app.api.server import app
+
+    app.state.preloaded_pipeline = pipeline
+    try:
+        with TestClient(app) as test_client:
+            yield test_client
+    finally:
+        del app.state.preloaded_pipeline
@@ -0,0 +1,31 @@
+STRUCTURED_QUESTION = "Quantos romances Clarice escreveu?"
+
+
+def test_ask_answers_work_list_questions_from_the_structured_index(client):
+    response = client.post("/ask", json={"question": STRUCTURED_QUESTION})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["answer"].startswith("A lista de obras de Clarice Lispector tem 9 obras")
+    assert body["documents"] == []
+
+
+def test_ask_with_filter_skips_the_structured_index(client):
+    response = client.post("/ask", json={"question": STRUCTURED_QUESTION, "filter": {"section": "Juventude"}})
+
+    assert response.status_code == 200
+    assert response.json()["answer"].startswith("Resposta de teste")
+
+
+def test_ask_stream_with_filter_skips_the_structured_index(client):
+    response = client.post("/ask/stream", json={"question": STRUCTURED_QUESTION, "filter": {"section": "Juventude"}})
+
+    assert response.status_code == 200
+    assert '"structured": true' not in response.text
+    assert "Resposta de teste" in response.text
+
+
+def test_pipeline_does_not_repeat_the_structured_check_with_context(pipeline):
+    assert pipeline.ask(STRUCTURED_QUESTION, context_docs=[]).startswith("Resposta de teste")
+    assert pipeline.ask(STRUCTURED_QUESTION, filter={"section": "Juventude"}).startswith("Resposta de teste")
+    assert pipeline.ask(STRUCTURED_QUESTION).startswith("A lista de obras")
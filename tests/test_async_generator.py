@@ -0,0 +1,161 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.metrics import GENERATION_COALESCED, GENERATION_RETRIES
+from app.rag.async_generator import AsyncGenerator
+from app.rag.fake_models import FakeGenerativeModel, FakeResponse
+from app.rag.generator import GenerationError, GenerationTimeout, GenerationUnavailable
+
+
+class FakeServiceUnavailable(Exception):
+    """Imita o erro 503 (`ServiceUnavailable`) da API do Gemini."""
+
+    code = 503
+
+
+class ScriptedModel:
+    """
+    Modelo assíncrono que falha com os erros dados, em ordem, antes de responder,
+    e registra quantas chamadas estiveram em andamento ao mesmo tempo.
+    """
+
+    def __init__(self, errors=(), delay: float = 0.0):
+        self.errors = list(errors)
+        self.delay = delay
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+
+    async def generate_content_async(self, prompt: str):
+        self.calls += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.errors:
+                raise self.errors.pop(0)
+            return FakeResponse(f"resposta para {prompt}")
+        finally:
+            self.active -= 1
+
+
+def _client(model, **kwargs) -> AsyncGenerator:
+    kwargs.setdefault("backoff", 0.0)
+    return AsyncGenerator(SimpleNamespace(model=model), **kwargs)
+
+
+def test_identical_prompts_share_one_call():
+    model = ScriptedModel(delay=0.02)
+    client = _client(model)
+    coalesced = GENERATION_COALESCED.value()
+
+    async def scenario():
+        answers = await asyncio.gather(*(client.generate("mesmo prompt") for _ in range(5)))
+        assert client._in_flight == {}
+        answers.append(await client.generate("mesmo prompt"))
+        return answers
+
+    answers = asyncio.run(scenario())
+
+    assert answers == ["resposta para mesmo prompt"] * 6
+    assert model.calls == 2
+    assert GENERATION_COALESCED.value() - coalesced == 4
+
+
+def test_a_waiter_timing_out_does_not_cancel_the_shared_call():
+    model = ScriptedModel(delay=0.1)
+    client = _client(model)
+
+    async def scenario():
+        return await asyncio.gather(client.generate("p", timeout=0.01), client.generate("p", timeout=5),
+                                    return_exceptions=True)
+
+    short, long = asyncio.run(scenario())
+
+    assert isinstance(short, GenerationTimeout)
+    assert long == "resposta para p"
+    assert model.calls == 1
+
+
+def test_concurrency_is_limited_by_the_semaphore():
+    model = ScriptedModel(delay=0.02)
+    client = _client(model, max_concurrency=2)
+
+    async def scenario():
+        return await asyncio.gather(*(client.generate(f"prompt {i}") for i in range(6)))
+
+    answers = asyncio.run(scenario())
+
+    assert answers == [f"resposta para prompt {i}" for i in range(6)]
+    assert model.calls == 6
+    assert model.max_active == 2
+
+
+def test_rate_limit_errors_are_retried():
+    model = FakeGenerativeModel(response_text="ok", rate_limit_errors=2)
+    client = _client(model, max_retries=4)
+    retries = GENERATION_RETRIES.value(reason="rate_limit")
+
+    assert asyncio.run(client.generate("prompt")) == "ok"
+    assert model.calls == 3
+    assert GENERATION_RETRIES.value(reason="rate_limit") - retries == 2
+
+
+def test_unavailable_errors_give_up_after_max_retries():
+    model = ScriptedModel(errors=[FakeServiceUnavailable("503 The model is overloaded.")] * 5)
+    client = _client(model, max_retries=2)
+    retries = GENERATION_RETRIES.value(reason="unavailable")
+
+    with pytest.raises(GenerationUnavailable):
+        asyncio.run(client.generate("prompt"))
+    assert model.calls == 3
+    assert GENERATION_RETRIES.value(reason="unavailable") - retries == 2
+
+
+def test_no_retry_when_the_backoff_would_pass_the_deadline():
+    model = FakeGenerativeModel(response_text="ok", rate_limit_errors=1)
+    client = _client(model, backoff=10.0, timeout=1.0)
+
+    with pytest.raises(GenerationUnavailable):
+        asyncio.run(client.generate("prompt"))
+    assert model.calls == 1
+
+
+def test_permanent_errors_are_not_retried():
+    model = ScriptedModel(errors=[ValueError("400 Invalid argument")])
+    client = _client(model)
+
+    with pytest.raises(GenerationError) as excinfo:
+        asyncio.run(client.generate("prompt"))
+    assert not isinstance(excinfo.value, GenerationUnavailable)
+    assert model.calls == 1
+
+
+def test_timeout_cancels_the_call():
+    model = ScriptedModel(delay=5.0)
+    client = _client(model, timeout=0.05)
+
+    async def scenario():
+        with pytest.raises(GenerationTimeout):
+            await client.generate("prompt")
+        await asyncio.sleep(0.01)
+        assert client._in_flight == {}
+        assert model.active == 0
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("model, status", [
+    (ScriptedModel(delay=5.0), 504),
+    (ScriptedModel(errors=[FakeServiceUnavailable("503")] * 3), 503),
+    (ScriptedModel(errors=[ValueError("400 Invalid argument")]), 502),
+])
+def test_api_maps_generation_errors_to_status_codes(client, pipeline, model, status):
+    pipeline.async_generator = _client(model, timeout=0.1, max_retries=1)
+
+    response = client.post("/ask", json={"question": "Onde Clarice Lispector nasceu?"})
+
+    assert response.status_code == status
+    assert response.json()["detail"]
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from app.rag.chunk_store import ChunkStore
+
+IDS = ["c0", "c1", "c2", "c3"]
+TEXTS = [
+    "Perto do Coração Selvagem",
+    "",
+    "Macabéa, em A Hora da Estrela — 1977",
+    "Clarice nasceu em Tchetchelnik, na Ucrânia.",
+]
+METADATAS = [
+    {'chunk_id': "c0", 'title': "Romances", 'section': "Obras", 'start_index': 0},
+    {'chunk_id': "c1", 'title': "Romances", 'start_index': 120},
+    {'chunk_id': "c2", 'title': "Personagens", 'section': "Obras"},
+    {'chunk_id': "c3", 'title': "Infância e família", 'section': "Biografia", 'start_index': 0},
+]
+
+
+@pytest.fixture
+def store():
+    store = ChunkStore.from_records(IDS[:2], TEXTS[:2], METADATAS[:2])
+    store.append(IDS[2:], TEXTS[2:], METADATAS[2:])
+    return store
+
+
+def _rows(store):
+    return [(chunk_id, store.text(row), store.metadata(row)) for row, chunk_id in enumerate(store.ids())]
+
+
+def test_round_trip(store, tmp_path):
+    store.save(str(tmp_path))
+
+    assert ChunkStore.exists(str(tmp_path))
+    loaded = ChunkStore.load(str(tmp_path))
+    assert len(loaded) == 4
+    assert _rows(loaded) == list(zip(IDS, TEXTS, METADATAS))
+    assert loaded.document(2).page_content == TEXTS[2]
+    assert isinstance(loaded._text, np.memmap)
+
+
+def test_texts_share_one_utf8_buffer(store):
+    store.ids()
+
+    assert store._text.tobytes() == "".join(TEXTS).encode('utf-8')
+    assert store._offsets.tolist()[-1] == len("".join(TEXTS).encode('utf-8'))
+
+
+def test_string_columns_are_dictionary_encoded(store, tmp_path):
+    store.save(str(tmp_path))
+    loaded = ChunkStore.load(str(tmp_path))
+
+    assert loaded._dictionaries['title'] == ["Romances", "Personagens", "Infância e família"]
+    assert loaded._columns['title'].tolist() == [0, 0, 1, 2]
+    assert loaded._columns['section'].tolist() == [0, -1, 0, 1]
+    assert loaded._columns['start_index'].dtype == np.int64
+    # O chunk_id repete o ID e não vira uma coluna.
+    assert 'chunk_id' not in loaded._columns
+
+
+def test_integer_column_becomes_a_dictionary_when_a_string_appears(store):
+    store.append(["c4"], ["Água Viva"], [{'chunk_id': "c4", 'start_index': "início"}])
+
+    assert [store.metadata(row).get('start_index') for row in range(5)] == [0, 120, None, 0, "início"]
+    assert store.rows_matching('start_index', [0]).tolist() == [0, 3]
+
+
+def test_chunk_id_becomes_a_column_when_it_stops_mirroring_the_id(store, tmp_path):
+    store.append(["c4"], ["Água Viva"], [{'chunk_id': "outro"}])
+    store.save(str(tmp_path))
+    loaded = ChunkStore.load(str(tmp_path))
+
+    assert [loaded.metadata(row)['chunk_id'] for row in range(5)] == IDS + ["outro"]
+    assert loaded.rows_matching('chunk_id', ["outro", "c1"]).tolist() == [1, 4]
+
+
+def test_rows_matching(store):
+    assert store.rows_matching('title', ["Romances"]).tolist() == [0, 1]
+    assert store.rows_matching('title', ["Infância e família", "Personagens"]).tolist() == [2, 3]
+    assert store.rows_matching('start_index', [0]).tolist() == [0, 3]
+    assert store.rows_matching('start_index', [True]).tolist() == []
+    assert store.rows_matching('chunk_id', ["c2", "c9"]).tolist() == [2]
+    assert store.rows_matching('title', ["Contos"]).tolist() == []
+    assert store.rows_matching('autor', ["Clarice"]).tolist() == []
+
+
+def test_take(store, tmp_path):
+    taken = store.take([3, 0, 2])
+
+    assert _rows(taken) == [(IDS[row], TEXTS[row], METADATAS[row]) for row in (3, 0, 2)]
+    assert taken.rows_matching('title', ["Romances"]).tolist() == [1]
+
+    taken.save(str(tmp_path))
+    assert _rows(ChunkStore.load(str(tmp_path))) == _rows(taken)
+
+
+def test_take_nothing(store, tmp_path):
+    empty = store.take([])
+    assert len(empty) == 0
+
+    empty.save(str(tmp_path))
+    assert ChunkStore.load(str(tmp_path)).ids() == []
@@ -0,0 +1,31 @@
+from langchain_core.documents import Document
+
+from app.rag.context import ContextAssembler
+
+SECTION = "Clarice chegou ao Recife em 1925. Estudou no Ginásio Pernambucano. Mudou-se para o Rio em 1935."
+
+
+def _chunk(start, end, section="Infância"):
+    return Document(page_content=SECTION[start:end],
+                    metadata={'source_file': "clarice.json", 'section': section, 'start_index': start})
+
+
+def test_overlapping_chunks_are_merged_into_the_section_text():
+    assembler = ContextAssembler(token_budget=0, dedup_threshold=1)
+
+    assert assembler.assemble([_chunk(20, 70), _chunk(0, 40), _chunk(60, len(SECTION))]) == [SECTION]
+
+
+def test_end_is_tracked_in_section_positions_after_a_gap():
+    assembler = ContextAssembler(token_budget=0, dedup_threshold=1, adjacent_gap=2)
+    # Dois caracteres (". ") entre o primeiro e o segundo chunk viram um espaço; o
+    # terceiro se sobrepõe ao segundo e não pode repetir nem perder caracteres.
+    first, second, third = _chunk(0, 32), _chunk(34, 66), _chunk(60, len(SECTION))
+
+    assert assembler.assemble([first, second, third]) == [SECTION[:32] + " " + SECTION[34:]]
+
+
+def test_distant_chunks_stay_separate_in_ranking_order():
+    assembler = ContextAssembler(token_budget=0, dedup_threshold=1, adjacent_gap=2)
+
+    assert assembler.assemble([_chunk(67, len(SECTION)), _chunk(0, 33)]) == [SECTION[67:], SECTION[:33]]
@@ -0,0 +1,140 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from app.rag.embedding_cache import CachedEmbeddings
+from app.rag.fake_models import HashingEmbeddings
+from app.rag.lazy_embeddings import LazyEmbeddings, embed_queries
+
+
+class CountingEmbeddings(HashingEmbeddings):
+    def __init__(self):
+        super().__init__(dimension=8)
+        self.texts_embedded = 0
+
+    def embed_documents(self, texts):
+        self.texts_embedded += len(texts)
+        return super().embed_documents(texts)
+
+
+class InstructionEmbeddings(CountingEmbeddings):
+    """Modelo que prefixa as queries com uma instrução, como os modelos E5."""
+
+    def __init__(self):
+        super().__init__()
+        self.queries_embedded = 0
+
+    def embed_query(self, text):
+        self.queries_embedded += 1
+        return HashingEmbeddings(dimension=8).embed_documents([f"query: {text}"])[0]
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return str(tmp_path / "embeddings")
+
+
+def _cache(cache_dir, max_entries=4):
+    return CachedEmbeddings(CountingEmbeddings(), model_name="modelo", cache_dir=cache_dir, max_entries=max_entries)
+
+
+def test_second_call_comes_from_the_cache(cache_dir):
+    cache = _cache(cache_dir)
+    first = cache.embed_documents(["um", "dois", "um"])
+    second = _cache(cache_dir).embed_documents(["dois", "um"])
+
+    assert cache.embeddings.texts_embedded == 2
+    assert np.allclose(second, [first[1], first[0]])
+
+
+def test_slot_reused_by_another_process_is_a_miss(cache_dir):
+    reader = _cache(cache_dir, max_entries=2)
+    reader.embed_documents(["um", "dois"])
+    keys = [reader._key(text, "document") for text in ("um", "dois")]
+    found = reader._select_slots(keys)
+
+    # Outro processo despeja as duas entradas e grava outros vetores nas mesmas linhas.
+    _cache(cache_dir, max_entries=2).embed_documents(["três", "quatro"])
+
+    assert reader._read(found) == {}
+    assert reader.embed_documents(["um"]) == HashingEmbeddings(dimension=8).embed_documents(["um"])
+
+
+def test_rows_without_a_matching_tag_are_rewritten(cache_dir):
+    cache = _cache(cache_dir)
+    expected = cache.embed_documents(["um"])
+    cache._tags[:] = 0
+
+    again = _cache(cache_dir)
+    assert again.embed_documents(["um"]) == expected
+    assert again.misses == 1
+    assert _cache(cache_dir).embed_documents(["um"]) == expected
+    assert _cache(cache_dir)._read(again._select_slots([again._key("um", "document")]))
+
+
+def test_capacity_change_is_applied(cache_dir):
+    _cache(cache_dir, max_entries=2).embed_documents(["um", "dois"])
+
+    grown = _cache(cache_dir, max_entries=4)
+    assert grown._get_meta('capacity') == "4"
+    grown.embed_documents(["três", "quatro"])
+    assert grown._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] == 4
+    assert os.path.getsize(grown._vectors_path) == 4 * 8 * 4
+
+    shrunk = _cache(cache_dir, max_entries=1)
+    assert shrunk._get_meta('capacity') == "1"
+    assert shrunk._conn.execute("SELECT MAX(slot) FROM entries").fetchone()[0] == 0
+    shrunk.embed_documents(["cinco"])
+    assert shrunk._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] == 1
+
+
+def test_threads_can_share_one_cache(cache_dir):
+    cache = _cache(cache_dir, max_entries=16)
+    expected = HashingEmbeddings(dimension=8)
+    barrier = threading.Barrier(8)
+    errors = []
+
+    def _worker(worker):
+        try:
+            barrier.wait()
+            for round_ in range(20):
+                texts = [f"texto {worker} {round_} {i}" for i in range(3)] + ["comum"]
+                assert cache.embed_documents(texts) == expected.embed_documents(texts)
+                assert cache.embed_query(texts[0]) == expected.embed_query(texts[0])
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=_worker, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert cache._conn.execute("SELECT COUNT(*), MAX(slot) FROM entries").fetchone() == (16, 15)
+
+
+def test_queries_use_the_query_path_and_their_own_cache_entries(cache_dir):
+    model = InstructionEmbeddings()
+    cache = CachedEmbeddings(LazyEmbeddings(lambda: model), model_name="modelo", cache_dir=cache_dir)
+    expected = [model.embed_query(text) for text in ("um", "dois")]
+    model.queries_embedded = 0
+
+    assert embed_queries(cache, ["um", "dois", "um"]) == [expected[0], expected[1], expected[0]]
+    assert model.queries_embedded == 2 and model.texts_embedded == 0
+
+    reopened = CachedEmbeddings(InstructionEmbeddings(), model_name="modelo", cache_dir=cache_dir)
+    assert reopened.embed_query("dois") == expected[1]
+    assert reopened.embeddings.queries_embedded == 0
+    # O mesmo texto como documento tem outro embedding e outra entrada.
+    assert reopened.embed_documents(["um"]) != [expected[0]]
+    assert reopened.embeddings.texts_embedded == 1
+
+
+def test_retriever_embeds_queries_through_the_query_path(pipeline):
+    model = pipeline.retriever.embeddings = InstructionEmbeddings()
+
+    assert pipeline.retriever.embed_queries(["um", "dois"]) == [model.embed_query("um"), model.embed_query("dois")]
+    assert model.texts_embedded == 0
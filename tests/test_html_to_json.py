@@ -0,0 +1,137 @@
+import json
+import os
+
+import pytest
+
+from scripts.html_to_json import HtmlCache, existing_outputs, fetch_html, output_filename_for, parse_wikipedia_html, \
+    scrape_many
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "wikipedia_clarice_lispector.html")
+URL = "https://pt.wikipedia.org/wiki/Clarice_Lispector"
+
+
+@pytest.fixture
+def html():
+    with open(FIXTURE, "rb") as f:
+        return f.read()
+
+
+class FakeResponse:
+    def __init__(self, status_code, content=b"", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise AssertionError(f"status {self.status_code}")
+
+
+class FakeSession:
+    """Sessão que devolve as respostas dadas, em ordem, e guarda os cabeçalhos enviados."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.sent_headers = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.sent_headers.append(dict(headers or {}))
+        return self.responses.pop(0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+def test_parses_the_article_into_the_corpus_shape(html):
+    data = parse_wikipedia_html(html, URL)
+
+    assert data["metadata"]["source_url"] == URL
+    assert data["metadata"]["title"] == "Clarice Lispector"
+    assert data["metadata"]["infobox"]["Nome completo"] == "Chaya Pinkhasivna Lispector"
+    assert data["metadata"]["infobox"]["Nascimento"] == "10 de dezembro de 1920 Chechelnyk"
+
+    titles = [section["section_title"] for section in data["content_sections"]]
+    assert titles == ["Biografia", "Lista de obras"]
+
+    biography = data["content_sections"][0]
+    assert [sub["subsection_title"] for sub in biography["subsections"]] == ["Infância", "Juventude"]
+    assert biography["subsections"][1]["content"] == [
+        {"type": "paragraph", "text": "Em 1935 mudou-se para o Rio de Janeiro."}
+    ]
+    texts = [item["text"] for sub in biography["subsections"] for item in sub["content"]]
+    assert not any("[" in text for text in texts)
+
+
+def test_parses_works_lists_with_their_categories(html):
+    works = [item for item in parse_wikipedia_html(html, URL)["content_sections"][1]["content"]
+             if item["type"] == "works_list"]
+
+    assert [(block["category"], block["items"]) for block in works] == [
+        ("Romance", [{"title": "Perto do Coração Selvagem", "year": "1943"},
+                     {"title": "A Hora da Estrela", "year": "1977"}]),
+        ("Contos", [{"title": "Laços de Família", "year": "1960"},
+                    {"title": "A Bela e a Fera", "year": None}]),
+    ]
+
+
+def test_returns_none_without_article_content():
+    assert parse_wikipedia_html(b"<html><body><p>Erro</p></body></html>", URL) is None
+
+
+def test_revalidates_the_cached_copy_with_etag_and_last_modified(tmp_path, html):
+    cache = HtmlCache(str(tmp_path / "cache"))
+    validators = {"ETag": '"v1"', "Last-Modified": "Sat, 01 Jun 2024 10:00:00 GMT"}
+    session = FakeSession(FakeResponse(200, html, validators), FakeResponse(304))
+
+    first, first_cached = fetch_html(session, URL, cache)
+    second, second_cached = fetch_html(session, URL, cache)
+
+    assert (first, first_cached) == (html, False)
+    assert (second, second_cached) == (html, True)
+    assert session.sent_headers == [
+        {},
+        {"If-None-Match": '"v1"', "If-Modified-Since": "Sat, 01 Jun 2024 10:00:00 GMT"},
+    ]
+
+
+def test_changed_page_replaces_the_cached_copy(tmp_path, html):
+    cache = HtmlCache(str(tmp_path / "cache"))
+    session = FakeSession(FakeResponse(200, b"<html>v1</html>", {"ETag": '"v1"'}),
+                          FakeResponse(200, html, {"ETag": '"v2"'}))
+
+    fetch_html(session, URL, cache)
+    content, from_cache = fetch_html(session, URL, cache)
+
+    assert (content, from_cache) == (html, False)
+    assert cache.get(URL) == (html, {"url": URL, "etag": '"v2"', "last_modified": None})
+
+
+@pytest.mark.parametrize("url, filename", [
+    ("https://pt.wikipedia.org/wiki/Clarice_Lispector", "dados_clarice_lispector.json"),
+    ("https://pt.wikipedia.org/wiki/A_Hora_da_Estrela/", "dados_a_hora_da_estrela.json"),
+    ("https://pt.wikipedia.org/wiki/Perto_do_Cora%C3%A7%C3%A3o_Selvagem", "dados_perto_do_coração_selvagem.json"),
+    ("https://pt.wikipedia.org/wiki/G.H._(personagem)", "dados_g_h_personagem.json"),
+])
+def test_output_filename_for(url, filename):
+    assert output_filename_for(url) == filename
+
+
+def test_scrape_many_updates_the_existing_file_of_a_url(tmp_path, html, monkeypatch):
+    output_dir = tmp_path / "data"
+    output_dir.mkdir()
+    (output_dir / "dados_clarice_final.json").write_text(
+        json.dumps({"metadata": {"source_url": URL}, "content_sections": []}), encoding="utf-8"
+    )
+    monkeypatch.setattr("scripts.html_to_json.create_session",
+                        lambda pool_size: FakeSession(FakeResponse(200, html)))
+
+    summary = scrape_many([URL], str(output_dir), cache_dir=None, workers=1, requests_per_second=0)
+
+    assert summary == {"downloaded": 1, "cached": 0, "failed": 0}
+    assert sorted(os.listdir(output_dir)) == ["dados_clarice_final.json"]
+    assert existing_outputs(str(output_dir)) == {URL: "dados_clarice_final.json"}
+    saved = json.loads((output_dir / "dados_clarice_final.json").read_text(encoding="utf-8"))
+    assert [section["section_title"] for section in saved["content_sections"]] == ["Biografia", "Lista de obras"]
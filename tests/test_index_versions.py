@@ -0,0 +1,238 @@
+import os
+import json
+import time
+import shutil
+import logging
+
+import pytest
+
+from app.rag import retriever as retriever_module
+from app.rag.fake_models import HashingEmbeddings
+from app.rag.index_manifest import IndexVersions
+from app.rag.ingestion import chunk_id_for
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS_FILE = os.path.join("data", "dados_clarice_final.json")
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """Diretório de trabalho com uma cópia de `data/`, que os testes podem alterar."""
+    shutil.copytree(os.path.join(REPO_ROOT, "data"), tmp_path / "data")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("VECTOR_STORE_BACKEND", "numpy")
+    monkeypatch.setenv("EMBEDDING_CACHE_DIR", "")
+    monkeypatch.setenv("INDEX_KEEP_VERSIONS", "1")
+    monkeypatch.delenv("RERANKER_MODEL_NAME", raising=False)
+    return tmp_path
+
+
+def _retriever():
+    retriever = retriever_module.RAGRetriever(db_path="db")
+    retriever.embedding_model = retriever.embeddings = HashingEmbeddings()
+    return retriever
+
+
+def _forbid_corpus_hash(monkeypatch):
+    def corpus_hash(paths):
+        raise AssertionError("o corpus não deveria ser lido")
+
+    monkeypatch.setattr(retriever_module, "corpus_hash", corpus_hash)
+
+
+def _edit_corpus():
+    with open(CORPUS_FILE, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    data["content_sections"][0]["content"].append({"type": "paragraph", "text": "Um parágrafo novo."})
+    with open(CORPUS_FILE, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+def test_opening_the_current_version_does_not_hash_the_corpus(monkeypatch):
+    _retriever().setup_vector_store()
+    _forbid_corpus_hash(monkeypatch)
+
+    retriever = _retriever()
+    assert retriever._ensure_vector_store()
+    retriever.setup_vector_store()
+    assert retriever._active_version == IndexVersions("db").current()
+
+
+def test_changed_corpus_is_not_rebuilt_inside_a_request(monkeypatch, caplog):
+    _retriever().setup_vector_store()
+    name = IndexVersions("db").current()
+    _edit_corpus()
+    _forbid_corpus_hash(monkeypatch)
+
+    retriever = _retriever()
+    with caplog.at_level(logging.WARNING):
+        assert retriever._ensure_vector_store()
+
+    assert retriever._active_version == name
+    assert IndexVersions("db").complete_versions() == [name]
+    assert "python -m app.build_index" in caplog.text
+
+
+def test_touched_corpus_with_the_same_content_reuses_the_version():
+    _retriever().setup_vector_store()
+    name = IndexVersions("db").current()
+    os.utime(CORPUS_FILE, (time.time() + 60, time.time() + 60))
+
+    _retriever().setup_vector_store(incremental=True)
+
+    assert IndexVersions("db").complete_versions() == [name]
+    assert IndexVersions("db").manifest(name)["corpus_files"]["dados_clarice_final.json"][1] == \
+        os.stat(CORPUS_FILE).st_mtime_ns
+
+
+def test_replaced_version_is_kept_for_the_grace_period():
+    _retriever().setup_vector_store()
+    versions = IndexVersions("db")
+    old = versions.current()
+    _edit_corpus()
+
+    _retriever().setup_vector_store(incremental=True)
+
+    new = versions.current()
+    assert new != old
+    # INDEX_KEEP_VERSIONS=1, mas a versão anterior acabou de ser substituída.
+    assert versions.complete_versions() == [old, new]
+
+    retired = os.path.join(versions.path(old), IndexVersions.RETIRED_FILE)
+    os.utime(retired, (time.time() - 601, time.time() - 601))
+    versions.prune(keep=1, grace_seconds=600)
+    assert versions.complete_versions() == [new]
+
+
+class CountingEmbeddings(HashingEmbeddings):
+    def __init__(self):
+        super().__init__()
+        self.texts_embedded = []
+
+    def embed_documents(self, texts):
+        self.texts_embedded.extend(texts)
+        return super().embed_documents(texts)
+
+
+def _sync(monkeypatch, incremental=True):
+    """Atualiza o índice e devolve (retriever, contagens da sincronização)."""
+    stats = {}
+    index_chunks = retriever_module.RAGRetriever._index_chunks
+
+    def _index_chunks(self, vector_store, chunks):
+        result = index_chunks(self, vector_store, chunks)
+        stats.update(result[2])
+        return result
+
+    monkeypatch.setattr(retriever_module.RAGRetriever, "_index_chunks", _index_chunks)
+    retriever = _retriever()
+    retriever.embedding_model = retriever.embeddings = CountingEmbeddings()
+    retriever.setup_vector_store(incremental=incremental)
+    return retriever, stats
+
+
+def _ids_by_file(retriever) -> dict:
+    ids = {}
+    for doc in retriever.vector_store.get_documents():
+        ids.setdefault(doc.metadata['source_file'], set()).add(doc.metadata['chunk_id'])
+    return ids
+
+
+def _texts(retriever, ids) -> list:
+    return sorted(doc.page_content for doc in retriever.vector_store.get_documents(list(ids)))
+
+
+def _write_corpus_file(name, paragraphs):
+    data = {
+        'metadata': {'source_url': f"https://exemplo.org/{name}", 'title': name},
+        'content_sections': [{'section_title': "Obra", 'content': [
+            {'type': 'paragraph', 'text': text} for text in paragraphs
+        ]}],
+    }
+    with open(os.path.join("data", name), "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+def test_chunk_ids_are_hashes_of_the_content(monkeypatch):
+    first, _ = _sync(monkeypatch, incremental=False)
+    second, _ = _sync(monkeypatch, incremental=False)
+    ids = [doc.metadata['chunk_id'] for doc in first.vector_store.get_documents()]
+
+    assert sorted(ids) == sorted(doc.metadata['chunk_id'] for doc in second.vector_store.get_documents())
+    assert len(set(ids)) == len(ids)
+    doc = first.vector_store.get_documents(ids[:1])[0]
+    assert doc.metadata['chunk_id'] == chunk_id_for(doc.metadata, doc.page_content, {})
+    assert chunk_id_for(dict(doc.metadata, section="Outra"), doc.page_content, {}) != doc.metadata['chunk_id']
+    seen = {}
+    assert chunk_id_for(doc.metadata, "texto", seen) + "-1" == chunk_id_for(doc.metadata, "texto", seen)
+
+
+def test_sync_counts_when_a_file_is_edited(monkeypatch):
+    before, _ = _sync(monkeypatch)
+    old_ids = set(before.vector_store.ids())
+    _edit_corpus()
+    with open(CORPUS_FILE, encoding="utf-8") as f:
+        data = json.load(f)
+    section = data["content_sections"][0]
+    section["subsections"][0]["content"][0]["text"] = "Um parágrafo reescrito."
+    with open(CORPUS_FILE, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+
+    after, stats = _sync(monkeypatch)
+    new_ids = set(after.vector_store.ids())
+
+    assert stats['added'] == len(new_ids - old_ids) > 0
+    assert stats['removed'] == len(old_ids - new_ids) > 0
+    assert stats['existing'] == len(old_ids) and stats['total'] == len(new_ids)
+    assert sorted(after.embeddings.texts_embedded) == _texts(after, new_ids - old_ids)
+    # Só mudam os chunks da seção e da subseção editadas.
+    changed = before.vector_store.get_documents(list(old_ids - new_ids)) + \
+        after.vector_store.get_documents(list(new_ids - old_ids))
+    assert {(doc.metadata['section'], doc.metadata.get('subsection')) for doc in changed} == \
+        {(section["section_title"], None), (section["section_title"], section["subsections"][0]["subsection_title"])}
+
+
+def test_sync_counts_when_a_file_is_added(monkeypatch):
+    before, _ = _sync(monkeypatch)
+    first = IndexVersions("db").current()
+    clarice_ids = _ids_by_file(before)["dados_clarice_final.json"]
+    _write_corpus_file("outro.json", ["Um texto curto sobre outra obra.", "Outro parágrafo, também curto."])
+
+    added, stats = _sync(monkeypatch)
+    ids = _ids_by_file(added)
+    assert ids["dados_clarice_final.json"] == clarice_ids
+    assert stats['added'] == len(ids["outro.json"]) > 0 and stats['removed'] == 0
+    assert sorted(added.embeddings.texts_embedded) == _texts(added, ids["outro.json"])
+
+    # De volta ao corpus anterior, a versão que ainda existe é reaproveitada.
+    os.remove(os.path.join("data", "outro.json"))
+    reverted, stats = _sync(monkeypatch)
+    assert stats == {} and IndexVersions("db").current() == first
+    assert _ids_by_file(reverted) == {"dados_clarice_final.json": clarice_ids}
+
+
+def test_sync_counts_when_a_file_is_removed(monkeypatch):
+    _write_corpus_file("outro.json", ["Um texto curto sobre outra obra."])
+    before, _ = _sync(monkeypatch)
+    ids = _ids_by_file(before)
+    os.remove(os.path.join("data", "outro.json"))
+
+    removed, stats = _sync(monkeypatch)
+    assert _ids_by_file(removed) == {"dados_clarice_final.json": ids["dados_clarice_final.json"]}
+    assert stats['added'] == 0 and stats['removed'] == len(ids["outro.json"]) > 0
+    assert removed.embeddings.texts_embedded == []
+
+
+def test_rebuild_after_editing_one_file_only_changes_its_chunks(monkeypatch):
+    _write_corpus_file("outro.json", ["Primeira versão do texto."])
+    before, _ = _sync(monkeypatch)
+    old = _ids_by_file(before)
+    _write_corpus_file("outro.json", ["Segunda versão do texto, diferente."])
+
+    after, stats = _sync(monkeypatch)
+    new = _ids_by_file(after)
+
+    assert new["dados_clarice_final.json"] == old["dados_clarice_final.json"]
+    assert new["outro.json"].isdisjoint(old["outro.json"])
+    assert (stats['added'], stats['removed']) == (len(new["outro.json"]), len(old["outro.json"]))
+    assert sorted(after.embeddings.texts_embedded) == _texts(after, new["outro.json"])
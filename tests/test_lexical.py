@@ -0,0 +1,55 @@
+import math
+
+import pytest
+
+from app.rag.lexical import BM25Index, tokenize
+
+TEXTS = [
+    "Clarice Lispector nasceu na Ucrânia e cresceu no Recife.",
+    "Perto do Coração Selvagem foi o primeiro romance de Clarice.",
+    "A Hora da Estrela conta a história de Macabéa, no Rio de Janeiro.",
+    "No Recife, Clarice estudou no Ginásio Pernambucano.",
+    "O romance A Paixão Segundo G.H. foi publicado em 1964.",
+]
+IDS = [f"chunk-{i}" for i in range(len(TEXTS))]
+
+
+def _reference_scores(query: str, k1: float = 1.5, b: float = 0.75) -> dict:
+    documents = [tokenize(text) for text in TEXTS]
+    average_length = sum(len(doc) for doc in documents) / len(documents)
+    scores = {}
+    for term in set(tokenize(query)):
+        frequency = sum(term in doc for doc in documents)
+        if not frequency:
+            continue
+        idf = math.log(1 + (len(documents) - frequency + 0.5) / (frequency + 0.5))
+        for chunk_id, doc in zip(IDS, documents):
+            tf = doc.count(term)
+            if tf:
+                norm = k1 * (1 - b + b * len(doc) / average_length)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+    return scores
+
+
+@pytest.mark.parametrize("query", ["Clarice no Recife", "romance", "Macabéa Rio de Janeiro"])
+def test_scores_match_the_bm25_formula(query):
+    results = BM25Index.build(IDS, TEXTS).search(query, k=len(TEXTS))
+    expected = _reference_scores(query)
+
+    assert {chunk_id for chunk_id, _ in results} == set(expected)
+    for chunk_id, score in results:
+        assert score == pytest.approx(expected[chunk_id], rel=1e-5)
+    assert [score for _, score in results] == sorted((score for _, score in results), reverse=True)
+
+
+def test_unknown_terms_return_nothing():
+    assert BM25Index.build(IDS, TEXTS).search("xyzzy", k=3) == []
+    assert BM25Index().search("Clarice", k=3) == []
+
+
+def test_loaded_index_searches_like_the_built_one(tmp_path):
+    index = BM25Index.build(IDS, TEXTS)
+    path = str(tmp_path / "lexical_index.npz")
+    index.save(path)
+
+    assert BM25Index.load(path).search("Clarice no Recife", k=2) == index.search("Clarice no Recife", k=2)
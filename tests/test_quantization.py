@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from app.rag.fake_models import HashingEmbeddings
+from app.rag.quantization import BinaryQuantizer, Int8Quantizer
+from app.rag.vector_stores import NumpyVectorStore
+
+TEXTS = [f"texto {i} sobre o tema {i % 5} e a palavra {i * 7 % 11}" for i in range(40)]
+IDS = [f"chunk-{i}" for i in range(len(TEXTS))]
+EMBEDDINGS = HashingEmbeddings(dimension=32)
+QUERIES = EMBEDDINGS.embed_documents(["tema 3 palavra 5", "texto 12"])
+
+
+def _store(path, quantization, rescore_factor=None):
+    store = NumpyVectorStore(str(path), EMBEDDINGS, quantization=quantization, rescore_factor=rescore_factor)
+    store.add([Document(page_content=text, metadata={'grupo': i % 2}) for i, text in enumerate(TEXTS)], IDS)
+    return store
+
+
+def _exact(query, k):
+    scores = EMBEDDINGS.embed_array(TEXTS) @ np.asarray(query, dtype=np.float32)
+    return sorted(scores, reverse=True)[:k]
+
+
+@pytest.mark.parametrize("quantizer", [Int8Quantizer, BinaryQuantizer])
+def test_empty_input_fits_a_neutral_quantizer(quantizer):
+    fitted = quantizer.fit(iter([]), dimension=4)
+
+    codes = fitted.encode(np.zeros((0, 4), dtype=np.float32))
+    assert codes.shape[0] == 0
+    assert fitted.scores(np.ones((1, 4), dtype=np.float32), codes).shape == (1, 0)
+
+
+def test_int8_scores_approximate_the_dot_products():
+    vectors = EMBEDDINGS.embed_array(TEXTS)
+    quantizer = Int8Quantizer.fit([vectors[:25], vectors[25:]])
+
+    approximate = quantizer.scores(vectors[:3], quantizer.encode(vectors))
+    assert np.allclose(approximate, vectors[:3] @ vectors.T, atol=0.05)
+
+
+@pytest.mark.parametrize("quantization", ["int8", "binary"])
+def test_search_rescores_with_the_full_vectors(tmp_path, quantization):
+    store = _store(tmp_path, quantization)
+
+    for query, hits in zip(QUERIES, store.search(QUERIES, k=5)):
+        assert [score for _, score in hits] == pytest.approx(_exact(query, 5), abs=1e-5)
+
+
+@pytest.mark.parametrize("quantization", ["int8", "binary"])
+def test_small_rescore_factor_still_returns_exact_scores(tmp_path, quantization):
+    store = _store(tmp_path, quantization, rescore_factor=1)
+    vectors = {text: vector for text, vector in zip(TEXTS, EMBEDDINGS.embed_array(TEXTS))}
+
+    hits = store.search(QUERIES[:1], k=3)[0]
+    assert len(hits) == 3
+    for document, score in hits:
+        assert score == pytest.approx(float(vectors[document.page_content] @ np.asarray(QUERIES[0])), abs=1e-5)
+
+
+@pytest.mark.parametrize("quantization", ["int8", "binary"])
+def test_codes_are_persisted_and_filters_apply(tmp_path, quantization):
+    store = _store(tmp_path, quantization)
+    store.persist()
+
+    loaded = NumpyVectorStore(str(tmp_path), EMBEDDINGS, quantization=quantization)
+    assert loaded._codes is not None and loaded._codes.shape[0] == len(TEXTS)
+    hits = loaded.search(QUERIES, k=4, filter={'grupo': 1})
+    assert all(document.metadata['grupo'] == 1 for query_hits in hits for document, _ in query_hits)
+    assert [[doc.page_content for doc, _ in query_hits] for query_hits in hits] == \
+        [[doc.page_content for doc, _ in query_hits] for query_hits in store.search(QUERIES, k=4, filter={'grupo': 1})]
+
+
+@pytest.mark.parametrize("quantization", ["int8", "binary"])
+def test_empty_store_persists(tmp_path, quantization):
+    NumpyVectorStore(str(tmp_path / "vazio"), EMBEDDINGS, quantization=quantization).persist()
+
+    store = _store(tmp_path / "esvaziado", quantization)
+    store.persist()
+    store.delete(IDS)
+    store.persist()
+
+    for path in ("vazio", "esvaziado"):
+        loaded = NumpyVectorStore(str(tmp_path / path), EMBEDDINGS, quantization=quantization)
+        assert loaded.count() == 0
+        assert loaded.search(QUERIES, k=3) == [[], []]
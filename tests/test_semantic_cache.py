@@ -0,0 +1,79 @@
+import json
+
+import numpy as np
+import pytest
+
+from app.rag.semantic_cache import SemanticAnswerCache, key_terms
+
+EMBEDDING = np.ones(4, dtype=np.float32)
+CHUNKS = ["a", "b"]
+
+
+def test_is_disabled_by_default(monkeypatch):
+    monkeypatch.delenv("SEMANTIC_CACHE_ENABLED", raising=False)
+    assert SemanticAnswerCache.from_env() is None
+
+    monkeypatch.setenv("SEMANTIC_CACHE_ENABLED", "true")
+    assert isinstance(SemanticAnswerCache.from_env(), SemanticAnswerCache)
+
+
+def test_key_terms():
+    assert key_terms("O que Clarice publicou em 1943?") == ("1943", "clarice")
+    assert key_terms("Clarice não publicou nada em 1943?") == ("1943", "clarice", "nao")
+    assert key_terms("Onde ela morou na infância?") == ()
+
+
+def test_reuses_answers_for_rewordings_with_the_same_key_terms():
+    cache = SemanticAnswerCache()
+    cache.store(EMBEDDING, CHUNKS, "v1", "O que Clarice publicou em 1943?", "Perto do Coração Selvagem")
+
+    assert cache.lookup(EMBEDDING, CHUNKS, "v1", "Clarice publicou o quê em 1943?") == "Perto do Coração Selvagem"
+
+
+@pytest.mark.parametrize("question", [
+    "O que Clarice publicou em 1944?",
+    "O que Clarice não publicou em 1943?",
+    "O que Lispector publicou em 1943?",
+])
+def test_different_key_terms_are_a_miss(question):
+    cache = SemanticAnswerCache()
+    cache.store(EMBEDDING, CHUNKS, "v1", "O que Clarice publicou em 1943?", "Perto do Coração Selvagem")
+
+    assert cache.lookup(EMBEDDING, CHUNKS, "v1", question) is None
+
+
+def test_other_chunks_or_index_version_are_a_miss():
+    cache = SemanticAnswerCache()
+    cache.store(EMBEDDING, CHUNKS, "v1", "Onde ela nasceu?", "Na Ucrânia.")
+
+    assert cache.lookup(EMBEDDING, ["a"], "v1", "Onde ela nasceu?") is None
+    assert cache.lookup(EMBEDDING, CHUNKS, "v2", "Onde ela nasceu?") is None
+
+
+def test_persistence_appends_and_compacts(tmp_path):
+    path = str(tmp_path / "answers.jsonl")
+    cache = SemanticAnswerCache(max_entries=2, persist_path=path)
+    for i in range(4):
+        cache.store(EMBEDDING * (i + 1), CHUNKS, "v1", f"Pergunta {i}", f"Resposta {i}")
+
+    with open(path, encoding="utf-8") as f:
+        assert [json.loads(line)["answer"] for line in f] == [f"Resposta {i}" for i in range(4)]
+
+    cache.store(EMBEDDING, ["c"], "v1", "Pergunta 4", "Resposta 4")
+    with open(path, encoding="utf-8") as f:
+        assert [json.loads(line)["answer"] for line in f] == ["Resposta 3", "Resposta 4"]
+
+    reloaded = SemanticAnswerCache(max_entries=2, persist_path=path)
+    assert len(reloaded) == 2
+    assert reloaded.lookup(EMBEDDING, ["c"], "v1", "Pergunta 4") == "Resposta 4"
+
+
+def test_load_skips_a_truncated_line_and_the_old_format(tmp_path):
+    path = tmp_path / "answers.jsonl"
+    SemanticAnswerCache(persist_path=str(path)).store(EMBEDDING, CHUNKS, "v1", "Onde ela nasceu?", "Na Ucrânia.")
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('[{"embedding": [1, 1, 1, 1]}]\n{"embedding": [1, ')
+
+    reloaded = SemanticAnswerCache(persist_path=str(path))
+    assert len(reloaded) == 1
+    assert reloaded.lookup(EMBEDDING, CHUNKS, "v1", "Onde ela nasceu?") == "Na Ucrânia."
@@ -0,0 +1,86 @@
+import json
+import time
+
+import pytest
+
+from app.rag.fake_models import FakeGenerativeModel
+
+ANSWER = "Clarice Lispector publicou Perto do Coração Selvagem em 1943 aos vinte e três anos."
+QUESTION = "Onde Clarice Lispector nasceu?"
+
+
+@pytest.fixture
+def model(pipeline):
+    """Modelo falso com resposta fixa, em pedaços de duas palavras e com atraso no primeiro."""
+    fake_model = FakeGenerativeModel(response_text=ANSWER, words_per_chunk=2, first_token_delay=0.05,
+                                     chunk_delay=0.01)
+    pipeline.generator._model = fake_model
+    pipeline.generator._configured = True
+    return fake_model
+
+
+def _parse_events(body: str) -> list:
+    """Separa o corpo em eventos SSE: uma lista de (nome do evento, dados em JSON)."""
+    assert body.endswith("\n\n")
+    events = []
+    for block in body[:-2].split("\n\n"):
+        name = "message"
+        lines = block.split("\n")
+        if lines[0].startswith("event: "):
+            name = lines.pop(0)[len("event: "):]
+        assert len(lines) == 1 and lines[0].startswith("data: "), block
+        events.append((name, json.loads(lines[0][len("data: "):])))
+    return events
+
+
+def test_ask_stream_yields_chunks_in_order_as_they_are_generated(pipeline, model):
+    stats = {}
+    start = time.perf_counter()
+    arrivals = []
+    chunks = []
+    for chunk in pipeline.ask_stream(QUESTION, stats=stats):
+        arrivals.append(time.perf_counter() - start)
+        chunks.append(chunk)
+
+    words = ANSWER.split(" ")
+    assert chunks == [" ".join(words[i:i + 2]) + (" " if i + 2 < len(words) else "") for i in range(0, len(words), 2)]
+    assert "".join(chunks) == ANSWER
+    assert model.calls == 1
+
+    assert 0.05 <= stats['time_to_first_token'] < stats['total_time']
+    # O primeiro pedaço chega antes de o modelo terminar de gerar os demais.
+    assert arrivals[-1] - arrivals[0] >= 0.01 * (len(chunks) - 1)
+
+
+def test_ask_stream_endpoint_sends_one_sse_event_per_chunk(client, model):
+    response = client.post("/ask/stream", json={"question": QUESTION})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _parse_events(response.text)
+
+    *chunks, (name, summary) = events
+    assert name == "done"
+    assert {name for name, _ in chunks} == {"message"}
+    assert "".join(data["text"] for _, data in chunks) == ANSWER
+    assert len(chunks) == len(ANSWER.split(" ")) // 2 + len(ANSWER.split(" ")) % 2
+
+    assert summary["cache_hit"] is False
+    assert summary["generation_time_to_first_token"] >= 0.05
+    assert summary["time_to_first_token"] >= summary["generation_time_to_first_token"]
+
+
+def test_ask_stream_endpoint_keeps_non_ascii_text(client, model):
+    response = client.post("/ask/stream", json={"question": QUESTION})
+
+    assert "data: {\"text\": \"do Coração \"}\n\n" in response.text
+
+
+def test_ask_stream_endpoint_frames_structured_answers(client):
+    response = client.post("/ask/stream", json={"question": "Quantos romances Clarice escreveu?"})
+
+    (_, data), (name, summary) = _parse_events(response.text)
+    assert data["text"].startswith("A lista de obras de Clarice Lispector")
+    assert name == "done"
+    assert summary["structured"] is True
+    assert summary["time_to_first_token"] >= 0
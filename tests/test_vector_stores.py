@@ -0,0 +1,191 @@
+import os
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from app.rag.fake_models import HashingEmbeddings
+from app.rag.vector_stores import ChromaVectorStore, NumpyVectorStore, ShardedVectorStore
+
+EMBEDDINGS = HashingEmbeddings(dimension=64)
+SOURCES = ["clarice.json", "rosa.json", "drummond.json"]
+DOCUMENTS = [
+    # Cada texto repete "tema" um número diferente de vezes, para que não haja empates.
+    Document(page_content=f"texto {i} do arquivo {SOURCES[i % 3]} " + "tema " * (i + 1),
+             metadata={'chunk_id': f"chunk-{i}", 'source_file': SOURCES[i % 3], 'section': f"secao {i % 2}"})
+    for i in range(30)
+]
+IDS = [doc.metadata['chunk_id'] for doc in DOCUMENTS]
+QUERIES = EMBEDDINGS.embed_documents(["tema do arquivo rosa", "texto 7 tema", "tema"])
+
+
+def _hits(results):
+    return [[(doc.metadata['chunk_id'], pytest.approx(score, abs=1e-6)) for doc, score in hits] for hits in results]
+
+
+class UnnormalizedEmbeddings(HashingEmbeddings):
+    """Vetores com normas diferentes, como os de modelos que não normalizam a saída."""
+
+    def embed_documents(self, texts):
+        return [(np.asarray(vector) * (1 + len(text) % 5)).tolist()
+                for text, vector in zip(texts, super().embed_documents(texts))]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def _cosine(query, texts):
+    vectors = EMBEDDINGS.embed_array(texts)
+    return vectors @ (np.asarray(query) / np.linalg.norm(query))
+
+
+def _sharded(path, **options):
+    return ShardedVectorStore(str(path), EMBEDDINGS, shard_by='source_file', backend="numpy", **options)
+
+
+@pytest.fixture
+def reference(tmp_path):
+    store = NumpyVectorStore(str(tmp_path / "unico"), EMBEDDINGS)
+    store.add(DOCUMENTS, IDS)
+    return store
+
+
+@pytest.fixture
+def sharded(tmp_path):
+    store = _sharded(tmp_path / "shards", max_workers=2)
+    store.add(DOCUMENTS, IDS)
+    return store
+
+
+def test_numpy_search_returns_the_exact_top_k(reference):
+    for query, hits in zip(QUERIES, reference.search(QUERIES, k=5)):
+        expected = np.sort(_cosine(query, [doc.page_content for doc in DOCUMENTS]))[::-1][:5]
+        assert [score for _, score in hits] == pytest.approx(expected, abs=1e-6)
+        assert [score for _, score in hits] == pytest.approx(_cosine(query, [doc.page_content for doc, _ in hits]),
+                                                             abs=1e-6)
+
+    assert len(reference.search(QUERIES, k=50)[0]) == len(DOCUMENTS)
+    filtered = reference.search(QUERIES, k=5, filter={'section': "secao 1", 'source_file': ["rosa.json"]})
+    assert all(doc.metadata['section'] == "secao 1" and doc.metadata['source_file'] == "rosa.json"
+               for hits in filtered for doc, _ in hits)
+    assert reference.search(QUERIES, k=5, filter={'section': "secao 9"}) == [[], [], []]
+
+
+def test_numpy_delete(reference):
+    deleted = ["chunk-3", "chunk-17", "inexistente"]
+    reference.delete(deleted)
+
+    assert reference.count() == len(DOCUMENTS) - 2
+    assert reference.ids() == [chunk_id for chunk_id in IDS if chunk_id not in deleted]
+    assert reference.get_documents(["chunk-3", "chunk-4"])[0].metadata['chunk_id'] == "chunk-4"
+    assert not {doc.metadata['chunk_id'] for hits in reference.search(QUERIES, k=30) for doc, _ in hits} & set(deleted)
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16"])
+def test_numpy_persist_and_load(tmp_path, dtype):
+    store = NumpyVectorStore(str(tmp_path), EMBEDDINGS, dtype=dtype)
+    store.add(DOCUMENTS[:10], IDS[:10])
+    store.persist()
+    # Lotes depois de persistir são concatenados à matriz em memory-map.
+    store.add(DOCUMENTS[10:], IDS[10:])
+    store.delete(["chunk-0"])
+    store.persist()
+
+    loaded = NumpyVectorStore(str(tmp_path), EMBEDDINGS, dtype=dtype)
+    assert isinstance(loaded._vectors, np.memmap) and loaded._vectors.dtype == np.dtype(dtype)
+    assert loaded.ids() == IDS[1:]
+    assert loaded.get_documents(["chunk-12"])[0].page_content == DOCUMENTS[12].page_content
+    assert _hits(loaded.search(QUERIES, k=5)) == _hits(store.search(QUERIES, k=5))
+
+
+def test_chroma_scores_are_cosine_similarities_for_unnormalized_embeddings(tmp_path, reference):
+    embeddings = UnnormalizedEmbeddings(dimension=64)
+    store = ChromaVectorStore(str(tmp_path / "chroma"), embeddings)
+    store.add(DOCUMENTS, IDS)
+    query = embeddings.embed_query("tema do arquivo rosa")
+
+    hits = store.search([query], k=5)[0]
+    assert store._space == "cosine"
+    assert [score for _, score in hits] == pytest.approx(_cosine(query, [doc.page_content for doc, _ in hits]),
+                                                         abs=1e-4)
+    assert [doc.metadata['chunk_id'] for doc, _ in hits] == \
+        [doc.metadata['chunk_id'] for doc, _ in reference.search([query], k=5)[0]]
+
+
+def test_documents_are_split_by_the_shard_field(sharded):
+    assert sorted(sharded.shard_values) == sorted(SOURCES)
+    assert sharded.count() == len(DOCUMENTS)
+    assert sorted(sharded.ids()) == sorted(IDS)
+    assert [doc.page_content for doc in sharded.get_documents(["chunk-4", "chunk-0"])] == \
+        [DOCUMENTS[4].page_content, DOCUMENTS[0].page_content]
+
+
+def test_search_without_filter_merges_all_shards(sharded, reference):
+    assert _hits(sharded.search(QUERIES, k=7)) == _hits(reference.search(QUERIES, k=7))
+
+
+def test_filter_on_the_shard_field_only_searches_those_shards(sharded, reference, monkeypatch):
+    searched = []
+    for value, shard in sharded._shards.items():
+        original = shard.search
+        monkeypatch.setattr(shard, "search", lambda *args, _value=value, _search=original, **kwargs:
+                            searched.append((_value, kwargs.get('filter'))) or _search(*args, **kwargs))
+
+    one = sharded.search(QUERIES, k=5, filter={'source_file': "rosa.json", 'section': "secao 1"})
+    assert searched == [("rosa.json", {'section': "secao 1"})]
+    assert _hits(one) == _hits(reference.search(QUERIES, k=5, filter={'source_file': "rosa.json",
+                                                                      'section': "secao 1"}))
+
+    searched.clear()
+    two = sharded.search(QUERIES, k=5, filter={'source_file': ["rosa.json", "clarice.json"]})
+    assert sorted(searched) == [("clarice.json", None), ("rosa.json", None)]
+    assert _hits(two) == _hits(reference.search(QUERIES, k=5, filter={'source_file': ["rosa.json", "clarice.json"]}))
+
+    searched.clear()
+    assert sharded.search(QUERIES, k=5, filter={'source_file': "bandeira.json"}) == [[], [], []]
+    assert searched == []
+
+
+def test_filter_on_another_field_searches_every_shard(sharded, reference):
+    assert _hits(sharded.search(QUERIES, k=6, filter={'section': "secao 0"})) == \
+        _hits(reference.search(QUERIES, k=6, filter={'section': "secao 0"}))
+
+
+def test_persisted_shards_are_reopened(sharded, tmp_path):
+    sharded.persist()
+
+    reopened = _sharded(tmp_path / "shards")
+    assert sorted(reopened.shard_values) == sorted(SOURCES)
+    assert _hits(reopened.search(QUERIES, k=5)) == _hits(sharded.search(QUERIES, k=5))
+
+
+def test_emptied_shard_is_dropped_and_its_directory_removed(sharded, tmp_path):
+    sharded.persist()
+    directory = os.path.join(str(tmp_path / "shards"), ShardedVectorStore.SHARDS_DIRECTORY,
+                             sharded._directories["rosa.json"])
+    rosa_ids = [chunk_id for chunk_id, doc in zip(IDS, DOCUMENTS) if doc.metadata['source_file'] == "rosa.json"]
+
+    sharded.delete(rosa_ids + ["chunk-0"])
+    assert sorted(sharded.shard_values) == ["clarice.json", "drummond.json"]
+    sharded.persist()
+
+    assert not os.path.exists(directory)
+    reopened = _sharded(tmp_path / "shards")
+    assert sorted(reopened.shard_values) == ["clarice.json", "drummond.json"]
+    assert sorted(reopened.ids()) == sorted(set(IDS) - set(rosa_ids) - {"chunk-0"})
+
+    # O shard pode voltar a receber chunks depois de removido.
+    reopened.add([DOCUMENTS[1]], [IDS[1]])
+    reopened.persist()
+    assert _sharded(tmp_path / "shards").get_documents([IDS[1]])[0].page_content == DOCUMENTS[1].page_content
+
+
+@pytest.mark.parametrize("quantization", ["int8", "binary"])
+def test_quantized_shards_can_be_emptied(tmp_path, quantization):
+    store = _sharded(tmp_path, quantization=quantization)
+    store.add(DOCUMENTS, IDS)
+    store.persist()
+
+    store.delete(IDS)
+    store.persist()
+    assert _sharded(tmp_path, quantization=quantization).count() == 0
@@ -0,0 +1,87 @@
+import pytest
+
+from app.rag.works_index import WorksIndex, YearFilter
+
+
+def _work(title, year, category, author="Clarice Lispector"):
+    return {'title': title, 'year': year, 'category': category, 'author': author, 'source_file': "clarice.json"}
+
+
+WORKS = [
+    _work("Perto do Coração Selvagem", 1943, "Romance"),
+    _work("A Paixão Segundo G.H.", 1964, "Romance"),
+    _work("A Hora da Estrela", 1977, "Romance"),
+    _work("Laços de Família", 1960, "Contos"),
+    _work("A Legião Estrangeira", 1964, "Contos"),
+    _work("O Mistério do Coelho Pensante", 1967, "Literatura infantil"),
+    _work("A Descoberta do Mundo", 1984, "Crônicas"),
+    _work("Minhas Queridas", 2007, "Correspondências"),
+]
+
+
+@pytest.fixture
+def index():
+    return WorksIndex(WORKS)
+
+
+def test_counts_works_of_a_category(index):
+    answer = index.answer("Quantos romances Clarice escreveu?")
+
+    assert answer.startswith('A lista de obras de Clarice Lispector tem 3 obras na categoria "Romance".')
+    assert "- A Hora da Estrela (1977)" in answer
+
+
+def test_lists_works_with_a_year_filter(index):
+    answer = index.answer("O que ela publicou depois de 1970?")
+
+    assert answer.splitlines()[0] == "Obras de Clarice Lispector depois de 1970 (3):"
+    assert "- Laços de Família (1960)" not in answer
+
+
+def test_lists_works_before_a_year(index):
+    answer = index.answer("Quais romances ela escreveu antes de 1960?")
+
+    assert answer.splitlines() == [
+        'Obras de Clarice Lispector na categoria "Romance" antes de 1960 (1):',
+        "- Perto do Coração Selvagem (1943)",
+    ]
+
+
+def test_lists_a_category_by_synonym(index):
+    answer = index.answer("Quais são os livros infantis dela?")
+
+    assert "- O Mistério do Coelho Pensante (1967)" in answer
+
+
+@pytest.mark.parametrize("question", [
+    "Quantas obras de Clarice foram traduzidas?",
+    "Quais contos falam de família?",
+    "Quais foram as crônicas mais famosas?",
+    "Liste as cartas que ela escreveu para as irmãs",
+    "Quais livros influenciaram Clarice?",
+    "Quais são os romances?",
+    "Onde Clarice Lispector nasceu?",
+    "Quais romances ela não escreveu?",
+    "Quantas obras ela publicou sem ser romance?",
+    "Liste as obras dela, exceto os contos",
+    "Quantos romances ela nunca publicou?",
+])
+def test_qualified_or_unrelated_questions_fall_back_to_rag(index, question):
+    assert index.answer(question) is None
+
+
+def test_requires_an_unambiguous_author():
+    index = WorksIndex(WORKS + [_work("Grande Sertão: Veredas", 1956, "Romance", author="João Guimarães Rosa")])
+
+    assert index.answer("Quantos romances ela escreveu?") is None
+    assert "tem 3 obras" in index.answer("Quantos romances Clarice escreveu?")
+
+
+def test_year_filter_parsing():
+    decade = YearFilter.parse("livros da decada de 1960")
+    assert (decade.start, decade.end) == (1960, 1969)
+
+    before = YearFilter.parse("antes de 1950")
+    assert (before.start, before.end) == (None, 1949)
+
+    assert YearFilter.parse("sem ano nenhum") is None